@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+# Start the hashing workers before the event loop spawns any threads, so
+# async views can await core.hashing.executor.acheck_password() at once.
+from core.hashing import executor  # noqa: E402
+
+executor.start()
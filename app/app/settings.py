@@ -11,8 +11,11 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -28,6 +31,13 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# 'development' (the defaults in this file) or 'production', which is
+# applied at the end of this file
+SETTINGS_PROFILE = os.environ.get('DJANGO_SETTINGS_PROFILE', 'development')
+if SETTINGS_PROFILE not in ('development', 'production'):
+    raise ImproperlyConfigured(
+        f'Unknown DJANGO_SETTINGS_PROFILE {SETTINGS_PROFILE!r}.')
+
 
 # Application definition
 
@@ -46,7 +56,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
+    'core.middleware.RouteMiddlewareDispatcher',
+]
+
+# Middleware run by core.middleware.RouteMiddlewareDispatcher for each URL
+# prefix; the longest matching prefix wins. The token-authenticated API
+# never reads sessions, messages or CSRF cookies, so only the admin and
+# unmatched paths pay for them. SecurityMiddleware in MIDDLEWARE and
+# XFrameOptionsMiddleware in every HTML-serving chain keep the security
+# headers on the API docs and the browsable API.
+FULL_MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +76,19 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+ROUTE_MIDDLEWARE = {
+    '/api/': [
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ],
+    '/metrics': [],
+    '/admin/': FULL_MIDDLEWARE,
+    '': FULL_MIDDLEWARE,
+}
+
+# The admin's middleware checks only look at MIDDLEWARE; core.checks
+# verifies the chain that serves the admin instead
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
 
 ROOT_URLCONF = 'app.urls'
 
@@ -81,14 +116,93 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get(
+            'DB_ENGINE', 'core.db.backends.postgresql_pool'),
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
+        # Used by core.db.backends.postgresql_pool, ignored by other engines
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'IDLE_TIMEOUT': float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+            'PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        },
     }
 }
 
+# Read replicas share the primary's settings apart from the host; entries in
+# DB_REPLICA_HOSTS are comma-separated and may carry a port as host:port
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Users and their tokens are spread over these aliases by a consistent hash
+# of the user id; the default database keeps the global user index. Entries
+# in DB_SHARDS are database names on the primary's server or
+# host[:port]/name; append new shards at the end and run reshard_users
+USER_SHARDS = []
+for index, shard in enumerate(
+        filter(None, os.environ.get('DB_SHARDS', '').split(','))):
+    location, _, name = shard.strip().rpartition('/')
+    host, _, port = location.partition(':')
+    alias = f'shard_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+    }
+    USER_SHARDS.append(alias)
+USER_SHARD_VNODES = int(os.environ.get('USER_SHARD_VNODES', 64))
+
+DATABASE_ROUTERS = [
+    'core.db.routers.UserShardRouter',
+    'core.db.routers.PrimaryReplicaRouter',
+]
+
+# Seconds a client's reads stay on the primary after it writes, recorded
+# in a cache every worker sees
+REPLICA_STICKY_SECONDS = float(
+    os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_CACHE_ALIAS = os.environ.get(
+    'DB_REPLICA_STICKY_CACHE_ALIAS', 'shared')
+
+# 'default' lives in each process. 'shared' is seen by every process on
+# the host, such as the serve command's workers; point it at memcached or
+# similar when several hosts serve the API
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get(
+            'SHARED_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'app-shared-cache')),
+    },
+}
+if CACHES['shared']['BACKEND'].endswith('.FileBasedCache'):
+    # It holds a stamp per active user (USER_AUTH_CACHE), which Django's
+    # default of 300 entries would cull at random. Every write lists the
+    # directory, so prefer memcached or similar for many users
+    CACHES['shared']['OPTIONS'] = {'MAX_ENTRIES': int(
+        os.environ.get('SHARED_CACHE_MAX_ENTRIES', 1000000))}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,8 +247,19 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Runs tests with synchronous last_login writes, see core.test_runner
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 AUTH_USER_MODEL = 'core.User'
 
+# ModelBackend with permission sets cached across requests, in a cache
+# every worker sees so that a revoked permission is dropped everywhere
+AUTHENTICATION_BACKENDS = ['core.backends.CachedModelBackend']
+PERMISSION_CACHE = {
+    'ALIAS': os.environ.get('PERMISSION_CACHE_ALIAS', 'shared'),
+    'TTL': int(os.environ.get('PERMISSION_CACHE_TTL', 300)),
+}
+
 # DRF Settings
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -142,4 +267,125 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
-}
\ No newline at end of file
+    # Sliding-window limits for user.throttles; an empty value disables one
+    'DEFAULT_THROTTLE_RATES': {
+        'login_username': os.environ.get(
+            'THROTTLE_LOGIN_USERNAME', '10/min') or None,
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '60/min') or None,
+        'login_global': os.environ.get(
+            'THROTTLE_LOGIN_GLOBAL', '50/s') or None,
+        'signup_ip': os.environ.get('THROTTLE_SIGNUP_IP', '20/hour') or None,
+        'signup_global': os.environ.get(
+            'THROTTLE_SIGNUP_GLOBAL', '10/s') or None,
+    },
+    # Trusted proxies in front of the app. Throttles key clients on
+    # REMOTE_ADDR, or on the X-Forwarded-For entry the last proxy added;
+    # with None DRF would trust whatever the client sends.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Login issues database tokens ('db') or short-lived signed access tokens
+# ('signed'); both kinds are accepted either way
+USER_TOKEN_MODE = os.environ.get('USER_TOKEN_MODE', 'db')
+SIGNED_TOKEN_TTL = int(os.environ.get('SIGNED_TOKEN_TTL', 900))
+
+# last_login is written in batches by user.last_login ('buffered') or on
+# the request thread like Django does ('sync')
+LAST_LOGIN = {
+    'MODE': os.environ.get('LAST_LOGIN_MODE', 'buffered'),
+    'FLUSH_INTERVAL': float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 5)),
+    'MAX_PENDING': int(os.environ.get('LAST_LOGIN_MAX_PENDING', 1000)),
+}
+
+# Database tokens expire TTL seconds after their last use (0 disables);
+# authentication records a use at most once per REFRESH_INTERVAL
+AUTH_TOKEN_EXPIRY = {
+    'TTL': int(os.environ.get('AUTH_TOKEN_TTL', 30 * 24 * 3600)),
+    'REFRESH_INTERVAL': int(os.environ.get('AUTH_TOKEN_REFRESH_INTERVAL',
+                                           3600)),
+}
+
+# Shared cache alias for throttle counters; unset keeps them in process
+USER_THROTTLE_CACHE_ALIAS = os.environ.get('USER_THROTTLE_CACHE_ALIAS') or None
+
+# Token authentication cache used by user.authentication
+USER_AUTH_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('USER_AUTH_CACHE_MAX_ENTRIES', 10000)),
+    'TTL': float(os.environ.get('USER_AUTH_CACHE_TTL', 30)),
+    'SHARED_CACHE_ALIAS': os.environ.get('USER_AUTH_CACHE_ALIAS') or None,
+    'SHARED_TTL': float(os.environ.get('USER_AUTH_CACHE_SHARED_TTL', 300)),
+    # Per-user stamps that let every process drop a changed user at once
+    'STAMP_CACHE_ALIAS': os.environ.get('USER_AUTH_STAMP_CACHE_ALIAS',
+                                        'shared') or None,
+}
+
+# Password hashing executor used by core.hashing
+PASSWORD_HASHING = {
+    'BACKEND': os.environ.get('PASSWORD_HASHING_BACKEND', 'process'),
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)) or None,
+}
+
+# Per-request timings exposed as Server-Timing and on /metrics
+REQUEST_METRICS = {
+    'ENABLED': os.environ.get('REQUEST_METRICS_ENABLED', '1') == '1',
+    'SERVER_TIMING': os.environ.get('REQUEST_METRICS_SERVER_TIMING',
+                                    '1') == '1',
+}
+# Bearer token required to scrape /metrics; unset leaves it open
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Preforking server started by the serve command; 0 workers means one per
+# core and 0 max requests never restarts a worker
+SERVE = {
+    'BIND': os.environ.get('SERVE_BIND', '0.0.0.0:8000'),
+    'WORKERS': int(os.environ.get('SERVE_WORKERS', 0)),
+    'MAX_REQUESTS': int(os.environ.get('SERVE_MAX_REQUESTS', 10000)),
+    'MAX_REQUESTS_JITTER': int(os.environ.get('SERVE_MAX_REQUESTS_JITTER',
+                                              1000)),
+    'GRACEFUL_TIMEOUT': float(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30)),
+    'REQUEST_TIMEOUT': float(os.environ.get('SERVE_REQUEST_TIMEOUT', 60)),
+}
+
+# Prefix search used by /api/user/search/ and the user admin (core.search).
+# MEMORY_INDEX answers username prefixes from an in-process index, which
+# reads new users every REFRESH_INTERVAL and reloads every TTL seconds
+USER_SEARCH = {
+    'LIMIT': int(os.environ.get('USER_SEARCH_LIMIT', 20)),
+    'MAX_LIMIT': int(os.environ.get('USER_SEARCH_MAX_LIMIT', 100)),
+    'MEMORY_INDEX': os.environ.get('USER_SEARCH_MEMORY_INDEX', '0') == '1',
+    'REFRESH_INTERVAL': float(os.environ.get(
+        'USER_SEARCH_REFRESH_INTERVAL', 5)),
+    'TTL': float(os.environ.get('USER_SEARCH_TTL', 300)),
+}
+
+# Pre-generated OpenAPI schema written by the build_schema_cache command
+SPECTACULAR_CACHE_DIR = os.environ.get('SPECTACULAR_CACHE_DIR') or None
+
+# Production profile for a token-authenticated JSON API. DEBUG would keep
+# every query in connection.queries, the browsable API renders templates
+# and session authentication loads the session and enforces CSRF on API
+# requests; the admin keeps its sessions, messages and CSRF protection.
+if SETTINGS_PROFILE == 'production':
+    DEBUG = False
+    try:
+        SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+    except KeyError:
+        raise ImproperlyConfigured(
+            'DJANGO_SECRET_KEY is required by the production profile.')
+    ALLOWED_HOSTS = [
+        host.strip()
+        for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+        if host.strip()
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.template.context_processors.debug')
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'rest_framework.renderers.JSONRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = [
+        'user.authentication.SignedTokenAuthentication',
+    ]
+    # Admin sessions are read from the cache instead of the database
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = os.environ.get(
+        'DJANGO_SECURE_COOKIES', '1') == '1'
@@ -15,12 +15,17 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+
+from core.schema import CachedSpectacularAPIView
+from core.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(),
+         name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(
         url_name='api-schema'), name='api-ui'),
     path('api/user/', include('user.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Pools are per process: fill this one before the first request. The serve
+# command's workers warm their own again after forking.
+from core.server import warm_pools  # noqa: E402
+
+warm_pools()
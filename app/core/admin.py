@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _ # noqa
 
-from core import models
+from core import models, search
 
 # Register your models here.
 
@@ -11,7 +11,11 @@ class UserAdmin(BaseUserAdmin):
     """Define admin model for custom User model"""
 
     ordering = ['id']
+    # Skip the unfiltered COUNT(*) on every changelist page
+    show_full_result_count = False
     list_display = ['username', 'name', 'email', 'is_staff']
+    # Prefix matches ignoring case, found by core.search like the user API
+    search_fields = ['^username', '^email', '^name']
 
     # Customize the admin form layout
     fieldsets = (
@@ -22,6 +26,9 @@ class UserAdmin(BaseUserAdmin):
     )
     readonly_fields = ('last_login',)
 
+    def get_search_results(self, request, queryset, search_term):
+        return search.filter_users(queryset, search_term), False
+
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -0,0 +1,103 @@
+"""
+Authentication backends for the project.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+PERMISSION_KINDS = ('user', 'group')
+
+
+class PermissionCache:
+    """Shared cache of each user's permission names, keyed by user id.
+
+    Entries carry the global and per-user version stamps they were computed
+    under. Changing a group's permissions bumps the global stamp and
+    changing one user's groups or permissions bumps that user's, which
+    invalidates the affected entries without having to find them.
+    """
+
+    key_prefix = 'perms:'
+
+    def __init__(self, alias='shared', ttl=300):
+        self.alias = alias
+        self.ttl = ttl
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from the PERMISSION_CACHE setting."""
+        options = getattr(settings, 'PERMISSION_CACHE', {})
+        return cls(alias=options.get('ALIAS', 'shared'),
+                   ttl=options.get('TTL', 300))
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _keys(self, user_id):
+        return (f'{self.key_prefix}{user_id}',
+                f'{self.key_prefix}stamp',
+                f'{self.key_prefix}stamp:{user_id}')
+
+    def get(self, user):
+        """Return (permissions or None, stamps) for user.
+
+        Pass the stamps on to set(), so an entry computed while a change
+        was being made is never taken for current.
+        """
+        entry_key, *stamp_keys = self._keys(user.pk)
+        values = self.cache.get_many([entry_key, *stamp_keys])
+        stamps = []
+        for key in stamp_keys:
+            stamp = values.get(key)
+            if stamp is None:
+                self.cache.add(key, uuid.uuid4().hex, None)
+                stamp = self.cache.get(key)
+            stamps.append(stamp)
+        stamps = tuple(stamps)
+        entry = values.get(entry_key)
+        if entry is not None and entry[:2] == (stamps, user.is_superuser):
+            return entry[2], stamps
+        return None, stamps
+
+    def set(self, user, stamps, permissions):
+        self.cache.set(self._keys(user.pk)[0],
+                       (stamps, user.is_superuser, permissions), self.ttl)
+
+    def invalidate_user(self, user_id):
+        """Forget the cached permissions of one user."""
+        self.cache.set(self._keys(user_id)[2], uuid.uuid4().hex, None)
+
+    def invalidate_all(self):
+        """Forget every cached permission set."""
+        self.cache.set(f'{self.key_prefix}stamp', uuid.uuid4().hex, None)
+
+
+permission_cache = PermissionCache.from_settings()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose permission lookups go through permission_cache.
+
+    ModelBackend only caches permissions on the user instance, so every
+    request and admin page re-queries them; here a warm check costs one
+    cache read and no query.
+    """
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        perm_cache_name = f'_{from_name}_perm_cache'
+        if not hasattr(user_obj, perm_cache_name):
+            permissions, stamps = permission_cache.get(user_obj)
+            if permissions is None:
+                permissions = {}
+                for kind in PERMISSION_KINDS:
+                    permissions[kind] = super()._get_permissions(
+                        user_obj, obj, kind)
+                permission_cache.set(user_obj, stamps, permissions)
+            for kind, names in permissions.items():
+                setattr(user_obj, f'_{kind}_perm_cache', set(names))
+        return getattr(user_obj, perm_cache_name)
@@ -0,0 +1,106 @@
+"""
+In-process caching helpers.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries=1000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the value for key, or default if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entry."""
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Remove every entry whose value satisfies predicate."""
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items()
+                     if predicate(value)]
+            for key in stale:
+                del self._data[key]
+        return stale
+
+    def clear(self):
+        """Remove every entry and reset the hit counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class VersionStamps:
+    """Per-key version stamps kept in a Django cache shared by processes.
+
+    An in-process entry records the stamp it was cached under and is only
+    used while that stamp is current, so bumping a stamp invalidates the
+    entry in every process at once. Stamps are random, so one evicted from
+    the shared cache never comes back with an old value. Without an alias
+    every stamp is None and nothing is checked.
+    """
+
+    def __init__(self, alias=None, key_prefix='stamp:'):
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        """Return the current stamp for key."""
+        if not self.alias:
+            return None
+        cache = caches[self.alias]
+        key = f'{self.key_prefix}{key}'
+        stamp = cache.get(key)
+        if stamp is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            stamp = cache.get(key)
+        return stamp
+
+    def bump(self, key):
+        """Invalidate every entry cached under key's current stamp."""
+        if self.alias:
+            caches[self.alias].set(f'{self.key_prefix}{key}',
+                                   uuid.uuid4().hex, None)
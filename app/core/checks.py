@@ -0,0 +1,52 @@
+"""
+System checks for the project.
+"""
+from django.conf import settings
+from django.core import checks
+from django.urls import NoReverseMatch, reverse
+from django.utils.module_loading import import_string
+
+DISPATCHER = 'core.middleware.RouteMiddlewareDispatcher'
+
+# What admin.E408-E410 require, checked against the admin's actual chain
+ADMIN_MIDDLEWARE = (
+    ('django.contrib.auth.middleware.AuthenticationMiddleware', 'admin.E408'),
+    ('django.contrib.messages.middleware.MessageMiddleware', 'admin.E409'),
+    ('django.contrib.sessions.middleware.SessionMiddleware', 'admin.E410'),
+)
+
+
+def _contains_subclass(class_path, candidate_paths):
+    cls = import_string(class_path)
+    for path in candidate_paths:
+        try:
+            candidate = import_string(path)
+        except ImportError:
+            continue
+        if isinstance(candidate, type) and issubclass(candidate, cls):
+            return True
+    return False
+
+
+@checks.register(checks.Tags.admin)
+def check_admin_middleware(app_configs, **kwargs):
+    """Check the admin's route gets the middleware it needs."""
+    try:
+        path = reverse('admin:index')
+    except NoReverseMatch:
+        return []
+    from core.middleware import route_middleware
+
+    middleware = list(settings.MIDDLEWARE)
+    if DISPATCHER in middleware:
+        middleware += route_middleware(path) or []
+    return [
+        checks.Error(
+            f'{required} must be in MIDDLEWARE or in the ROUTE_MIDDLEWARE '
+            f'chain serving {path} in order to use the admin.',
+            hint=f'Replaces the silenced {check_id}.',
+            id='core.E001',
+        )
+        for required, check_id in ADMIN_MIDDLEWARE
+        if not _contains_subclass(required, middleware)
+    ]
@@ -0,0 +1,98 @@
+"""
+PostgreSQL backend that checks connections out of a ConnectionPool.
+
+Configure it with a POOL dict next to the usual DATABASES keys::
+
+    'POOL': {
+        'MIN_SIZE': 1,
+        'MAX_SIZE': 10,
+        'IDLE_TIMEOUT': 300,
+        'PRE_PING': True,
+        'TIMEOUT': 30,
+    }
+
+Pools live per process and are shared by its threads. Django still closes
+connections at the end of each request (CONN_MAX_AGE = 0), which now just
+returns them to the pool.
+"""
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import all_pools, get_pool
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'IDLE_TIMEOUT': 300,
+    'PRE_PING': True,
+    'TIMEOUT': 30,
+}
+
+
+def close_pools(database=None):
+    """Close idle pooled connections, optionally only for one database."""
+    for key, pool in all_pools().items():
+        if database is None or dict(key[0]).get('database') == database:
+            pool.close_all()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled sessions would block DROP DATABASE
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def pool_options(self):
+        options = dict(POOL_DEFAULTS)
+        options.update(self.settings_dict.get('POOL') or {})
+        return {
+            'min_size': int(options['MIN_SIZE']),
+            'max_size': int(options['MAX_SIZE']),
+            'idle_timeout': options['IDLE_TIMEOUT'],
+            'pre_ping': bool(options['PRE_PING']),
+            'timeout': options['TIMEOUT'],
+        }
+
+    def get_pool(self, conn_params=None):
+        """Return the pool serving this wrapper's connection parameters."""
+        if conn_params is None:
+            conn_params = self.get_connection_params()
+        options = self.pool_options()
+        key = (tuple(sorted((k, str(v)) for k, v in conn_params.items())),
+               tuple(sorted(options.items())))
+        return get_pool(
+            key,
+            lambda: base.DatabaseWrapper.get_new_connection(
+                self, conn_params),
+            **options,
+        )
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        connection = self._pool.acquire()
+        # Mirror the parent: isolation_level must be known before autocommit
+        # is set, whether the connection is new or reused.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection, discard=self.errors_occurred)
+
+    def warm_pool(self):
+        """Open the pool's minimum number of connections."""
+        return self.get_pool().warm()
+
+    def pool_stats(self):
+        return self.get_pool().stats()
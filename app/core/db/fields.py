@@ -0,0 +1,54 @@
+"""
+Model fields compared case-insensitively through lower() indexes.
+"""
+from django.db import models
+from django.db.models.functions import Lower
+from django.db.models.lookups import Lookup, StartsWith
+
+
+class LowerExact(Lookup):
+    """iexact compiled as LOWER(column) = LOWER(value).
+
+    The built-in iexact uses UPPER() on PostgreSQL and LIKE on SQLite,
+    neither of which can use an index on lower(column).
+    """
+
+    lookup_name = 'iexact'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'LOWER({lhs}) = LOWER({rhs})', [*lhs_params, *rhs_params]
+
+
+class LowerStartsWith(StartsWith):
+    """istartswith compiled as LOWER(column) LIKE LOWER('prefix%').
+
+    Served by an index on lower(column) in the C collation (migration
+    0009), which PostgreSQL uses for the prefix range.
+    """
+
+    lookup_name = 'istartswith'
+
+    def as_sql(self, compiler, connection):
+        # Lookup's, not BuiltinLookup's: that would wrap it in UPPER()
+        lhs, lhs_params = Lookup.process_lhs(self, compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        # The case-sensitive operator; istartswith's adds UPPER() too
+        rhs = connection.operators['startswith'] % f'LOWER({rhs})'
+        return f'LOWER({lhs}) {rhs}', [*lhs_params, *rhs_params]
+
+
+class CaseInsensitiveCharField(models.CharField):
+    """CharField whose case-insensitive lookups use a lower() index."""
+
+
+class CaseInsensitiveEmailField(models.EmailField):
+    """EmailField whose case-insensitive lookups use a lower() index."""
+
+
+for field_class in (CaseInsensitiveCharField, CaseInsensitiveEmailField):
+    field_class.register_lookup(LowerExact)
+    field_class.register_lookup(LowerStartsWith)
+    field_class.register_lookup(Lower)
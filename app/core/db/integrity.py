@@ -0,0 +1,57 @@
+"""
+Helpers for turning integrity errors into field errors.
+"""
+import contextlib
+
+from django.db import IntegrityError, connections, transaction
+
+
+def violated_field(exc, model, field_names):
+    """Return the name of the unique field that exc violated, or None.
+
+    PostgreSQL reports the violated constraint by name; other backends only
+    describe it in the message. Constraint and index names embed the
+    column, e.g. core_user_email_key or core_user_email_ci_uniq.
+    """
+    cause = exc.__cause__
+    diag = getattr(cause, 'diag', None)
+    text = (getattr(diag, 'constraint_name', None)
+            or str(cause or exc)).lower()
+    # Longest first, so a column never matches inside a longer one
+    columns = sorted(
+        ((model._meta.get_field(name).column, name) for name in field_names),
+        key=lambda item: -len(item[0]))
+    for column, name in columns:
+        if column.lower() in text:
+            return name
+    return None
+
+
+def unique_message(model, field_name):
+    """Return the message a UniqueValidator would give for field_name."""
+    field = model._meta.get_field(field_name)
+    return field.error_messages['unique'] % {
+        'model_name': model._meta.verbose_name,
+        'field_label': field.verbose_name,
+    }
+
+
+@contextlib.contextmanager
+def unique_errors(model, field_names, using='default', error_class=None):
+    """Raise error_class({field: [message]}) for unique violations.
+
+    The block runs in a savepoint only when a transaction is already open,
+    so in autocommit mode a single INSERT remains a single round trip.
+    """
+    if connections[using].in_atomic_block:
+        block = transaction.atomic(using=using)
+    else:
+        block = contextlib.nullcontext()
+    try:
+        with block:
+            yield
+    except IntegrityError as exc:
+        field_name = violated_field(exc, model, field_names)
+        if field_name is None or error_class is None:
+            raise
+        raise error_class({field_name: [unique_message(model, field_name)]})
@@ -0,0 +1,228 @@
+"""
+Thread-safe database connection pool.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+class ConnectionPool:
+    """Pool of DB-API connections shared by the threads of one process.
+
+    Idle connections are reused most-recently-used first, connections idle
+    for longer than idle_timeout are closed down to min_size, and with
+    pre_ping a connection is checked with SELECT 1 before it is handed out.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, idle_timeout=300,
+                 pre_ping=True, timeout=30):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min <= max >= 1.')
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._inherited = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.connect_time = 0.0
+
+    def _check_fork(self):
+        """Forget connections inherited from a parent process.
+
+        Closing them here would terminate the parent's sessions, so they
+        are kept referenced and never touched again.
+        """
+        if self._pid != os.getpid():
+            self._inherited.extend(self._idle)
+            self._reset()
+
+    def acquire(self):
+        """Return a connection, creating one if the pool is not full."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = None
+            with self._cond:
+                self._check_fork()
+                self._expire_idle()
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f'No connection available within '
+                            f'{self.timeout}s (max_size={self.max_size}).')
+                    self.waits += 1
+                    started = time.monotonic()
+                    self._cond.wait(remaining)
+                    self.wait_time += time.monotonic() - started
+                    continue
+
+            if connection is None:
+                return self._create()
+            if self._usable(connection):
+                with self._cond:
+                    self.reused += 1
+                return connection
+            self._discard(connection)
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if discard."""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+        if not discard:
+            discard = not self._reset_connection(connection)
+        if discard:
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def warm(self):
+        """Open connections until min_size are idle in the pool."""
+        connections = []
+        with self._cond:
+            self._check_fork()
+            missing = max(self.min_size - len(self._idle), 0)
+        for _ in range(missing):
+            connections.append(self.acquire())
+        for connection in connections:
+            self.release(connection)
+        return len(connections)
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._cond:
+            self._check_fork()
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Return counters describing pool usage."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'connect_time': self.connect_time,
+            }
+
+    def _create(self):
+        started = time.monotonic()
+        try:
+            connection = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+            self.connect_time += time.monotonic() - started
+        return connection
+
+    def _expire_idle(self):
+        """Close connections idle past idle_timeout, keeping min_size."""
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # The left end holds the least recently returned connections
+        while (self._idle and self._size > self.min_size
+               and self._idle[0][1] < cutoff):
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self.discarded += 1
+            self._close(connection)
+
+    def _usable(self, connection):
+        if getattr(connection, 'closed', False):
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def _reset_connection(self, connection):
+        """Roll back any open transaction; return False if unusable."""
+        if getattr(connection, 'closed', False):
+            return False
+        status = getattr(connection, 'get_transaction_status', None)
+        try:
+            # psycopg2: 0 idle, 1 active, 2 in transaction, 3 error,
+            # 4 unknown (connection lost)
+            state = status() if status is not None else 0
+            if state == 4:
+                return False
+            if state != 0:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._cond:
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+        self._close(connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory, **options):
+    """Return the process-wide pool for key, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(factory, **options)
+        return pool
+
+
+def all_pools():
+    """Return a snapshot of every pool keyed by its connection key."""
+    with _pools_lock:
+        return dict(_pools)
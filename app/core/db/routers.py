@@ -0,0 +1,105 @@
+"""
+Database routers.
+"""
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db import routing, sharding
+
+SHARDED_MODELS = {('core', 'user'), ('authtoken', 'token')}
+
+
+class UserShardRouter:
+    """Keep users and their tokens on the shard that holds them.
+
+    Only active when USER_SHARDS is set. Saves and related lookups follow
+    the instance they start from; unhinted queries fall through to the next
+    router, so code that needs a shard asks for it (see
+    core.models.UserQuerySet and core.db.sharding).
+    """
+
+    @staticmethod
+    def _key(model):
+        return model._meta.app_label, model._meta.model_name
+
+    def _db_for(self, model, **hints):
+        if (not sharding.is_enabled()
+                or self._key(model) not in SHARDED_MODELS):
+            return None
+        instance = hints.get('instance')
+        if instance is None or self._key(type(instance)) not in SHARDED_MODELS:
+            return None
+        if instance._state.db:
+            return instance._state.db
+        if self._key(type(instance)) == ('core', 'user'):
+            return sharding.home_for(instance) if instance.pk else None
+        # A new token goes wherever its user is
+        user_field = type(instance)._meta.get_field('user')
+        if user_field.is_cached(instance) and instance.user._state.db:
+            return instance.user._state.db
+        return sharding.shard_for(instance.user_id)
+
+    db_for_read = _db_for
+    db_for_write = _db_for
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if (self._key(type(obj1)) in SHARDED_MODELS
+                and self._key(type(obj2)) in SHARDED_MODELS
+                and sharding.is_enabled()):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if (app_label, model_name) == ('core', 'userindex'):
+            return db == sharding.GLOBAL_DB_ALIAS
+        return None
+
+
+class PrimaryReplicaRouter:
+    """Send reads to DATABASE_REPLICAS and writes to the primary.
+
+    Reads stay on the primary while the request is pinned (see
+    core.db.routing) or inside a transaction on the primary.
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def _elsewhere(self, hints):
+        # Rows tied to a database outside primary and replicas (a user
+        # shard) stay there
+        instance = hints.get('instance')
+        return (instance is not None and instance._state.db is not None
+                and instance._state.db
+                not in {DEFAULT_DB_ALIAS, *self._replicas()})
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return None
+        if (routing.is_pinned()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if self._elsewhere(hints):
+            return None
+        routing.mark_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self._replicas():
+            return False
+        return None
@@ -0,0 +1,118 @@
+"""
+Per-request routing state for the primary/replica database router.
+
+A request is pinned to the primary when its client wrote recently, so it
+reads its own writes even while replicas lag. Pins are stored in a Django
+cache under keys derived from the client's credentials; configure a shared
+cache so that pins are visible to every worker.
+"""
+import contextlib
+import contextvars
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Routing decisions for the current request."""
+
+    def __init__(self, pinned=False, keys=()):
+        self.pinned = pinned
+        self.keys = list(keys)
+        self.wrote = False
+
+
+def current():
+    """Return the routing state of the current request, if any."""
+    return _state.get()
+
+
+def begin(pinned=False, keys=()):
+    """Start tracking a request; returns a token for end()."""
+    return _state.set(RoutingState(pinned=pinned, keys=keys))
+
+
+def end(token):
+    """Stop tracking the request started with token."""
+    _state.reset(token)
+
+
+def is_pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def mark_write():
+    """Record a write; later reads in this request use the primary."""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+        state.pinned = True
+
+
+def stick(key):
+    """Also pin key if this request writes, e.g. a freshly issued token."""
+    state = _state.get()
+    if state is not None:
+        state.keys.append(key)
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Send every read inside the block to the primary."""
+    token = _state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def auth_key(header):
+    """Return the pin key for an Authorization header value."""
+    digest = hashlib.sha256(header.encode()).hexdigest()[:32]
+    return f'auth:{digest}'
+
+
+def request_keys(request):
+    """Return the pin keys identifying the client behind request.
+
+    Anonymous clients are keyed by address, so a signup is visible to the
+    login that follows it.
+    """
+    keys = []
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if header:
+        keys.append(auth_key(header))
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        keys.append(f'session:{session}')
+    address = request.META.get('REMOTE_ADDR')
+    if not keys and address:
+        keys.append(f'ip:{address}')
+    return keys
+
+
+def _cache():
+    return caches[getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'shared')]
+
+
+def _cache_key(key):
+    return f'db:pin:{key}'
+
+
+def pin(keys, seconds=None):
+    """Pin keys to the primary for seconds (REPLICA_STICKY_SECONDS)."""
+    if seconds is None:
+        seconds = settings.REPLICA_STICKY_SECONDS
+    if keys and seconds > 0:
+        _cache().set_many({_cache_key(key): 1 for key in keys}, seconds)
+
+
+def any_pinned(keys):
+    """Return True if any of keys is currently pinned."""
+    if not keys:
+        return False
+    return bool(_cache().get_many([_cache_key(key) for key in keys]))
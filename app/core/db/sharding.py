@@ -0,0 +1,266 @@
+"""
+Hash sharding of users and their auth tokens across databases.
+
+Each user row, with its tokens, lives on one of the USER_SHARDS aliases,
+chosen by a consistent hash of the user id. The default database keeps the
+global UserIndex: it hands out user ids, enforces email and username
+uniqueness across shards and records where every user currently lives, so
+lookups by username or email and rows still being moved by reshard_users
+are found without asking every shard.
+"""
+import bisect
+import functools
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+GLOBAL_DB_ALIAS = DEFAULT_DB_ALIAS
+
+MovedBatch = namedtuple('MovedBatch', ['last_id', 'scanned', 'moved',
+                                       'pinned', 'elapsed'])
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes.
+
+    Every node is placed at vnodes points on the ring and a key belongs to
+    the first point after its hash, so adding a node only takes over about
+    1/len(nodes) of the keys and never moves keys between existing nodes.
+    """
+
+    def __init__(self, nodes, vnodes=64):
+        if not nodes:
+            raise ValueError('A hash ring needs at least one node.')
+        self.nodes = tuple(nodes)
+        self.vnodes = vnodes
+        points = sorted(
+            (self._hash(f'{node}#{replica}'), node)
+            for node in self.nodes for replica in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value):
+        digest = hashlib.md5(str(value).encode()).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+    def node_for(self, key):
+        """Return the node that owns key."""
+        index = bisect.bisect(self._hashes, self._hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+@functools.lru_cache(maxsize=8)
+def _ring(shards, vnodes):
+    return HashRing(shards, vnodes)
+
+
+def get_shards():
+    """Return the aliases users are spread over; empty when disabled."""
+    return list(getattr(settings, 'USER_SHARDS', []))
+
+
+def is_enabled():
+    return bool(getattr(settings, 'USER_SHARDS', None))
+
+
+def get_ring():
+    return _ring(tuple(get_shards()),
+                 getattr(settings, 'USER_SHARD_VNODES', 64))
+
+
+def shard_for(user_id):
+    """Return the alias the ring assigns user_id to."""
+    return get_ring().node_for(user_id)
+
+
+def home_for(user):
+    """Return the alias user belongs on.
+
+    Staff accounts stay on the global database with the admin's log,
+    groups and permissions, which their rows refer to (see _pinned).
+    """
+    if user.is_staff or user.is_superuser:
+        return GLOBAL_DB_ALIAS
+    return shard_for(user.pk)
+
+
+def databases():
+    """Every alias that may hold users: the shards, then the global one."""
+    shards = get_shards()
+    if GLOBAL_DB_ALIAS not in shards:
+        shards.append(GLOBAL_DB_ALIAS)
+    return shards
+
+
+def spread(queryset):
+    """Return queryset once per database holding users.
+
+    Reads covering many users, e.g. search or export, run the result on
+    each and merge. Unsharded, or with a database already chosen, that is
+    queryset alone, left to the routers.
+    """
+    if not is_enabled() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in databases()]
+
+
+def index():
+    from core.models import UserIndex
+    return UserIndex.objects.using(GLOBAL_DB_ALIAS)
+
+
+def locate(**lookup):
+    """Return (user id, alias) of the user matching lookup, or None."""
+    return index().filter(**lookup).values_list('pk', 'shard').first()
+
+
+def locate_many(user_ids):
+    """Return {alias: [user id, ...]} for the indexed users in user_ids."""
+    by_shard = {}
+    for user_id, shard in index().filter(pk__in=user_ids).values_list(
+            'pk', 'shard'):
+        by_shard.setdefault(shard, []).append(user_id)
+    return by_shard
+
+
+def database_of(instance):
+    """Alias to use for instance's rows, or None to let routers decide."""
+    if not is_enabled():
+        return None
+    return instance._state.db
+
+
+def find_token(key):
+    """Return the token with key, with its user, from whichever shard.
+
+    A key says nothing about its user, so this asks every database in
+    turn; it only runs when the token cache misses.
+    """
+    from rest_framework.authtoken.models import Token
+
+    for alias in databases():
+        token = Token.objects.using(alias).select_related('user').filter(
+            key=key).first()
+        if token is not None:
+            return token
+    raise Token.DoesNotExist
+
+
+def _users(using):
+    from django.contrib.auth import get_user_model
+    return get_user_model()._base_manager.using(using)
+
+
+def build_index(using, batch_size=1000):
+    """Add the users on using that UserIndex does not know yet.
+
+    Run once for the unsharded default database when sharding is turned
+    on; the id sequence is then moved past every indexed user so new ids
+    cannot collide. Returns the number of users scanned.
+    """
+    from core.models import UserIndex
+
+    last_id = scanned = 0
+    while True:
+        rows = list(_users(using).filter(pk__gt=last_id).order_by(
+            'pk').values_list('pk', 'email', 'username')[:batch_size])
+        if not rows:
+            break
+        index().bulk_create(
+            [UserIndex(pk=pk, email=email, username=username, shard=using)
+             for pk, email, username in rows],
+            ignore_conflicts=True)
+        scanned += len(rows)
+        last_id = rows[-1][0]
+    connection = connections[GLOBAL_DB_ALIAS]
+    statements = connection.ops.sequence_reset_sql(no_style(), [UserIndex])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    return scanned
+
+
+def _pinned(using, users):
+    """Ids of users that stay where they are.
+
+    Staff accounts, group memberships and permission grants refer to rows
+    that exist only on the database the admin runs against.
+    """
+    pinned = {user.pk for user in users
+              if user.is_staff or user.is_superuser}
+    model = type(users[0])
+    ids = [user.pk for user in users]
+    for through in (model.groups.through, model.user_permissions.through):
+        pinned.update(through.objects.using(using).filter(
+            user_id__in=ids).values_list('user_id', flat=True))
+    return pinned
+
+
+def move_users(source, batch_size=1000, sleep=0.0, dry_run=False):
+    """Move the users on source that the ring assigns elsewhere.
+
+    Users are scanned in id order, batch_size at a time. A batch is locked
+    on source for the duration of its move; moved users and their tokens
+    are written to their new shard first, then UserIndex points at it and
+    only then are they deleted from source, so a user can always be found
+    and an interrupted run is safe to repeat. Yields a MovedBatch per
+    batch.
+    """
+    last_id = 0
+    while True:
+        started = time.perf_counter()
+        with transaction.atomic(using=source):
+            users = list(_users(source).select_for_update().filter(
+                pk__gt=last_id).order_by('pk')[:batch_size])
+            if not users:
+                return
+            pinned = _pinned(source, users)
+            moving = {}
+            for user in users:
+                target = shard_for(user.pk)
+                if target != source and user.pk not in pinned:
+                    moving.setdefault(target, []).append(user)
+            if not dry_run:
+                for target, group in moving.items():
+                    _move(source, target, group)
+        moved = sum(len(group) for group in moving.values())
+        last_id = users[-1].pk
+        yield MovedBatch(last_id, len(users), moved, len(pinned),
+                         time.perf_counter() - started)
+        if sleep:
+            time.sleep(sleep)
+
+
+def pin_user(user):
+    """Move a user who has become staff to the global database."""
+    source = user._state.db
+    with transaction.atomic(using=source):
+        list(_users(source).select_for_update().filter(
+            pk=user.pk).values_list('pk'))
+        _move(source, GLOBAL_DB_ALIAS, [user])
+    user._state.db = GLOBAL_DB_ALIAS
+
+
+def _move(source, target, users):
+    from rest_framework.authtoken.models import Token
+
+    ids = [user.pk for user in users]
+    tokens = list(Token.objects.using(source).filter(user_id__in=ids))
+    with transaction.atomic(using=target):
+        # Left behind by an interrupted run
+        present = set(_users(target).filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        _users(target).bulk_create(
+            [user for user in users if user.pk not in present])
+        Token.objects.using(target).bulk_create(
+            tokens, ignore_conflicts=True)
+    index().filter(pk__in=ids).update(shard=target)
+    # Raw deletes: the users live on, so no delete signals may fire
+    Token.objects.using(source).filter(user_id__in=ids)._raw_delete(source)
+    _users(source).filter(pk__in=ids)._raw_delete(source)
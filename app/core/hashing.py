@@ -0,0 +1,195 @@
+"""
+Password hashing executor.
+
+Password hashing and verification are CPU bound, so they are sent to a
+pool of worker processes instead of running on the request thread.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from core import metrics
+
+
+def _init_worker(settings_module):
+    """Configure Django in a freshly started worker process."""
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _make_passwords(passwords):
+    return [hashers.make_password(password) for password in passwords]
+
+
+def _check_password(password, encoded):
+    """Return (valid, must_update) for password against encoded."""
+    updated = []
+    valid = hashers.check_password(password, encoded, setter=updated.append)
+    return valid, bool(updated)
+
+
+class HashingExecutor:
+    """Runs password hashing on a process, thread or inline backend."""
+
+    backends = ('process', 'thread', 'inline')
+
+    def __init__(self, backend='process', workers=None):
+        if backend not in self.backends:
+            raise ValueError(f'Unknown hashing backend {backend!r}.')
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the executor from the PASSWORD_HASHING setting."""
+        options = getattr(settings, 'PASSWORD_HASHING', {})
+        return cls(backend=options.get('BACKEND', 'process'),
+                   workers=options.get('WORKERS'))
+
+    def _reset_stats(self):
+        self.submitted = 0
+        self.completed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _get_pool(self):
+        """Return the pool, recreating it after a fork."""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                if self.backend == 'process':
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        # Not forked: this may run on a request thread
+                        # while other threads hold locks a child would
+                        # inherit. A fork server would not survive the
+                        # serve command forking this process either
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='hashing',
+                    )
+                self._pid = os.getpid()
+            return self._pool
+
+    def start(self):
+        """Start the worker pool eagerly, e.g. before serving requests."""
+        if self.backend != 'inline':
+            self.submit(_make_passwords, []).result()
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=wait)
+
+    def submit(self, fn, *args):
+        """Submit fn(*args) and return a future for its result."""
+        started = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+
+        if self.backend == 'inline':
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        else:
+            future = self._get_pool().submit(fn, *args)
+
+        future.add_done_callback(
+            lambda _: self._record(time.perf_counter() - started))
+        return future
+
+    def _record(self, elapsed):
+        with self._lock:
+            self.completed += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+
+    def make_password(self, password):
+        """Hash password on the pool and return the encoded value."""
+        if password is None:
+            return hashers.make_password(None)
+        with metrics.timed('hash'):
+            return self.submit(_make_password, password).result()
+
+    def make_passwords(self, passwords, chunk_size=64):
+        """Hash many passwords in parallel, preserving their order."""
+        passwords = list(passwords)
+        futures = [
+            self.submit(_make_passwords, passwords[i:i + chunk_size])
+            for i in range(0, len(passwords), chunk_size)
+        ]
+        with metrics.timed('hash'):
+            return [encoded for future in futures
+                    for encoded in future.result()]
+
+    def check_password(self, password, encoded):
+        """Return (valid, must_update) for password against encoded."""
+        if password is None or not hashers.is_password_usable(encoded):
+            return False, False
+        with metrics.timed('hash'):
+            return self.submit(_check_password, password, encoded).result()
+
+    async def amake_password(self, password):
+        """Awaitable variant of make_password."""
+        if password is None:
+            return hashers.make_password(None)
+        with metrics.timed('hash'):
+            return await asyncio.wrap_future(
+                self.submit(_make_password, password))
+
+    async def acheck_password(self, password, encoded):
+        """Awaitable variant of check_password."""
+        if password is None or not hashers.is_password_usable(encoded):
+            return False, False
+        with metrics.timed('hash'):
+            return await asyncio.wrap_future(
+                self.submit(_check_password, password, encoded))
+
+    def stats(self):
+        """Return queue depth and latency figures for monitoring."""
+        with self._lock:
+            in_flight = max(self.submitted - self.completed, 0)
+            completed = self.completed
+            return {
+                'backend': self.backend,
+                'workers': self.workers,
+                'submitted': self.submitted,
+                'completed': completed,
+                'in_flight': in_flight,
+                'queue_depth': max(in_flight - self.workers, 0),
+                'latency_avg': (self.latency_total / completed
+                                if completed else 0.0),
+                'latency_max': self.latency_max,
+            }
+
+    def reset_stats(self):
+        """Zero the counters reported by stats()."""
+        with self._lock:
+            self._reset_stats()
+
+
+executor = HashingExecutor.from_settings()
@@ -0,0 +1,61 @@
+"""
+Django management command to measure per-request connection overhead.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Measure connect + SELECT 1 + close cost per simulated request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Number of simulated requests.')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database alias to benchmark.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        iterations = options['iterations']
+        connection.close()
+
+        configured = self._measure(iterations, connection)
+        self.stdout.write(
+            f'{connection.vendor} via {type(connection).__module__}: '
+            f'{configured * 1000:.3f} ms per request')
+
+        if hasattr(connection, 'get_pool'):
+            direct = self._measure_direct(iterations, connection)
+            self.stdout.write(
+                f'without pool: {direct * 1000:.3f} ms per request '
+                f'({direct / configured:.1f}x slower)')
+            stats = connection.pool_stats()
+            self.stdout.write('pool: ' + ', '.join(
+                f'{key}={value:.4f}' if isinstance(value, float)
+                else f'{key}={value}' for key, value in stats.items()))
+
+    @staticmethod
+    def _measure(iterations, connection):
+        """Time Django's own open/query/close cycle, as in a request."""
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.close()
+        return (time.perf_counter() - started) / iterations
+
+    @staticmethod
+    def _measure_direct(iterations, connection):
+        """Time a fresh driver connection per request."""
+        params = connection.get_connection_params()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            raw = connection.Database.connect(**params)
+            with raw.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            raw.close()
+        return (time.perf_counter() - started) / iterations
@@ -0,0 +1,99 @@
+"""
+Django management command to measure the overhead of request metrics.
+"""
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+from core.metrics import RequestTimings, registry
+from core.middleware import RequestMetricsMiddleware
+
+
+class Command(BaseCommand):
+    help = ('Measure the cost of RequestMetricsMiddleware in isolation and '
+            'on GET /api/user/me/')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=2000,
+            help='Requests per measurement.')
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send; must be in ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        try:
+            self._isolated(iterations)
+            self._end_to_end(iterations, options['host'])
+        finally:
+            registry.clear()
+
+    def _isolated(self, iterations):
+        """Time the middleware around a view that does nothing."""
+        request = RequestFactory().get('/')
+        response = HttpResponse()
+        bare = self._time(lambda: response, iterations)
+        middleware = RequestMetricsMiddleware(lambda request: response)
+        wrapped = self._time(lambda: middleware(request), iterations)
+
+        timings = RequestTimings()
+        execute = lambda *args: None  # noqa: E731
+        query = self._time(
+            lambda: timings.query_wrapper(execute, '', (), False, {}),
+            iterations)
+        self.stdout.write(
+            f'middleware: {(wrapped - bare) * 1e6:.1f} us per request, '
+            f'query hook: {query * 1e6:.2f} us per query')
+
+    def _end_to_end(self, iterations, host):
+        """Compare median latency with metrics on and off, interleaved."""
+        name = f'bench-{uuid.uuid4().hex[:12]}'
+        user = get_user_model().objects.create_user(
+            email=f'{name}@example.com', username=name,
+            password=uuid.uuid4().hex)
+        token = Token.objects.db_manager(
+            sharding.database_of(user)).create(user=user)
+        client = Client(HTTP_HOST=host,
+                        HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('user:me')
+        toggles = {
+            enabled: override_settings(REQUEST_METRICS={
+                **getattr(settings, 'REQUEST_METRICS', {}),
+                'ENABLED': enabled})
+            for enabled in (False, True)
+        }
+        samples = {False: [], True: []}
+        try:
+            client.get(url)
+            for i in range(iterations * 2):
+                enabled = bool(i % 2)
+                with toggles[enabled]:
+                    started = time.perf_counter()
+                    client.get(url)
+                    samples[enabled].append(time.perf_counter() - started)
+        finally:
+            user.delete()
+
+        off = statistics.median(samples[False])
+        on = statistics.median(samples[True])
+        self.stdout.write(
+            f'GET {url}: median {off * 1e6:.1f} us off, '
+            f'{on * 1e6:.1f} us on ({(on - off) / off * 100:+.1f}%)')
+
+    @staticmethod
+    def _time(fn, iterations):
+        fn()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - started) / iterations
@@ -0,0 +1,114 @@
+"""
+Django management command to measure the middleware saved on API routes.
+"""
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+from core.middleware import MiddlewareChain, route_middleware
+
+DISPATCHER = 'core.middleware.RouteMiddlewareDispatcher'
+
+
+def flat_middleware(path):
+    """Return MIDDLEWARE with the dispatcher replaced by path's chain."""
+    middleware = []
+    for entry in settings.MIDDLEWARE:
+        if entry == DISPATCHER:
+            middleware += route_middleware(path) or []
+        else:
+            middleware.append(entry)
+    return middleware
+
+
+class Command(BaseCommand):
+    help = ('Compare the full middleware chain with the one '
+            'ROUTE_MIDDLEWARE runs for GET /api/user/me/')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=2000,
+            help='Requests per measurement.')
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send; must be in ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        url = reverse('user:me')
+        iterations = options['iterations']
+        self._isolated(url, iterations, options['host'])
+        self._end_to_end(url, iterations, options['host'])
+
+    def _isolated(self, url, iterations, host):
+        """Time both chains around a view that does nothing."""
+        response = HttpResponse()
+        factory = RequestFactory(HTTP_HOST=host)
+        results = {}
+        for name, middleware in (('full', route_middleware('/')),
+                                 ('api', route_middleware(url))):
+            chain = MiddlewareChain(middleware, lambda request: response)
+
+            def call():
+                request = factory.get(url)
+                chain.handler(request)
+                for hook in chain.view_hooks:
+                    hook(request, None, (), {})
+
+            results[name] = self._time(call, iterations)
+        bare = self._time(lambda: factory.get(url), iterations)
+        full, api = results['full'] - bare, results['api'] - bare
+        self.stdout.write(
+            f'middleware only: full chain {full * 1e6:.1f} us, '
+            f'api chain {api * 1e6:.1f} us per request '
+            f'({(full - api) * 1e6:.1f} us saved)')
+
+    def _end_to_end(self, url, iterations, host):
+        """Compare median latency with and without the dispatcher."""
+        name = f'bench-{uuid.uuid4().hex[:12]}'
+        user = get_user_model().objects.create_user(
+            email=f'{name}@example.com', username=name,
+            password=uuid.uuid4().hex)
+        token = Token.objects.db_manager(
+            sharding.database_of(user)).create(user=user)
+        clients = {}
+        for label, middleware in (('full', flat_middleware('/')),
+                                  ('routed', list(settings.MIDDLEWARE))):
+            client = Client(HTTP_HOST=host,
+                            HTTP_AUTHORIZATION=f'Token {token.key}')
+            # The test client builds its handler on the first request
+            with override_settings(MIDDLEWARE=middleware):
+                client.get(url)
+            clients[label] = client
+        samples = {label: [] for label in clients}
+        try:
+            for i in range(iterations * 2):
+                label = ('full', 'routed')[i % 2]
+                started = time.perf_counter()
+                clients[label].get(url)
+                samples[label].append(time.perf_counter() - started)
+        finally:
+            user.delete()
+
+        full = statistics.median(samples['full'])
+        routed = statistics.median(samples['routed'])
+        self.stdout.write(
+            f'GET {url}: median {full * 1e6:.1f} us full chain, '
+            f'{routed * 1e6:.1f} us routed '
+            f'({(routed - full) / full * 100:+.1f}%)')
+
+    @staticmethod
+    def _time(fn, iterations):
+        fn()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - started) / iterations
@@ -0,0 +1,29 @@
+"""
+Django management command to pre-generate the OpenAPI schema.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import write_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Render the OpenAPI schema into SPECTACULAR_CACHE_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', default=None,
+            help='Output directory (default: SPECTACULAR_CACHE_DIR).')
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or settings.SPECTACULAR_CACHE_DIR
+        if not directory:
+            raise CommandError(
+                'Set SPECTACULAR_CACHE_DIR or pass --directory.')
+
+        manifest = write_artifacts(directory)
+
+        for media_type, item in manifest.items():
+            self.stdout.write(f'{media_type} -> {item["file"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema written to {directory}'))
@@ -0,0 +1,172 @@
+"""
+Django management command to profile the cold start of the project.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under -X importtime; the phases mirror what a
+# WSGI worker does before it can serve its first request
+STARTUP_SCRIPT = '''
+import json, resource, time
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+configured = time.perf_counter()
+django.setup()
+set_up = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+loaded = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+print(json.dumps({
+    'phases': {
+        'settings': configured - started,
+        'django.setup()': set_up - configured,
+        'middleware': loaded - set_up,
+        'urlconf': routed - loaded,
+    },
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+PHASES = ('settings', 'django.setup()', 'middleware', 'urlconf')
+
+
+def parse_importtime(output):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # the header line
+        modules[fields[2].strip()] = (own, cumulative)
+    return modules
+
+
+def group_of(module, app_modules):
+    """Return the installed app module holding module, or its package."""
+    for name in app_modules:
+        if module == name or module.startswith(name + '.'):
+            return name
+    return module.partition('.')[0]
+
+
+class Command(BaseCommand):
+    help = ('Report import time per app and module and the time spent in '
+            'django.setup() for a cold interpreter')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Cold starts to measure; medians are reported.')
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Apps and modules to list.')
+        parser.add_argument(
+            '--profile', choices=('development', 'production'),
+            help='Settings profile to start with (default: inherited).')
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        runs = [self._cold_start(options['profile'])
+                for _ in range(options['repeat'])]
+        report = self._summarize(runs, options['top'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._write(report)
+
+    def _cold_start(self, profile):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        if profile:
+            env['DJANGO_SETTINGS_PROFILE'] = profile
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(
+                'Startup failed:\n' + process.stderr[-2000:])
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result['modules'] = parse_importtime(process.stderr)
+        return result
+
+    def _summarize(self, runs, top):
+        app_modules = sorted(
+            (config.name for config in apps.get_app_configs()),
+            key=len, reverse=True)
+        names = set().union(*(run['modules'] for run in runs))
+        modules = {
+            name: [statistics.median(
+                run['modules'].get(name, (0, 0))[i] for run in runs)
+                for i in (0, 1)]
+            for name in names
+        }
+        groups = {}
+        for name, (own, _) in modules.items():
+            group = groups.setdefault(group_of(name, app_modules), [0, 0])
+            group[0] += own
+            group[1] += 1
+        by_time = lambda item: item[1][0]  # noqa: E731
+        return {
+            'runs': len(runs),
+            'phases_ms': {
+                phase: statistics.median(
+                    run['phases'][phase] for run in runs) * 1000
+                for phase in PHASES
+            },
+            'import_ms': sum(own for own, _ in modules.values()) / 1000,
+            'max_rss_kb': statistics.median(
+                run['max_rss_kb'] for run in runs),
+            'apps': [
+                {'name': name, 'self_ms': own / 1000, 'modules': count}
+                for name, (own, count) in sorted(
+                    groups.items(), key=by_time, reverse=True)[:top]
+            ],
+            'modules': [
+                {'name': name, 'self_ms': own / 1000,
+                 'cumulative_ms': cumulative / 1000}
+                for name, (own, cumulative) in sorted(
+                    modules.items(), key=by_time, reverse=True)[:top]
+            ],
+        }
+
+    def _write(self, report):
+        self.stdout.write(
+            f'Cold start, median of {report["runs"]} run(s):')
+        for phase, ms in report['phases_ms'].items():
+            self.stdout.write(f'  {phase:<16} {ms:9.1f} ms')
+        self.stdout.write(
+            f'  {"total":<16} {sum(report["phases_ms"].values()):9.1f} ms '
+            f'(imports {report["import_ms"]:.1f} ms, '
+            f'max RSS {report["max_rss_kb"] / 1024:.1f} MiB)')
+        self.stdout.write('Import time by app or package (self):')
+        for app in report['apps']:
+            self.stdout.write(
+                f'  {app["name"]:<40} {app["self_ms"]:9.1f} ms '
+                f'{app["modules"]:5d} modules')
+        self.stdout.write('Slowest modules (self / cumulative):')
+        for module in report['modules']:
+            self.stdout.write(
+                f'  {module["name"]:<40} {module["self_ms"]:9.1f} ms '
+                f'{module["cumulative_ms"]:9.1f} ms')
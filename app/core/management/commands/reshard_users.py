@@ -0,0 +1,75 @@
+"""
+Django management command to move users to the shard that owns them.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import sharding
+
+
+class Command(BaseCommand):
+    help = ('Index users in the global UserIndex and move users and their '
+            'tokens, in batches, to the shard the hash ring assigns them')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Users scanned per batch and transaction.')
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches.')
+        parser.add_argument(
+            '--database', action='append', dest='databases', default=None,
+            help='Alias to move users off; repeat for several (default: '
+                 'every shard and the default database).')
+        parser.add_argument(
+            '--index-only', action='store_true',
+            help='Only add missing users to the index.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count the users that would move without moving them.')
+
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError('USER_SHARDS is empty; set DB_SHARDS.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        sources = options['databases'] or sharding.databases()
+        unknown = set(sources) - set(connections)
+        if unknown:
+            raise CommandError(
+                f'Unknown database(s): {", ".join(sorted(unknown))}.')
+
+        if not options['dry_run']:
+            for source in sources:
+                indexed = sharding.build_index(source, options['batch_size'])
+                self.stdout.write(f'{source}: {indexed} users indexed.')
+        if options['index_only']:
+            return
+
+        for source in sources:
+            self.move(source, options)
+
+    def move(self, source, options):
+        started = time.perf_counter()
+        batches = scanned = moved = pinned = 0
+        slowest = 0.0
+        for batch in sharding.move_users(
+                source, batch_size=options['batch_size'],
+                sleep=options['sleep'], dry_run=options['dry_run']):
+            batches += 1
+            scanned += batch.scanned
+            moved += batch.moved
+            pinned += batch.pinned
+            slowest = max(slowest, batch.elapsed)
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'  up to id {batch.last_id}: moved {batch.moved} of '
+                    f'{batch.scanned} in {batch.elapsed * 1000:.1f} ms')
+        action = 'would move' if options['dry_run'] else 'moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{source}: {action} {moved} of {scanned} users in {batches} '
+            f'batches, {time.perf_counter() - started:.2f}s (slowest batch '
+            f'{slowest * 1000:.1f} ms, {pinned} pinned).'))
@@ -0,0 +1,103 @@
+"""
+Django management command to serve the project with preforked workers.
+"""
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import server
+
+
+def parse_bind(value):
+    """Return (host, port) from HOST:PORT, [IPV6]:PORT or PORT."""
+    host, _, port = value.rpartition(':')
+    host = host.strip('[]') or '0.0.0.0'
+    try:
+        return host, int(port)
+    except ValueError:
+        raise CommandError(f'Invalid address {value!r}; use HOST:PORT.')
+
+
+class Command(BaseCommand):
+    help = ('Preload the project once and serve it from forked worker '
+            'processes. Signals: TERM or INT stop gracefully, QUIT stops '
+            'at once, HUP replaces the workers, USR1 reports memory.')
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        options = getattr(settings, 'SERVE', {})
+        parser.add_argument(
+            '--bind', default=options.get('BIND', '0.0.0.0:8000'),
+            help='HOST:PORT to listen on.')
+        parser.add_argument(
+            '--workers', type=int, default=options.get('WORKERS', 0),
+            help='Worker processes (default: one per core).')
+        parser.add_argument(
+            '--max-requests', type=int,
+            default=options.get('MAX_REQUESTS', 0),
+            help='Requests after which a worker is replaced; 0 never.')
+        parser.add_argument(
+            '--max-requests-jitter', type=int,
+            default=options.get('MAX_REQUESTS_JITTER', 0),
+            help='Random extra requests per worker, so they do not all '
+                 'restart at once.')
+        parser.add_argument(
+            '--graceful-timeout', type=float,
+            default=options.get('GRACEFUL_TIMEOUT', 30.0),
+            help='Seconds workers get to finish requests when stopping.')
+        parser.add_argument(
+            '--request-timeout', type=float,
+            default=options.get('REQUEST_TIMEOUT', 60.0),
+            help='Seconds a client may take to send or read a response.')
+        parser.add_argument(
+            '--access-log', action='store_true',
+            help='Log every request.')
+
+    def handle(self, *args, **options):
+        age = server.process_age()
+        started = time.monotonic() - (age or 0.0)
+        if options['workers'] < 0 or options['max_requests'] < 0:
+            raise CommandError(
+                '--workers and --max-requests cannot be negative.')
+        workers = options['workers'] or server.default_workers()
+        host, port = parse_bind(options['bind'])
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        try:
+            listener = socket.create_server(
+                (host, port), family=family, backlog=2048)
+        except OSError as exc:
+            raise CommandError(f'Cannot listen on {host}:{port}: {exc}')
+
+        self.check(display_num_errors=False)
+        application, timings = server.preload()
+        self.stdout.write(
+            'Preloaded in {:.0f} ms ({}).'.format(
+                sum(timings.values()) * 1000,
+                ', '.join(f'{phase} {seconds * 1000:.0f} ms'
+                          for phase, seconds in timings.items())))
+        self.stdout.write(
+            f'Listening on http://{host}:{port}/ with {workers} worker(s), '
+            f'pid {os.getpid()}.')
+
+        prefork = server.PreforkServer(
+            application, listener, workers,
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            graceful_timeout=options['graceful_timeout'],
+            request_timeout=options['request_timeout'],
+            access_log=options['access_log'],
+            log=self.log)
+        try:
+            prefork.run(started)
+        finally:
+            listener.close()
+        self.stdout.write('Stopped.')
+
+    def log(self, message):
+        # Workers log too; nothing may sit in a buffer across a fork
+        self.stdout.write(message)
+        self.stdout.flush()
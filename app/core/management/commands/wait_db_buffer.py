@@ -1,24 +1,98 @@
 """
 Django management command to wait for the database buffer to be ready.
 """
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
 
 class Command(BaseCommand):
     help = 'Wait for the database buffer to be ready'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases', default=None,
+            help='Database alias to probe; repeat for several '
+                 '(default: every configured alias).')
+        parser.add_argument(
+            '--timeout', type=float, default=60.0,
+            help='Seconds to wait overall before failing.')
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.05,
+            help='First retry delay in seconds; doubles on every retry.')
+        parser.add_argument(
+            '--max-delay', type=float, default=2.0,
+            help='Upper bound for a single retry delay in seconds.')
+
+    def probe(self, alias):
+        """Run SELECT 1 on alias, raising if it is unavailable."""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()
+
+    def wait_for(self, alias, deadline, initial_delay, max_delay):
+        """Probe alias with jittered exponential backoff until deadline."""
+        started = time.monotonic()
+        delay = initial_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.probe(alias)
+                return attempts, time.monotonic() - started
+            except Exception as exc:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database {alias!r} unavailable after {attempts} '
+                        f'attempt(s): {exc}')
+                # Equal jitter keeps retries spread out but never zero
+                pause = min(delay / 2 + random.uniform(0, delay / 2),
+                            remaining)
+                self.stdout.write(
+                    f'Database {alias!r} unavailable, retrying in '
+                    f'{pause * 1000:.0f} ms...')
+                time.sleep(pause)
+                delay = min(delay * 2, max_delay)
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database buffer...')
+        aliases = options['databases'] or list(connections)
+        unknown = set(aliases) - set(connections)
+        if unknown:
+            raise CommandError(
+                'Unknown database alias(es): {}'.format(
+                    ', '.join(sorted(unknown))))
+        started = time.monotonic()
+        deadline = started + options['timeout']
 
-        is_db_up = False
-        while not is_db_up:
-            try:
-                self.check(databases=['default'])
-                is_db_up = True
-            except Exception:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            futures = {
+                alias: executor.submit(
+                    self.wait_for, alias, deadline,
+                    options['initial_delay'], options['max_delay'])
+                for alias in aliases
+            }
+            results = {}
+            errors = []
+            for alias, future in futures.items():
+                try:
+                    results[alias] = future.result()
+                except CommandError as exc:
+                    errors.append(str(exc))
+        if errors:
+            raise CommandError(' '.join(errors))
 
+        for alias, (attempts, elapsed) in results.items():
+            self.stdout.write(
+                f'{alias}: ready after {attempts} attempt(s) in '
+                f'{elapsed * 1000:.0f} ms')
+        self.stdout.write(
+            f'Timing: total {(time.monotonic() - started) * 1000:.0f} ms')
         self.stdout.write(self.style.SUCCESS('Database is ready!'))
@@ -0,0 +1,232 @@
+"""
+Per-request timings and in-process Prometheus metrics.
+"""
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Any other method a client sends is counted as 'other', so clients cannot
+# add series
+METHODS = frozenset(
+    ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+class RequestTimings:
+    """Durations and counts of the phases of one request."""
+
+    __slots__ = ('durations', 'counts')
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, phase, seconds, count=1):
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+
+def current():
+    """Return the timings of the current request, if it is measured."""
+    return _current.get()
+
+
+def begin(timings):
+    """Measure the current request into timings; returns a token."""
+    return _current.set(timings)
+
+
+def end(token):
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Add the time spent in the block to phase of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram keyed by label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        """Yield (suffix, labels, extra_labels, value) for exposition."""
+        with self._lock:
+            series = {labels: (list(counts), total)
+                      for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield ('_bucket', labels, (('le', _format_value(
+                    float(bound))),), cumulative)
+            yield '_sum', labels, (), total
+            yield '_count', labels, (), cumulative
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Gauge:
+    """Gauge whose labelled values are read from a callback at scrape."""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labels, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield '', labels, (), value
+
+    def clear(self):
+        pass
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format."""
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for suffix, labels, extra, value in metric.samples():
+                lines.append('{}{}{} {}'.format(
+                    metric.name, suffix,
+                    _format_labels(metric.labels, labels, extra),
+                    _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling requests.',
+    labels=('route', 'method', 'status')))
+PHASE_DURATION = registry.register(Histogram(
+    'http_request_phase_duration_seconds',
+    'Time spent per request in each phase (db, hash, validate, serialize, '
+    'render).',
+    labels=('route', 'phase')))
+QUERY_COUNT = registry.register(Histogram(
+    'http_request_db_queries', 'Database queries per request.',
+    labels=('route',), buckets=COUNT_BUCKETS))
+
+
+def _hashing_stats():
+    from core.hashing import executor
+
+    stats = executor.stats()
+    for key in ('in_flight', 'queue_depth', 'latency_avg', 'latency_max'):
+        yield (key,), stats[key]
+
+
+registry.register(Gauge(
+    'password_hashing_executor', 'Password hashing executor statistics.',
+    labels=('stat',), callback=_hashing_stats))
+
+
+def observe_request(route, method, status, total, timings):
+    """Record a finished request in the histograms."""
+    if method not in METHODS:
+        method = 'other'
+    REQUEST_DURATION.observe(total, route, method, str(status))
+    for phase, seconds in timings.durations.items():
+        PHASE_DURATION.observe(seconds, route, phase)
+    QUERY_COUNT.observe(timings.counts.get('db', 0), route)
+
+
+def server_timing(total, timings):
+    """Return a Server-Timing header value for timings."""
+    entries = []
+    for phase, seconds in timings.durations.items():
+        entry = f'{phase};dur={seconds * 1000:.2f}'
+        if phase == 'db':
+            entry += f';desc="{timings.counts[phase]} queries"'
+        entries.append(entry)
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
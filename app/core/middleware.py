@@ -0,0 +1,174 @@
+"""
+Middleware for the project.
+"""
+import contextlib
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from core import metrics
+from core.db import routing
+
+
+class RequestMetricsMiddleware:
+    """Time each request's phases for Server-Timing and /metrics.
+
+    Queries are timed with connection.execute_wrapper, hashing by the
+    hashing executor and serializers by core.serializers; rendering of
+    template responses is timed here.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = getattr(settings, 'REQUEST_METRICS', {})
+        if not options.get('ENABLED', True):
+            return self.get_response(request)
+
+        timings = metrics.RequestTimings()
+        token = metrics.begin(timings)
+        started = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.end(token)
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.view_name if match is not None else 'unmatched'
+        metrics.observe_request(
+            route, request.method, response.status_code, total, timings)
+        if options.get('SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(total, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        timings = metrics.current()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda _: timings.add(
+                'render', time.perf_counter() - started))
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """Pin a client's reads to the primary for a while after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            return self.get_response(request)
+
+        keys = routing.request_keys(request)
+        token = routing.begin(pinned=routing.any_pinned(keys), keys=keys)
+        try:
+            response = self.get_response(request)
+            state = routing.current()
+        finally:
+            routing.end(token)
+
+        if state.wrote:
+            routing.pin(state.keys)
+        return response
+
+
+class MiddlewareChain:
+    """A middleware stack built the way BaseHandler builds MIDDLEWARE."""
+
+    def __init__(self, middleware, get_response):
+        self.middleware = list(middleware)
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+        handler = convert_exception_to_response(get_response)
+        for path in reversed(self.middleware):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if instance is None:
+                raise ImproperlyConfigured(
+                    f'Middleware factory {path} returned None.')
+            if hasattr(instance, 'process_view'):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_hooks.append(
+                    instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self.exception_hooks.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.handler = handler
+
+
+def route_middleware(path, routes=None):
+    """Return the middleware list ROUTE_MIDDLEWARE assigns to path."""
+    if routes is None:
+        routes = getattr(settings, 'ROUTE_MIDDLEWARE', {})
+    prefix = max((prefix for prefix in routes if path.startswith(prefix)),
+                 key=len, default=None)
+    return routes[prefix] if prefix is not None else None
+
+
+class RouteMiddlewareDispatcher:
+    """Run the middleware chain configured for the request's URL prefix.
+
+    ROUTE_MIDDLEWARE maps path prefixes to middleware lists; the longest
+    prefix matching request.path_info wins and '' catches everything else.
+    process_view, process_template_response and process_exception hooks
+    of the chosen chain run, in Django's order, at the dispatcher's place
+    in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        routes = getattr(settings, 'ROUTE_MIDDLEWARE', {})
+        if '' not in routes:
+            raise ImproperlyConfigured(
+                "ROUTE_MIDDLEWARE needs a '' prefix for unmatched paths.")
+        self.routes = [
+            (prefix, MiddlewareChain(middleware, get_response))
+            for prefix, middleware in sorted(
+                routes.items(), key=lambda item: len(item[0]), reverse=True)
+        ]
+
+    def chain_for(self, request):
+        path = request.path_info
+        for prefix, chain in self.routes:
+            if path.startswith(prefix):
+                return chain
+
+    def __call__(self, request):
+        return self.chain_for(request).handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for hook in self.chain_for(request).view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for hook in self.chain_for(request).template_response_hooks:
+            response = hook(request, response)
+            if response is None:
+                raise ValueError(
+                    f'{hook.__self__.__class__.__name__}.process_template_'
+                    f"response didn't return an HttpResponse object.")
+        return response
+
+    def process_exception(self, request, exception):
+        for hook in self.chain_for(request).exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['name', 'id'], name='core_user_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'is_staff', 'id'], name='core_user_act_staff_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'is_staff', 'name', 'id'], name='core_user_act_staff_name_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Reject emails and usernames that differ from existing ones by case.
+
+    Expression indexes are not expressible as model constraints before
+    Django 4.0, so the indexes are created with SQL that PostgreSQL and
+    SQLite both accept. Existing case-variant duplicates must be resolved
+    before applying this migration.
+    """
+
+    dependencies = [
+        ('core', '0005_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_user_email_ci_uniq '
+            'ON core_user (lower(email))',
+            'DROP INDEX core_user_email_ci_uniq',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_user_username_ci_uniq '
+            'ON core_user (lower(username))',
+            'DROP INDEX core_user_username_ci_uniq',
+        ),
+    ]
@@ -0,0 +1,31 @@
+import core.db.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Switch email and username to the case-insensitive field classes.
+
+    Only the lookups change, so nothing touches the database; SQLite would
+    otherwise rebuild the table and drop the lower() indexes of 0006.
+    """
+
+    dependencies = [
+        ('core', '0006_user_case_insensitive_unique'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='user',
+                name='email',
+                field=core.db.fields.CaseInsensitiveEmailField(
+                    max_length=255, unique=True),
+            ),
+            migrations.AlterField(
+                model_name='user',
+                name='username',
+                field=core.db.fields.CaseInsensitiveCharField(
+                    max_length=255, unique=True),
+            ),
+        ]),
+    ]
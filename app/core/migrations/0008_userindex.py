@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+import core.db.fields
+
+
+class Migration(migrations.Migration):
+    """Global user index for sharded users, on the default database only.
+
+    Like core_user, emails and usernames are unique regardless of case
+    through lower() indexes.
+    """
+
+    dependencies = [
+        ('core', '0007_user_case_insensitive_lookups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', core.db.fields.CaseInsensitiveEmailField(max_length=255, unique=True)),
+                ('username', core.db.fields.CaseInsensitiveCharField(max_length=255, unique=True)),
+                ('shard', models.CharField(default='', max_length=100)),
+            ],
+            options={
+                'verbose_name_plural': 'user index',
+            },
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_userindex_email_ci_uniq '
+            'ON core_userindex (lower(email))',
+            'DROP INDEX core_userindex_email_ci_uniq',
+            hints={'model_name': 'userindex'},
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_userindex_username_ci_uniq '
+            'ON core_userindex (lower(username))',
+            'DROP INDEX core_userindex_username_ci_uniq',
+            hints={'model_name': 'userindex'},
+        ),
+    ]
@@ -0,0 +1,49 @@
+import core.db.fields
+from django.db import migrations
+
+PREFIX_FIELDS = ('username', 'email', 'name')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX core_user_{field}_prefix_idx '
+            f'ON core_user ((lower({field})) COLLATE "C")')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_FIELDS:
+        schema_editor.execute(f'DROP INDEX core_user_{field}_prefix_idx')
+
+
+class Migration(migrations.Migration):
+    """Index lower(username), lower(email) and lower(name) for prefix search.
+
+    In the C collation a btree serves LIKE 'prefix%' whatever the database
+    collation, as text_pattern_ops would, and also returns rows in the
+    order core.search sorts them, so a LIMIT stops the scan early. SQLite
+    cannot use an expression index for LIKE and gets none. name becomes a
+    case-insensitive field for its istartswith lookup; nothing else about
+    it changes.
+    """
+
+    dependencies = [
+        ('core', '0008_userindex'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='user',
+                name='name',
+                field=core.db.fields.CaseInsensitiveCharField(
+                    default='', max_length=255),
+            ),
+        ]),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes,
+                             hints={'model_name': 'user'}),
+    ]
@@ -1,15 +1,54 @@
 """
 Database models.
 """
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core import hashing
+from core.db import sharding
+from core.db.fields import CaseInsensitiveCharField, CaseInsensitiveEmailField
 
-class UserManager(BaseUserManager):
+# User fields copied into UserIndex
+INDEXED_FIELDS = ('email', 'username')
+
+
+class UserQuerySet(models.QuerySet):
+    """Sends get() by id, username or email to the user's shard."""
+
+    def get(self, *args, **kwargs):
+        if self._db is None and not args and sharding.is_enabled():
+            return self._get_sharded(kwargs)
+        return super().get(*args, **kwargs)
+
+    def _get_sharded(self, kwargs):
+        for name in ('pk', 'id'):
+            if name in kwargs:
+                alias = sharding.shard_for(kwargs[name])
+                try:
+                    return self.using(alias).get(**kwargs)
+                except self.model.DoesNotExist:
+                    # Not moved to its shard yet, or pinned elsewhere
+                    found = sharding.locate(pk=kwargs[name])
+                    if found is None or found[1] == alias:
+                        raise
+                    return self.using(found[1]).get(**kwargs)
+        for name in INDEXED_FIELDS:
+            for lookup in (name, f'{name}__iexact'):
+                if lookup in kwargs:
+                    found = sharding.locate(**{lookup: kwargs[lookup]})
+                    if found is None:
+                        raise self.model.DoesNotExist(
+                            f'{self.model._meta.object_name} matching query '
+                            f'does not exist.')
+                    return self.using(found[1]).get(**kwargs)
+        return super().get(**kwargs)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """Manager for users."""
 
     def create_user(self, email, username, password=None, **extra_fields):
@@ -23,26 +62,132 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def get_by_natural_key(self, username):
+        """Look users up by username regardless of case."""
+        return self.get(**{f'{self.model.USERNAME_FIELD}__iexact': username})
+
     def create_superuser(self, email, username, password, **extra_fields):
         """Create and return a new superuser."""
-        user = self.create_user(email, username, password, **extra_fields)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
+        # Set before the first save, which picks the database when sharded
+        extra_fields.setdefault('is_staff', True)
+        extra_fields.setdefault('is_superuser', True)
 
-        return user
+        return self.create_user(email, username, password, **extra_fields)
 
 
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
-    email = models.EmailField(max_length=255, unique=True)
-    username = models.CharField(max_length=255, unique=True)
-    name = models.CharField(max_length=255, default='')
+    # Unique regardless of case through lower() indexes (migration 0006)
+    # and searched by prefix through core.search
+    email = CaseInsensitiveEmailField(max_length=255, unique=True)
+    username = CaseInsensitiveCharField(max_length=255, unique=True)
+    # Not unique; the case-insensitive field class only adds the
+    # istartswith lookup served by the prefix index (migration 0009)
+    name = CaseInsensitiveCharField(max_length=255, default='')
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Signed access tokens carry this; bumping it revokes them all
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'username'
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['email']
+
+    class Meta:
+        indexes = [
+            # Keyset pagination for the staff user directory
+            models.Index(fields=['name', 'id'], name='core_user_name_id_idx'),
+            models.Index(fields=['is_active', 'is_staff', 'id'],
+                         name='core_user_act_staff_id_idx'),
+            models.Index(fields=['is_active', 'is_staff', 'name', 'id'],
+                         name='core_user_act_staff_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Bump the row version whenever anything but last_login changes."""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.version += 1
+        elif set(update_fields) - {'last_login'}:
+            self.version += 1
+            kwargs['update_fields'] = set(update_fields) | {'version'}
+        if sharding.is_enabled() and not args and (
+                update_fields is None
+                or set(INDEXED_FIELDS) & set(update_fields)):
+            self._save_indexed(**kwargs)
+        else:
+            super().save(*args, **kwargs)
+        if (sharding.is_enabled()
+                and sharding.home_for(self) == sharding.GLOBAL_DB_ALIAS
+                and self._state.db != sharding.GLOBAL_DB_ALIAS):
+            # Made staff: move beside the admin's tables
+            sharding.pin_user(self)
+
+    def _save_indexed(self, **kwargs):
+        """Save on the user's shard with UserIndex kept in step.
+
+        A new user takes its id from UserIndex. The index is written first
+        and in the same transaction on the global database, so an email or
+        username taken on any shard fails the save.
+        """
+        index = sharding.index()
+        with transaction.atomic(using=sharding.GLOBAL_DB_ALIAS):
+            if self._state.adding and self.pk is None:
+                entry = index.create(email=self.email,
+                                     username=self.username)
+                self.pk = entry.pk
+                if kwargs.get('using') is None:
+                    kwargs['using'] = sharding.home_for(self)
+                index.filter(pk=self.pk).update(shard=kwargs['using'])
+            else:
+                index.filter(pk=self.pk).update(
+                    **{name: getattr(self, name) for name in INDEXED_FIELDS})
+                if not self._state.adding:
+                    # A row moved by reshard_users must not be re-created
+                    # on its old shard by a stale instance
+                    kwargs.setdefault('force_update', True)
+            super().save(**kwargs)
+
+    @property
+    def etag(self):
+        """Strong ETag identifying this version of the user."""
+        return f'"{self.pk}-{self.version}"'
+
+    def revoke_tokens(self):
+        """Invalidate every signed access token issued so far."""
+        self.token_version += 1
+        self.save(update_fields=['token_version'])
+
+    def set_password(self, raw_password):
+        """Hash the password on the hashing executor."""
+        self.password = hashing.executor.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify the password on the hashing executor."""
+        valid, must_update = hashing.executor.check_password(
+            raw_password, self.password)
+        if must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return valid
+
+
+class UserIndex(models.Model):
+    """Where each user lives when users are sharded (see core.db.sharding).
+
+    Kept on the default database only; its primary key is the user id.
+    """
+    email = CaseInsensitiveEmailField(max_length=255, unique=True)
+    username = CaseInsensitiveCharField(max_length=255, unique=True)
+    shard = models.CharField(max_length=100, default='')
+
+    class Meta:
+        verbose_name_plural = 'user index'
+
+    def __str__(self):
+        return f'{self.username} on {self.shard}'
@@ -0,0 +1,124 @@
+"""
+Sliding-window rate limiting.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class LocalBackend:
+    """Thread-safe in-process window counters, bounded to max_keys."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, limit, now):
+        """Count a hit on key unless it is over limit.
+
+        Returns (allowed, previous, current) window counts.
+        """
+        index = int(now // window)
+        with self._lock:
+            start, previous, current = self._counts.get(key, (index, 0, 0))
+            if start != index:
+                previous = current if start == index - 1 else 0
+                current = 0
+            allowed = _estimate(previous, current, now, window) < limit
+            if allowed:
+                current += 1
+            self._counts[key] = (index, previous, current)
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+        return allowed, previous, current
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class CacheBackend:
+    """Window counters in a Django cache shared by every worker.
+
+    Reading and incrementing are separate cache calls, so concurrent
+    workers may overshoot the limit by a few hits.
+    """
+
+    key_prefix = 'ratelimit:'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def hit(self, key, window, limit, now):
+        index = int(now // window)
+        previous_key = f'{self.key_prefix}{key}:{index - 1}'
+        current_key = f'{self.key_prefix}{key}:{index}'
+        counts = self.cache.get_many([previous_key, current_key])
+        previous = counts.get(previous_key, 0)
+        current = counts.get(current_key, 0)
+        allowed = _estimate(previous, current, now, window) < limit
+        if allowed:
+            # Keys live for two windows so the next one can weigh them
+            if self.cache.add(current_key, 1, math.ceil(window * 2)):
+                current = 1
+            else:
+                try:
+                    current = self.cache.incr(current_key)
+                except ValueError:
+                    self.cache.set(current_key, 1, math.ceil(window * 2))
+                    current = 1
+        return allowed, previous, current
+
+    def clear(self):
+        pass
+
+
+def _estimate(previous, current, now, window):
+    """Weigh the previous window by how much of it still overlaps."""
+    elapsed = now % window
+    return previous * (1 - elapsed / window) + current
+
+
+class SlidingWindowLimiter:
+    """Allows limit hits per key in any window-second span.
+
+    Counts are kept per fixed window; the previous window is weighted by its
+    overlap with the sliding one, so each key costs two integers however
+    many hits it receives.
+    """
+
+    def __init__(self, limit, window, backend=None):
+        self.limit = limit
+        self.window = window
+        self.backend = backend if backend is not None else LocalBackend()
+
+    def hit(self, key, now=None):
+        """Record a hit on key; returns (allowed, retry_after_seconds)."""
+        if now is None:
+            now = time.time()
+        allowed, previous, current = self.backend.hit(
+            key, self.window, self.limit, now)
+        if allowed:
+            return True, 0.0
+        return False, self._retry_after(previous, current, now)
+
+    def _retry_after(self, previous, current, now):
+        remaining = self.window - now % self.window
+        if current >= self.limit or not previous:
+            return remaining
+        # Time until the previous window's weight drops enough
+        wait = self.window * (1 - (self.limit - current) / previous)
+        return max(0.0, min(wait - now % self.window, remaining))
+
+    def reset(self):
+        """Forget every counter held in process."""
+        self.backend.clear()
@@ -0,0 +1,160 @@
+"""
+Cached OpenAPI schema view.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+MANIFEST = 'manifest.json'
+
+SchemaEntry = namedtuple(
+    'SchemaEntry', ['content', 'content_type', 'etag', 'last_modified'])
+
+
+def _make_entry(content, content_type, last_modified=None):
+    etag = '"{}"'.format(hashlib.sha256(content).hexdigest()[:32])
+    if last_modified is None:
+        last_modified = int(time.time())
+    return SchemaEntry(content, content_type, etag, int(last_modified))
+
+
+def _artifact_name(media_type):
+    return media_type.replace('/', '_').replace('+', '_')
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    # SpectacularAPIView that generates the schema once per format.
+    #
+    # Rendered documents are kept per (media type, lang, version) and served
+    # with ETag/Last-Modified. lang is mapped onto settings.LANGUAGES and
+    # at most max_entries documents are kept, so clients cannot grow the
+    # cache with made-up values. If SPECTACULAR_CACHE_DIR holds an artifact
+    # written by the build_schema_cache command it is served instead of
+    # generating the schema at all. The docstring is inherited because it
+    # is published as the schema endpoint's description.
+    __doc__ = SpectacularAPIView.__doc__
+
+    max_entries = 64
+    _entries = {}
+    _lock = threading.Lock()
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        key = (request.accepted_media_type, self._language(request),
+               request.version)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._load_artifact(key) or self._build(
+                        request, key[1])
+                    while len(self._entries) >= self.max_entries:
+                        del self._entries[next(iter(self._entries))]
+                    self._entries[key] = entry
+
+        response = get_conditional_response(
+            request, etag=entry.etag, last_modified=entry.last_modified)
+        if response is None:
+            response = HttpResponse(
+                entry.content, content_type=entry.content_type)
+        response['ETag'] = entry.etag
+        response['Last-Modified'] = http_date(entry.last_modified)
+        return response
+
+    @staticmethod
+    def _language(request):
+        """The supported language asked for with ?lang=, else None."""
+        lang = request.GET.get('lang')
+        if not lang or not settings.USE_I18N:
+            return None
+        try:
+            return translation.get_supported_language_variant(lang)
+        except LookupError:
+            return None
+
+    def _build(self, request, lang):
+        """Render the schema as SpectacularAPIView would for lang."""
+        if lang:
+            with translation.override(lang):
+                response = self._get_schema_response(request)
+        else:
+            response = self._get_schema_response(request)
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+        return _make_entry(response.content, response['Content-Type'])
+
+    @staticmethod
+    def _load_artifact(key):
+        media_type, lang, version = key
+        directory = getattr(settings, 'SPECTACULAR_CACHE_DIR', None)
+        if not directory or lang or version:
+            return None
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                manifest = json.load(f)
+            item = manifest[media_type]
+            path = os.path.join(directory, item['file'])
+            with open(path, 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return _make_entry(content, item['content_type'],
+                           os.path.getmtime(path))
+
+    @classmethod
+    def warm(cls):
+        """Render the schema in every format ahead of the first request."""
+        from rest_framework.test import APIRequestFactory
+
+        factory = APIRequestFactory()
+        view = cls.as_view()
+        for renderer in cls.renderer_classes:
+            view(factory.get('/', HTTP_ACCEPT=renderer.media_type))
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget every rendered schema."""
+        with cls._lock:
+            cls._entries.clear()
+
+
+def write_artifacts(directory, view_class=CachedSpectacularAPIView):
+    """Render the schema for every renderer of view_class into directory."""
+    from rest_framework.test import APIRequestFactory
+
+    os.makedirs(directory, exist_ok=True)
+    factory = APIRequestFactory()
+    view = SpectacularAPIView.as_view(
+        renderer_classes=view_class.renderer_classes,
+        urlconf=view_class.urlconf,
+    )
+    manifest = {}
+    for renderer in view_class.renderer_classes:
+        media_type = renderer.media_type
+        request = factory.get('/', HTTP_ACCEPT=media_type)
+        response = view(request)
+        response.render()
+        name = _artifact_name(media_type)
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(response.content)
+        manifest[media_type] = {
+            'file': name,
+            'content_type': response['Content-Type'],
+        }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
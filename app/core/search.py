@@ -0,0 +1,207 @@
+"""
+Prefix search over users, shared by the user API and the admin.
+
+A user matches when its username, email or name starts with the search
+term, ignoring case. Username matches come first, then the others, each
+ordered by lowercased username. Every column has an index on its lower()
+value in the C collation (migration 0009) that answers the prefix and
+returns rows in that order, so a short, common prefix reads no more rows
+than it returns.
+"""
+import bisect
+import heapq
+import threading
+import time
+from itertools import chain, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Collate, Lower
+
+from core.db import sharding
+
+SEARCH_FIELDS = ('username', 'email', 'name')
+RESULT_FIELDS = ('id', 'username', 'email', 'name')
+
+# Code point order, the order Python sorts strings in
+BINARY_COLLATIONS = {'postgresql': 'C', 'sqlite': 'BINARY'}
+
+
+def get_options():
+    return getattr(settings, 'USER_SEARCH', {})
+
+
+def prefix_filter(prefix, fields=SEARCH_FIELDS):
+    """Q matching users with any of fields starting with prefix."""
+    query = Q()
+    for field in fields:
+        query |= Q(**{f'{field}__istartswith': prefix})
+    return query
+
+
+def order_by_username(queryset):
+    key = Lower('username')
+    collation = BINARY_COLLATIONS.get(connections[queryset.db].vendor)
+    if collation:
+        key = Collate(key, collation)
+    return queryset.order_by(key)
+
+
+def filter_users(queryset, term):
+    """Narrow queryset to the users matching term."""
+    term = term.strip()
+    if not term:
+        return queryset
+    return queryset.filter(prefix_filter(term))
+
+
+def _username_key(row):
+    return row['username'].lower()
+
+
+def _query(query, limit):
+    results = [
+        list(order_by_username(users).values(*RESULT_FIELDS)[:limit])
+        for users in sharding.spread(get_user_model().objects.filter(query))
+    ]
+    if len(results) == 1:
+        return results[0]
+    # Every shard sorted its rows in the order Python compares them
+    return list(islice(heapq.merge(*results, key=_username_key), limit))
+
+
+def search(term, limit):
+    """Return up to limit matches for term as dicts of RESULT_FIELDS.
+
+    With USER_SEARCH['MEMORY_INDEX'] on, username matches come from
+    username_index; a prefix with at least limit of them, which is what a
+    short, hot prefix has, is then answered without a query.
+    """
+    term = term.strip()
+    if not term or limit <= 0:
+        return []
+    if get_options().get('MEMORY_INDEX'):
+        matches = username_index.match(term, limit)
+    else:
+        matches = _query(prefix_filter(term, ['username']), limit)
+    if len(matches) < limit:
+        matches += _query(
+            prefix_filter(term, ['email', 'name'])
+            & ~prefix_filter(term, ['username']),
+            limit - len(matches))
+    return matches
+
+
+class UsernameIndex:
+    """Sorted in-process index of lowercased usernames.
+
+    Answers prefix queries with a bisection. It is loaded on first use,
+    or by the serve command before forking so workers share it, and kept
+    current by the user signals of this process (see core.signals). Users
+    created elsewhere or without signals, e.g. by bulk import, are read by
+    id every refresh_interval seconds; other changes made elsewhere show
+    after the full reload every ttl seconds.
+    """
+
+    def __init__(self, refresh_interval=5, ttl=300):
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self.clear()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the index from the USER_SEARCH setting."""
+        options = get_options()
+        return cls(refresh_interval=options.get('REFRESH_INTERVAL', 5),
+                   ttl=options.get('TTL', 300))
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def clear(self):
+        """Drop every entry; the next match() loads them again."""
+        with self._lock:
+            # Sorted (lowercased username, id) and id -> RESULT_FIELDS
+            self._keys = []
+            self._rows = {}
+            self._last_id = 0
+            self._loaded_at = self._synced_at = None
+
+    def _read(self, **lookup):
+        users = get_user_model()._base_manager.filter(**lookup)
+        return chain.from_iterable(
+            shard.values_list(*RESULT_FIELDS).iterator(chunk_size=5000)
+            for shard in sharding.spread(users))
+
+    def load(self):
+        """Read every user."""
+        rows = self._read()
+        with self._lock:
+            self.clear()
+            for row in rows:
+                self._rows[row[0]] = row
+            self._keys = sorted(
+                (row[1].lower(), row[0]) for row in self._rows.values())
+            self._last_id = max(self._rows, default=0)
+            self._loaded_at = self._synced_at = time.monotonic()
+
+    def _sync(self):
+        # Only rows read here advance the cursor: the signals of this
+        # process may add an id beyond one committed elsewhere
+        last_id = self._last_id
+        for row in self._read(pk__gt=self._last_id):
+            self._add(row)
+            last_id = max(last_id, row[0])
+        self._last_id = last_id
+        self._synced_at = time.monotonic()
+
+    def _add(self, row):
+        self._discard(row[0])
+        self._rows[row[0]] = row
+        bisect.insort(self._keys, (row[1].lower(), row[0]))
+
+    def _discard(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row is not None:
+            key = (row[1].lower(), user_id)
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def add(self, row):
+        """Add or replace the user with these RESULT_FIELDS values."""
+        with self._lock:
+            if self.loaded:
+                self._add(tuple(row))
+
+    def discard(self, user_id):
+        with self._lock:
+            self._discard(user_id)
+
+    def match(self, prefix, limit):
+        """Return up to limit users whose username starts with prefix."""
+        prefix = prefix.lower()
+        now = time.monotonic()
+        with self._lock:
+            if not self.loaded or now - self._loaded_at >= self.ttl:
+                self.load()
+            elif now - self._synced_at >= self.refresh_interval:
+                self._sync()
+            start = bisect.bisect_left(self._keys, (prefix,))
+            matches = []
+            for key, user_id in self._keys[start:start + limit]:
+                if not key.startswith(prefix):
+                    break
+                matches.append(dict(zip(RESULT_FIELDS,
+                                        self._rows[user_id])))
+        return matches
+
+
+username_index = UsernameIndex.from_settings()
@@ -0,0 +1,121 @@
+"""
+Serializer helpers shared across apps.
+"""
+import operator
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+from core.metrics import timed
+
+# Fields whose to_representation returns model values unchanged
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class TimedSerializerMixin:
+    """Report validation and output time to the request's Server-Timing."""
+
+    def is_valid(self, *args, **kwargs):
+        with timed('validate'):
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """ListSerializer counterpart of TimedSerializerMixin."""
+
+
+class ReadSerializer:
+    """Precompiled, read-only counterpart of a DRF serializer.
+
+    The readable fields of serializer_class are resolved once per class;
+    representations are then built straight from model attributes or
+    values_list() rows, calling a DRF field only for values it would
+    actually transform. Output equals serializer_class(instance).data.
+    """
+
+    serializer_class = None
+
+    @classmethod
+    def _plan(cls):
+        plan = cls.__dict__.get('_compiled')
+        if plan is None:
+            plan = cls._compile()
+            cls._compiled = plan
+        return plan
+
+    @classmethod
+    def _compile(cls):
+        names, sources, converters = [], [], []
+        for name, field in cls.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(
+                    f'{cls.__name__} cannot read {name!r} from '
+                    f'{field.source!r}.')
+            names.append(name)
+            sources.append(field.source)
+            converters.append(
+                None if type(field) in PLAIN_FIELDS
+                else field.to_representation)
+        getter = operator.attrgetter(*sources)
+        if len(sources) == 1:
+            getter = (lambda get: lambda instance: (get(instance),))(getter)
+        if not any(converters):
+            converters = None
+        return tuple(names), tuple(sources), getter, converters
+
+    @classmethod
+    def sources(cls):
+        """Attribute names to pass to only() or values_list()."""
+        return cls._plan()[1]
+
+    @classmethod
+    def _build(cls, values, names, converters):
+        if converters is None:
+            return dict(zip(names, values))
+        return {
+            name: value if convert is None or value is None
+            else convert(value)
+            for name, value, convert in zip(names, values, converters)
+        }
+
+    @classmethod
+    def to_representation(cls, instance):
+        names, _, getter, converters = cls._plan()
+        return cls._build(getter(instance), names, converters)
+
+    @classmethod
+    def many(cls, instances):
+        names, _, getter, converters = cls._plan()
+        return [cls._build(getter(instance), names, converters)
+                for instance in instances]
+
+    @classmethod
+    def from_values(cls, rows):
+        """Build representations from values_list(*sources()) rows."""
+        names, _, _, converters = cls._plan()
+        return [cls._build(row, names, converters) for row in rows]
+
+    @classmethod
+    def data(cls, instance):
+        """to_representation, timed as the request's serialize phase."""
+        with timed('serialize'):
+            return cls.to_representation(instance)
+
+    @classmethod
+    def data_many(cls, instances):
+        """many(), timed as the request's serialize phase."""
+        with timed('serialize'):
+            return cls.many(instances)
@@ -0,0 +1,467 @@
+"""
+Preforking WSGI server used by the serve command.
+
+The parent process loads the project once (application, URLconf,
+serializers, schema), freezes the garbage collector and forks workers that
+share those pages copy-on-write. Each worker serves one request at a time
+from the shared listening socket and is replaced after max_requests.
+
+Signals to the parent: TERM or INT stop gracefully, QUIT stops at once,
+HUP replaces every worker gracefully and USR1 reports worker memory.
+"""
+import atexit
+import gc
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from collections import namedtuple
+
+from django.core.servers.basehttp import (
+    WSGIRequestHandler, WSGIServer, get_internal_wsgi_application,
+)
+from django.db import connections
+from django.urls import URLPattern, get_resolver
+
+from core.db.pool import all_pools
+
+MemoryUsage = namedtuple('MemoryUsage', ['rss', 'pss', 'shared', 'private'])
+
+POLL_INTERVAL = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def process_age():
+    """Return seconds since this process started, or None if unknown."""
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces; fields follow its ')'
+            fields = f.read().rpartition(')')[2].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+
+
+def memory_usage(pid):
+    """Return the MemoryUsage of pid in KiB, or None if unavailable.
+
+    PSS splits each shared page between the processes mapping it, so the
+    sum of PSS over the parent and its workers is what they really use;
+    private is what a worker no longer shares with anyone.
+    """
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if rest.strip().endswith('kB'):
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError):
+        return None
+    return MemoryUsage(
+        values.get('Rss', 0), values.get('Pss', 0),
+        values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0),
+        values.get('Private_Clean', 0) + values.get('Private_Dirty', 0))
+
+
+def default_workers():
+    """One worker per core this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _view_classes(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern):
+            view = getattr(pattern.callback, 'cls', None) or getattr(
+                pattern.callback, 'view_class', None)
+            if view is not None:
+                yield view
+        else:
+            yield from _view_classes(pattern.url_patterns)
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def preload():
+    """Load everything a worker needs for its first request.
+
+    Returns the WSGI application and the time taken per phase.
+    """
+    from core import search
+    from core.schema import CachedSpectacularAPIView
+    from core.serializers import ReadSerializer
+
+    timings = {}
+    started = time.perf_counter()
+    application = get_internal_wsgi_application()
+    timings['application'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    views = set(_view_classes(get_resolver().url_patterns))
+    timings['urlconf'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for view in views:
+        serializer_class = getattr(view, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+    for read_serializer in _subclasses(ReadSerializer):
+        if read_serializer.serializer_class is not None:
+            read_serializer._plan()
+    timings['serializers'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    CachedSpectacularAPIView.warm()
+    timings['schema'] = time.perf_counter() - started
+
+    if search.get_options().get('MEMORY_INDEX'):
+        # Shared with the workers copy-on-write, like everything above
+        started = time.perf_counter()
+        search.username_index.load()
+        timings['search'] = time.perf_counter() - started
+    return application, timings
+
+
+def warm_pools():
+    """Open the minimum pooled connections of every database.
+
+    Pools are per process, so this runs in the process that serves. A
+    database that cannot be reached is logged and left to connect on first
+    use. Returns the number of connections opened.
+    """
+    opened = 0
+    for connection in connections.all():
+        if not hasattr(connection, 'warm_pool'):
+            continue
+        try:
+            opened += connection.warm_pool()
+        except Exception:
+            logger.warning('Could not warm the %r connection pool.',
+                           connection.alias, exc_info=True)
+    return opened
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Django's request handler, one request per connection.
+
+    A worker serves a single connection at a time, so keep-alive would
+    let one idle client hold it.
+    """
+
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class WorkerServer(WSGIServer):
+    """WSGIServer accepting from a socket bound by the parent."""
+
+    def __init__(self, listener, application, access_log=False,
+                 request_timeout=None):
+        super().__init__(listener.getsockname(), RequestHandler,
+                         bind_and_activate=False)
+        self.socket.close()
+        self.socket = listener
+        self.server_address = listener.getsockname()
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self.setup_environ()
+        self.set_app(application)
+        self.access_log = access_log
+        self.request_timeout = request_timeout
+        self.handled = 0
+
+    def get_request(self):
+        connection, address = super().get_request()
+        # A slow client must not hold a worker indefinitely
+        connection.settimeout(self.request_timeout)
+        return connection, address
+
+    def finish_request(self, request, client_address):
+        self.handled += 1
+        super().finish_request(request, client_address)
+
+    def server_close(self):
+        """Leave the listening socket to the other workers."""
+
+
+class Worker:
+    """Parent-side record of a worker process."""
+
+    def __init__(self, pid, generation):
+        self.pid = pid
+        self.generation = generation
+        self.forked = time.monotonic()
+        self.ready = None
+
+
+class PreforkServer:
+    """Fork workers from a preloaded parent and keep them running."""
+
+    def __init__(self, application, listener, workers, max_requests=0,
+                 max_requests_jitter=0, graceful_timeout=30.0,
+                 request_timeout=60.0, access_log=False, log=print):
+        self.application = application
+        self.listener = listener
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.request_timeout = request_timeout
+        self.access_log = access_log
+        self.log = log
+        self.workers = {}
+        self.generation = 0
+        self.ready_at = None
+        self.stopping = False
+        self._signals = []
+
+    # Parent
+
+    def run(self, started=None):
+        """Serve until stopped; started is the time startup began."""
+        started = started or time.monotonic()
+        self.listener.setblocking(False)
+        self._ready_r, self._ready_w = os.pipe()
+        self._wake_r, self._wake_w = os.pipe()
+        for fd in (self._wake_r, self._wake_w):
+            os.set_blocking(fd, False)
+        signal.set_wakeup_fd(self._wake_w)
+        for signum in (signal.SIGCHLD, signal.SIGHUP, signal.SIGINT,
+                       signal.SIGQUIT, signal.SIGTERM, signal.SIGUSR1):
+            signal.signal(signum, self._queue_signal)
+
+        # Connections opened while preloading must not be shared; the
+        # workers warm their own pools
+        connections.close_all()
+        for pool in all_pools().values():
+            pool.close_all()
+        # Objects that survive to here live as long as the parent: keep the
+        # collector from writing to their pages in every worker
+        gc.collect()
+        gc.freeze()
+
+        try:
+            self._spawn_missing()
+            self._loop(started)
+        except BaseException:
+            self.stop(graceful=False)
+            raise
+        finally:
+            signal.set_wakeup_fd(-1)
+            for fd in (self._ready_r, self._ready_w, self._wake_r,
+                       self._wake_w):
+                os.close(fd)
+
+    def _queue_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _loop(self, started):
+        readers = [self._ready_r, self._wake_r]
+        while True:
+            ready, _, _ = select.select(readers, [], [], 1.0)
+            if self._wake_r in ready:
+                self._drain(self._wake_r)
+            if self._ready_r in ready:
+                self._read_ready(started)
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGCHLD:
+                    self._reap()
+                elif signum == signal.SIGHUP:
+                    self.reload()
+                elif signum == signal.SIGUSR1:
+                    self.report_memory()
+                else:
+                    self.stop(graceful=signum != signal.SIGQUIT)
+                    return
+            self._reap()
+            self._spawn_missing()
+
+    @staticmethod
+    def _drain(fd):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read_ready(self, started):
+        for line in os.read(self._ready_r, 4096).decode().split():
+            worker = self.workers.get(int(line))
+            if worker is None:
+                continue
+            worker.ready = time.monotonic()
+            self.log(f'Worker {worker.pid} ready '
+                     f'{(worker.ready - worker.forked) * 1000:.1f} ms '
+                     f'after fork.')
+        if self.ready_at is None and all(
+                worker.ready for worker in self.workers.values()):
+            self.ready_at = time.monotonic()
+            self.log(f'Serving with {len(self.workers)} worker(s), ready '
+                     f'{(self.ready_at - started) * 1000:.0f} ms after '
+                     f'startup began.')
+            self.report_memory()
+
+    def _spawn_missing(self):
+        current = sum(1 for worker in self.workers.values()
+                      if worker.generation == self.generation)
+        for _ in range(self.num_workers - current):
+            self.spawn()
+
+    def spawn(self):
+        limit = self.max_requests
+        if limit and self.max_requests_jitter:
+            # Spread restarts so workers are not all replaced at once
+            limit += random.randint(0, self.max_requests_jitter)
+        # Buffered output would otherwise be written by both processes
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = Worker(pid, self.generation)
+            return pid
+        code = 1
+        try:
+            code = self._run_worker(limit)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code > 0 and worker.ready is None and not self.stopping:
+                # Respawning would only fail again
+                raise RuntimeError(
+                    f'Worker {pid} failed to boot (exit code {code}).')
+            if code:
+                self.log(f'Worker {pid} exited with code {code}.')
+
+    def reload(self):
+        """Replace every worker, letting each finish its request."""
+        self.generation += 1
+        old = list(self.workers.values())
+        self._spawn_missing()
+        for worker in old:
+            self._kill(worker.pid, signal.SIGTERM)
+        self.log(f'Reloading: replacing {len(old)} worker(s).')
+
+    def stop(self, graceful=True):
+        """Stop every worker, waiting up to graceful_timeout if graceful."""
+        self.stopping = True
+        signum = signal.SIGTERM if graceful else signal.SIGQUIT
+        for pid in list(self.workers):
+            self._kill(pid, signum)
+        deadline = time.monotonic() + (
+            self.graceful_timeout if graceful else 0)
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+            self._reap()
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGKILL)
+        while self.workers:
+            pid, _ = os.waitpid(-1, 0)
+            self.workers.pop(pid, None)
+
+    def _kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def report_memory(self):
+        """Log RSS, PSS and private memory of the parent and workers."""
+        rows = [('parent', os.getpid())] + [
+            ('worker', pid) for pid in sorted(self.workers)]
+        total = 0
+        for role, pid in rows:
+            usage = memory_usage(pid)
+            if usage is None:
+                self.log(f'  {role} {pid}: memory usage unavailable')
+                continue
+            total += usage.pss
+            self.log(f'  {role} {pid}: rss {usage.rss / 1024:.1f} MiB, '
+                     f'pss {usage.pss / 1024:.1f} MiB, private '
+                     f'{usage.private / 1024:.1f} MiB')
+        if total:
+            self.log(f'  total pss {total / 1024:.1f} MiB')
+
+    # Worker
+
+    def _run_worker(self, limit):
+        """Serve from the shared socket; return the exit code."""
+        parent = os.getppid()
+        self._stopping = False
+        signal.set_wakeup_fd(-1)
+        for signum in (signal.SIGCHLD, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(signum, signal.SIG_DFL)
+        # Ctrl-C reaches the whole process group; the parent decides
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, self._stop_worker)
+        signal.signal(signal.SIGQUIT, lambda signum, frame: os._exit(0))
+        for fd in (self._ready_r, self._wake_r, self._wake_w):
+            os.close(fd)
+        # Its own wakeup pipe, so TERM interrupts the wait for a request
+        wake_r, wake_w = os.pipe()
+        for fd in (wake_r, wake_w):
+            os.set_blocking(fd, False)
+        signal.set_wakeup_fd(wake_w)
+        warm_pools()
+
+        server = WorkerServer(
+            self.listener, self.application, access_log=self.access_log,
+            request_timeout=self.request_timeout)
+        os.write(self._ready_w, f'{os.getpid()}\n'.encode())
+        os.close(self._ready_w)
+        while not self._stopping and os.getppid() == parent:
+            if limit and server.handled >= limit:
+                self.log(f'Worker {os.getpid()} served {server.handled} '
+                         f'requests; restarting.')
+                break
+            # handle_request() would not wait on a non-blocking socket
+            ready, _, _ = select.select(
+                [self.listener, wake_r], [], [], POLL_INTERVAL)
+            if wake_r in ready:
+                self._drain(wake_r)
+            elif ready:
+                # Another worker may win the accept; that is not an error
+                server._handle_request_noblock()
+
+        # Run what a normal exit would, e.g. flushing buffered last_login
+        # writes, before os._exit skips it
+        atexit._run_exitfuncs()
+        connections.close_all()
+        return 0
+
+    def _stop_worker(self, signum, frame):
+        self._stopping = True
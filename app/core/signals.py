@@ -0,0 +1,83 @@
+"""
+Signal handlers for the core app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from core.backends import permission_cache
+from core.db import sharding
+from core.search import RESULT_FIELDS, username_index
+
+CHANGES = ('post_add', 'post_remove', 'post_clear')
+
+
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set,
+                                using=None, **kwargs):
+    """Forget the permissions of users whose groups or grants changed.
+
+    The stamps move once the change commits; moved any earlier, another
+    process could cache the old set under the new stamp.
+    """
+    if action not in CHANGES:
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set:
+        user_ids = list(pk_set)
+    else:
+        # e.g. group.user_set.clear(): the users are no longer known
+        transaction.on_commit(permission_cache.invalidate_all, using=using)
+        return
+
+    def invalidate():
+        for user_id in user_ids:
+            permission_cache.invalidate_user(user_id)
+    transaction.on_commit(invalidate, using=using)
+
+
+def invalidate_all_permissions(sender, action=None, using=None, **kwargs):
+    """Forget every cached permission set once a group change commits."""
+    if action is None or action in CHANGES:
+        transaction.on_commit(permission_cache.invalidate_all, using=using)
+
+
+def drop_user_index(sender, instance, **kwargs):
+    """Free a deleted user's email and username across shards."""
+    if sharding.is_enabled():
+        sharding.index().filter(pk=instance.pk).delete()
+
+
+def index_username(sender, instance, using=None, **kwargs):
+    """Add a saved user to the search index once the save commits."""
+    row = tuple(getattr(instance, field) for field in RESULT_FIELDS)
+    transaction.on_commit(lambda: username_index.add(row), using=using)
+
+
+def unindex_username(sender, instance, using=None, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: username_index.discard(user_id),
+                          using=using)
+
+
+User = get_user_model()
+for through in (User.groups.through, User.user_permissions.through):
+    m2m_changed.connect(
+        invalidate_user_permissions, sender=through,
+        dispatch_uid=f'core.invalidate_user_permissions.{through.__name__}')
+m2m_changed.connect(invalidate_all_permissions,
+                    sender=Group.permissions.through,
+                    dispatch_uid='core.invalidate_group_permissions')
+post_save.connect(invalidate_all_permissions, sender=Group,
+                  dispatch_uid='core.invalidate_permissions_group_save')
+post_delete.connect(invalidate_all_permissions, sender=Group,
+                    dispatch_uid='core.invalidate_permissions_group_delete')
+post_delete.connect(invalidate_all_permissions, sender=Permission,
+                    dispatch_uid='core.invalidate_permissions_delete')
+post_delete.connect(drop_user_index, sender=User,
+                    dispatch_uid='core.drop_user_index')
+post_save.connect(index_username, sender=User,
+                  dispatch_uid='core.index_username')
+post_delete.connect(unindex_username, sender=User,
+                    dispatch_uid='core.unindex_username')
@@ -0,0 +1,49 @@
+"""
+Test runner for the project.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.test.runner import DiscoverRunner
+
+from user import last_login
+
+# Databases the sharding tests spread users over, whether or not DB_SHARDS
+# is set; they declare them with databases and override_settings
+TEST_SHARDS = ['test_shard_0', 'test_shard_1']
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner adapted to the project's background work and shards.
+
+    last_login is written on the request thread: a background flush would
+    write while a test holds its transaction open, or after the test
+    databases are gone. Tests of the buffer opt back in with
+    override_settings.
+
+    Users are unsharded too, whatever DB_SHARDS says, so tests need not
+    know where users live. TEST_SHARDS are added as copies of the default
+    database for the sharding tests, which opt in with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._last_login = settings.LAST_LOGIN
+        settings.LAST_LOGIN = {**settings.LAST_LOGIN, 'MODE': 'sync'}
+        self._user_shards = getattr(settings, 'USER_SHARDS', [])
+        settings.USER_SHARDS = []
+        default = settings.DATABASES[DEFAULT_DB_ALIAS]
+        for alias in TEST_SHARDS:
+            database = {**default, 'TEST': {}}
+            if default['ENGINE'] != 'django.db.backends.sqlite3':
+                database['NAME'] = f'{default["NAME"]}_{alias}'
+            settings.DATABASES.setdefault(alias, database)
+
+    def teardown_databases(self, old_config, **kwargs):
+        last_login.buffer.clear()
+        last_login.buffer.stop()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        settings.LAST_LOGIN = self._last_login
+        settings.USER_SHARDS = self._user_shards
+        super().teardown_test_environment(**kwargs)
@@ -2,30 +2,78 @@
 Docstring for app.core.tests.test_commands
 """
 
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import SimpleTestCase
 
 
-@patch('core.management.commands.wait_db_buffer.Command.check')
+@patch('core.management.commands.wait_db_buffer.Command.probe')
 class CommandTests(SimpleTestCase):
     """Tests for the custom Django management commands."""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def call(self, *args):
+        out = StringIO()
+        call_command('wait_db_buffer', *args, stdout=out)
+        return out.getvalue()
+
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database when database is available."""
-        patched_check.return_value = True
+        patched_probe.return_value = None
 
-        call_command('wait_db_buffer')
+        self.call('--database', 'default')
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default')
 
     @patch("time.sleep")
-    def test_wait_for_db_not_ready(self, patched_sleep, patched_check):
+    def test_wait_for_db_not_ready(self, patched_sleep, patched_probe):
         """Test waiting for database when database is not available."""
-        patched_check.side_effect = [Psycopg2Error] * 5 + [True]
+        patched_probe.side_effect = [Psycopg2Error] * 5 + [None]
+
+        output = self.call('--database', 'default')
+
+        self.assertEqual(patched_probe.call_count, 6)
+        patched_probe.assert_called_with('default')
+        self.assertIn('ready after 6 attempt(s)', output)
+
+    @patch("time.sleep")
+    def test_backoff_is_exponential_and_capped(self, patched_sleep,
+                                               patched_probe):
+        """Test retry delays start small, double and respect the cap."""
+        patched_probe.side_effect = [Psycopg2Error] * 6 + [None]
+
+        self.call('--database', 'default', '--initial-delay', '0.01',
+                  '--max-delay', '0.08')
+
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        caps = [0.01, 0.02, 0.04, 0.08, 0.08, 0.08]
+        for delay, cap in zip(delays, caps):
+            self.assertGreaterEqual(delay, cap / 2)
+            self.assertLessEqual(delay, cap)
+
+    def test_deadline_exceeded(self, patched_probe):
+        """Test the command fails once the deadline has passed."""
+        patched_probe.side_effect = Psycopg2Error('connection refused')
+
+        with self.assertRaises(CommandError) as ctx:
+            self.call('--database', 'default', '--timeout', '0')
+
+        self.assertIn("'default' unavailable", str(ctx.exception))
+
+    def test_probes_every_alias_by_default(self, patched_probe):
+        """Test every configured alias is probed when none is given."""
+        patched_probe.return_value = None
+
+        self.call()
+
+        self.assertIn('default', [c.args[0] for c in
+                                  patched_probe.call_args_list])
 
-        call_command('wait_db_buffer')
+    def test_unknown_alias(self, patched_probe):
+        """Test unknown aliases are rejected up front."""
+        with self.assertRaises(CommandError):
+            self.call('--database', 'nope')
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        patched_probe.assert_not_called()
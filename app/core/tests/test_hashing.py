@@ -0,0 +1,114 @@
+"""
+Tests for the password hashing executor.
+"""
+import asyncio
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase, TestCase
+
+from core.hashing import HashingExecutor
+
+
+class HashingExecutorTests(SimpleTestCase):
+    """Tests for HashingExecutor."""
+
+    def test_process_backend_hashes_and_verifies(self):
+        """Test hashing round-trips through worker processes."""
+        executor = HashingExecutor(backend='process', workers=2)
+        try:
+            encoded = executor.make_password('testpass123')
+            self.assertEqual(
+                executor._get_pool()._mp_context.get_start_method(), 'spawn')
+
+            self.assertTrue(check_password('testpass123', encoded))
+            self.assertEqual(
+                executor.check_password('testpass123', encoded),
+                (True, False),
+            )
+            self.assertEqual(
+                executor.check_password('wrongpass', encoded),
+                (False, False),
+            )
+        finally:
+            executor.shutdown()
+
+    def test_make_passwords_preserves_order(self):
+        """Test bulk hashing returns hashes in input order."""
+        executor = HashingExecutor(backend='thread', workers=2)
+        passwords = [f'password{i}' for i in range(5)]
+
+        hashes = executor.make_passwords(passwords, chunk_size=2)
+
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+        executor.shutdown()
+
+    def test_unusable_password_skips_pool(self):
+        """Test None passwords never reach the pool."""
+        executor = HashingExecutor(backend='inline')
+
+        encoded = executor.make_password(None)
+
+        self.assertEqual(executor.check_password(None, encoded),
+                         (False, False))
+        self.assertEqual(executor.stats()['submitted'], 0)
+
+    def test_async_api(self):
+        """Test the awaitable API returns the same results."""
+        executor = HashingExecutor(backend='thread', workers=1)
+
+        async def run():
+            encoded = await executor.amake_password('testpass123')
+            return await executor.acheck_password('testpass123', encoded)
+
+        self.assertEqual(asyncio.run(run()), (True, False))
+        executor.shutdown()
+
+    def test_stats(self):
+        """Test latency and queue depth are reported."""
+        executor = HashingExecutor(backend='inline', workers=1)
+        executor.make_password('testpass123')
+
+        stats = executor.stats()
+
+        self.assertEqual(stats['submitted'], 1)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreater(stats['latency_max'], 0)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected."""
+        with self.assertRaises(ValueError):
+            HashingExecutor(backend='gpu')
+
+
+class UserHashingTests(TestCase):
+    """Tests that user passwords go through the executor."""
+
+    @patch('core.hashing.executor.make_password', return_value='!hashed')
+    def test_create_user_uses_executor(self, patched_make):
+        """Test create_user hashes on the executor."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+        )
+
+        patched_make.assert_called_once_with('testpass123')
+        self.assertEqual(user.password, '!hashed')
+
+    def test_check_password_uses_executor(self):
+        """Test check_password verifies on the executor."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+        )
+
+        with patch('core.hashing.executor.check_password',
+                   return_value=(True, False)) as patched_check:
+            self.assertTrue(user.check_password('testpass123'))
+
+        patched_check.assert_called_once_with('testpass123', user.password)
@@ -0,0 +1,134 @@
+"""
+Tests for request metrics.
+"""
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram, Registry, registry
+from user.authentication import token_cache
+from user.throttles import reset_throttles
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+METRICS_URL = reverse('metrics')
+
+
+def parse_server_timing(header):
+    """Return {name: {param: value}} for a Server-Timing header."""
+    metrics = {}
+    for entry in header.split(','):
+        name, *params = entry.strip().split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class HistogramTests(SimpleTestCase):
+    """Tests for the Prometheus exposition."""
+
+    def test_render(self):
+        """Test buckets are cumulative and labels are escaped."""
+        metrics = Registry()
+        histogram = metrics.register(Histogram(
+            'latency_seconds', 'Latency.', labels=('route',),
+            buckets=(0.1, 1)))
+        histogram.observe(0.05, 'a"b')
+        histogram.observe(0.5, 'a"b')
+
+        lines = metrics.render().splitlines()
+
+        self.assertEqual(lines, [
+            '# HELP latency_seconds Latency.',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{route="a\\"b",le="0.1"} 1',
+            'latency_seconds_bucket{route="a\\"b",le="1"} 2',
+            'latency_seconds_bucket{route="a\\"b",le="+Inf"} 2',
+            'latency_seconds_sum{route="a\\"b"} 0.55',
+            'latency_seconds_count{route="a\\"b"} 2',
+        ])
+
+
+class RequestMetricsTests(TestCase):
+    """Tests for RequestMetricsMiddleware and the metrics endpoint."""
+
+    def setUp(self):
+        registry.clear()
+        token_cache.clear()
+        reset_throttles()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', username='testuser',
+            password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        registry.clear()
+        token_cache.clear()
+
+    def test_server_timing(self):
+        """Test queries, serialization and rendering are reported."""
+        res = self.client.get(ME_URL)
+
+        timing = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(timing['db']['desc'], '"1 queries"')
+        self.assertIn('serialize', timing)
+        self.assertIn('render', timing)
+        self.assertGreaterEqual(float(timing['total']['dur']),
+                                float(timing['db']['dur']))
+
+    def test_hashing_reported(self):
+        """Test password verification time is reported on login."""
+        res = APIClient().post(TOKEN_URL, {'username': 'testuser',
+                                           'password': 'testpass123'})
+
+        timing = parse_server_timing(res['Server-Timing'])
+        self.assertIn('hash', timing)
+        self.assertIn('validate', timing)
+
+    def test_metrics_endpoint(self):
+        """Test requests are aggregated under their route."""
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        body = res.content.decode()
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{route="user:me",method="GET",status="200"} 2', body)
+        self.assertIn('http_request_db_queries_bucket'
+                      '{route="user:me",le="1"} 2', body)
+        self.assertIn('password_hashing_executor{stat="in_flight"}', body)
+
+    def test_unknown_methods_share_a_series(self):
+        """Test made-up methods do not each add a series."""
+        for method in ('BREW', 'WHEN', 'PURGE'):
+            self.client.generic(method, ME_URL)
+
+        body = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{route="user:me",method="other",status="405"} 3', body)
+        self.assertNotIn('BREW', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test the endpoint requires the bearer token when configured."""
+        client = APIClient()
+
+        self.assertEqual(client.get(METRICS_URL).status_code, 401)
+        client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(client.get(METRICS_URL).status_code, 200)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        """Test nothing is recorded when metrics are disabled."""
+        res = self.client.get(ME_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertNotIn('route="user:me"', registry.render())
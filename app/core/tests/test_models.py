@@ -60,3 +60,20 @@ class ModelsTests(TestCase):
             password='superpass123'
         )
         self.assertTrue(user.is_superuser)
+
+    def test_save_bumps_version(self):
+        """Test saving a user bumps its version except for last_login"""
+        user = get_user_model().objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.assertEqual(user.version, 1)
+
+        user.name = 'New Name'
+        user.save(update_fields=['name'])
+        user.save(update_fields=['last_login'])
+        user.refresh_from_db()
+
+        self.assertEqual(user.version, 2)
+        self.assertEqual(user.etag, f'"{user.pk}-2"')
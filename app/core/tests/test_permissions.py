@@ -0,0 +1,165 @@
+"""
+Tests for the cached permission backend.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.permissions import DjangoModelPermissions
+from rest_framework.test import APIRequestFactory
+
+from core.backends import permission_cache
+
+
+def permission(codename):
+    return Permission.objects.get(codename=codename)
+
+
+class CachedModelBackendTests(TestCase):
+    """Tests for CachedModelBackend and its invalidation."""
+
+    def setUp(self):
+        permission_cache.invalidate_all()
+        self.user = get_user_model().objects.create_user(
+            email='staff@example.com', username='staff',
+            password='testpass123', is_staff=True)
+        self.group = Group.objects.create(name='editors')
+        self.group.permissions.add(permission('change_user'))
+        self.user.groups.add(self.group)
+        self.user.user_permissions.add(permission('view_user'))
+
+    def fresh_user(self):
+        """Load the user again, as a new request would."""
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_repeated_checks_hit_cache(self):
+        """Test only the first request queries the permission tables."""
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm('core.change_user'))
+
+        for _ in range(3):
+            user = self.fresh_user()
+            with self.assertNumQueries(0):
+                self.assertTrue(user.has_perm('core.change_user'))
+                self.assertTrue(user.has_perm('core.view_user'))
+                self.assertFalse(user.has_perm('core.delete_user'))
+                self.assertEqual(user.get_all_permissions(),
+                                 {'core.change_user', 'core.view_user'})
+
+    def test_user_permission_change_invalidates(self):
+        """Test granting a permission to the user shows up at once."""
+        self.fresh_user().has_perm('core.view_user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(permission('delete_user'))
+
+        self.assertTrue(self.fresh_user().has_perm('core.delete_user'))
+
+    def test_invalidated_when_change_commits(self):
+        """Test the cached set is kept until the change commits."""
+        self.fresh_user().has_perm('core.view_user')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.user.user_permissions.add(permission('delete_user'))
+                # What another process would still read from the database
+                user = self.fresh_user()
+                with self.assertNumQueries(0):
+                    self.assertFalse(user.has_perm('core.delete_user'))
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(self.fresh_user().has_perm('core.delete_user'))
+
+    def test_group_membership_change_invalidates(self):
+        """Test removing the user from a group, from either side."""
+        self.fresh_user().has_perm('core.change_user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm('core.change_user'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+        self.assertTrue(self.fresh_user().has_perm('core.change_user'))
+
+    def test_group_permission_change_invalidates(self):
+        """Test changing a group's permissions reaches its members."""
+        self.fresh_user().has_perm('core.change_user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(permission('add_user'))
+
+        self.assertTrue(self.fresh_user().has_perm('core.add_user'))
+
+    def test_group_clear_invalidates(self):
+        """Test clearing a group's members from the group side."""
+        self.fresh_user().has_perm('core.change_user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.clear()
+
+        self.assertFalse(self.fresh_user().has_perm('core.change_user'))
+
+    def test_group_save_invalidates(self):
+        """Test saving a group forces a recomputation."""
+        self.fresh_user().has_perm('core.change_user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.save()
+
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            user.has_perm('core.change_user')
+
+    def test_superuser_flag_invalidates(self):
+        """Test a new superuser does not get the old, narrower set."""
+        self.fresh_user().has_perm('core.change_user')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_superuser=True)
+
+        self.assertTrue(self.fresh_user().has_perm('core.delete_user'))
+
+    def test_inactive_user_has_no_permissions(self):
+        """Test inactive users are refused before the cache is read."""
+        self.fresh_user().has_perm('core.change_user')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False)
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('core.change_user'))
+
+    def test_drf_model_permissions(self):
+        """Test DjangoModelPermissions checks are served by the cache."""
+        self.user.user_permissions.add(permission('add_user'))
+        view = type('View', (), {
+            'queryset': get_user_model().objects.all()})()
+        check = DjangoModelPermissions()
+        factory = APIRequestFactory()
+
+        results = []
+        for queries in (2, 0, 0):
+            request = factory.post('/')
+            request.user = self.fresh_user()
+            request.method = 'POST'
+            with self.assertNumQueries(queries):
+                results.append(check.has_permission(request, view))
+
+        self.assertEqual(results, [True, True, True])
+
+    def test_admin_pages_reuse_permissions(self):
+        """Test admin renders after the first skip permission queries."""
+        self.client.force_login(self.user)
+        url = reverse('admin:index')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Users')
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'auth_permission' in query['sql']])
@@ -0,0 +1,163 @@
+"""
+Tests for the database connection pool.
+"""
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Minimal stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.rollbacks = 0
+        self.status = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, sql):
+                if connection.broken:
+                    raise OSError('server closed the connection')
+
+        return Cursor()
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = 0
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Tests for ConnectionPool."""
+
+    def make_pool(self, **kwargs):
+        self.created = []
+
+        def factory():
+            connection = FakeConnection()
+            self.created.append(connection)
+            return connection
+
+        return ConnectionPool(factory, **kwargs)
+
+    def test_reuses_connections(self):
+        """Test a released connection is handed out again."""
+        pool = self.make_pool()
+
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_pre_ping_discards_dead_connections(self):
+        """Test a connection failing SELECT 1 is replaced."""
+        pool = self.make_pool()
+        first = pool.acquire()
+        pool.release(first)
+        first.broken = True
+
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_release_rolls_back(self):
+        """Test open transactions are rolled back on release."""
+        pool = self.make_pool()
+        connection = pool.acquire()
+        connection.status = 2
+
+        pool.release(connection)
+
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_release_discard(self):
+        """Test connections released with discard are closed."""
+        pool = self.make_pool()
+        connection = pool.acquire()
+
+        pool.release(connection, discard=True)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_max_size_times_out(self):
+        """Test acquire waits for max_size and then gives up."""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a blocked acquire is woken by release."""
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, args=[connection])
+        timer.start()
+
+        self.assertIs(pool.acquire(), connection)
+        timer.join()
+
+    def test_idle_timeout_keeps_min_size(self):
+        """Test idle connections expire down to min_size."""
+        pool = self.make_pool(min_size=1, max_size=3, idle_timeout=10)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+
+        with patch('core.db.pool.time.monotonic',
+                   side_effect=lambda: 10 ** 6):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(sum(c.closed for c in connections), 2)
+
+    def test_warm(self):
+        """Test warm opens min_size idle connections."""
+        pool = self.make_pool(min_size=3, max_size=5)
+
+        self.assertEqual(pool.warm(), 3)
+        self.assertEqual(pool.stats()['idle'], 3)
+        self.assertEqual(pool.warm(), 0)
+
+    def test_fork_forgets_parent_connections(self):
+        """Test a child process never reuses or closes inherited ones."""
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+
+        with patch('core.db.pool.os.getpid', return_value=-1):
+            fresh = pool.acquire()
+
+        self.assertIsNot(fresh, connection)
+        self.assertFalse(connection.closed)
+
+    def test_invalid_sizes(self):
+        """Test impossible size limits are rejected."""
+        with self.assertRaises(ValueError):
+            self.make_pool(min_size=5, max_size=2)
@@ -0,0 +1,89 @@
+"""
+Tests for sliding-window rate limiting.
+"""
+from django.test import SimpleTestCase, override_settings
+
+from core.ratelimit import CacheBackend, LocalBackend, SlidingWindowLimiter
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'ratelimit-tests',
+}}
+
+
+class SlidingWindowLimiterTests(SimpleTestCase):
+    """Tests for SlidingWindowLimiter."""
+
+    def make_limiter(self, backend=None):
+        return SlidingWindowLimiter(limit=3, window=10, backend=backend)
+
+    def test_limit_within_window(self):
+        """Test hits beyond the limit are refused until the window slides."""
+        limiter = self.make_limiter()
+
+        allowed = [limiter.hit('key', now=100 + i)[0] for i in range(4)]
+
+        self.assertEqual(allowed, [True, True, True, False])
+
+    def test_keys_are_independent(self):
+        """Test each key has its own budget."""
+        limiter = self.make_limiter()
+        for _ in range(3):
+            limiter.hit('a', now=100)
+
+        self.assertFalse(limiter.hit('a', now=100)[0])
+        self.assertTrue(limiter.hit('b', now=100)[0])
+
+    def test_previous_window_is_weighted(self):
+        """Test hits from the previous window count by their overlap."""
+        limiter = self.make_limiter()
+        for _ in range(3):
+            limiter.hit('key', now=109)
+
+        # 10% into the next window 2.7 of the earlier hits still count
+        self.assertTrue(limiter.hit('key', now=111)[0])
+        self.assertFalse(limiter.hit('key', now=112)[0])
+        # Halfway through only 1.5 count, leaving room for one more hit
+        self.assertTrue(limiter.hit('key', now=115)[0])
+        self.assertFalse(limiter.hit('key', now=115)[0])
+
+    def test_retry_after(self):
+        """Test the suggested wait is when the next hit would pass."""
+        limiter = self.make_limiter()
+        for _ in range(3):
+            limiter.hit('key', now=109)
+        limiter.hit('key', now=111)
+
+        allowed, retry_after = limiter.hit('key', now=112)
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.333, places=2)
+        self.assertTrue(limiter.hit('key', now=112 + retry_after + 0.01)[0])
+
+    def test_refused_hits_are_not_counted(self):
+        """Test a rejected flood does not extend the lockout."""
+        limiter = self.make_limiter()
+        for i in range(100):
+            limiter.hit('key', now=100 + i * 0.01)
+
+        self.assertTrue(limiter.hit('key', now=120)[0])
+
+    def test_local_backend_is_bounded(self):
+        """Test the in-process backend evicts the oldest keys."""
+        backend = LocalBackend(max_keys=2)
+        limiter = self.make_limiter(backend)
+        for key in 'abc':
+            limiter.hit(key, now=100)
+
+        self.assertEqual(list(backend._counts), ['b', 'c'])
+
+    @override_settings(CACHES=LOCMEM)
+    def test_cache_backend(self):
+        """Test the shared backend enforces the same limit."""
+        limiter = self.make_limiter(CacheBackend('default'))
+        limiter.backend.cache.clear()
+
+        allowed = [limiter.hit('key', now=100 + i)[0] for i in range(4)]
+
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertTrue(limiter.hit('key', now=125)[0])
@@ -0,0 +1,223 @@
+"""
+Tests for the route middleware dispatcher.
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import path, reverse
+from rest_framework.authtoken.models import Token
+
+from core.checks import check_admin_middleware
+from core.middleware import RouteMiddlewareDispatcher, route_middleware
+
+calls = []
+
+
+def ok_view(request):
+    calls.append('view')
+    return HttpResponse('ok')
+
+
+def template_view(request):
+    return TemplateResponse(
+        request, engines['django'].from_string('{{ value }}'),
+        {'value': 'rendered'})
+
+
+def failing_view(request):
+    raise ValueError('boom')
+
+
+urlpatterns = [
+    path('ok', ok_view),
+    path('api/ok', ok_view),
+    path('other/ok', ok_view),
+    path('other/template', template_view),
+    path('other/fail', failing_view),
+]
+
+
+def recorder(name, short_circuit=False, handle_exceptions=False):
+    """Build a middleware class logging its hooks into calls."""
+
+    class Recorder:
+        def __init__(self, get_response):
+            self.get_response = get_response
+
+        def __call__(self, request):
+            calls.append(f'{name}:call')
+            return self.get_response(request)
+
+        def process_view(self, request, view_func, view_args, view_kwargs):
+            calls.append(f'{name}:view')
+            if short_circuit:
+                return HttpResponse(name)
+            return None
+
+        def process_template_response(self, request, response):
+            calls.append(f'{name}:template')
+            response.context_data['value'] += f'+{name}'
+            return response
+
+        def process_exception(self, request, exception):
+            calls.append(f'{name}:exception')
+            if handle_exceptions:
+                return HttpResponse(f'handled by {name}', status=500)
+            return None
+
+    return Recorder
+
+
+First = recorder('first')
+Second = recorder('second', handle_exceptions=True)
+Blocker = recorder('blocker', short_circuit=True)
+
+MODULE = 'core.tests.test_route_middleware'
+
+
+@override_settings(
+    ROOT_URLCONF=MODULE,
+    MIDDLEWARE=['core.middleware.RouteMiddlewareDispatcher'],
+    ROUTE_MIDDLEWARE={
+        '/api/': [],
+        '/other/': [f'{MODULE}.First', f'{MODULE}.Second'],
+        '': [f'{MODULE}.Blocker'],
+    },
+)
+class RouteMiddlewareDispatcherTests(SimpleTestCase):
+    """Tests for RouteMiddlewareDispatcher."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_prefix_selects_chain(self):
+        """Test each prefix runs only its own middleware."""
+        self.client.get('/api/ok')
+        self.assertEqual(calls, ['view'])
+
+        calls.clear()
+        self.client.get('/other/ok')
+        self.assertEqual(calls, ['first:call', 'second:call', 'first:view',
+                                 'second:view', 'view'])
+
+    def test_fallback_chain(self):
+        """Test paths without a prefix of their own use the '' chain."""
+        response = self.client.get('/ok')
+
+        self.assertEqual(response.content, b'blocker')
+
+    def test_template_response_hooks_run_in_reverse(self):
+        """Test process_template_response hooks run innermost first."""
+        response = self.client.get('/other/template')
+
+        self.assertEqual(response.content, b'rendered+second+first')
+
+    def test_exception_hooks(self):
+        """Test process_exception stops at the first response."""
+        response = self.client.get('/other/fail')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.content, b'handled by second')
+        self.assertNotIn('first:exception', calls)
+
+    def test_requires_fallback(self):
+        """Test a configuration without '' is rejected."""
+        with override_settings(ROUTE_MIDDLEWARE={'/api/': []}):
+            with self.assertRaises(ImproperlyConfigured):
+                RouteMiddlewareDispatcher(ok_view)
+
+    def test_route_middleware_longest_prefix(self):
+        """Test the longest matching prefix wins."""
+        routes = {'': ['a'], '/api/': ['b'], '/api/user/': ['c']}
+
+        self.assertEqual(route_middleware('/api/user/me/', routes), ['c'])
+        self.assertEqual(route_middleware('/api/schema/', routes), ['b'])
+        self.assertEqual(route_middleware('/admin/', routes), ['a'])
+
+    def test_dispatcher_uses_path_info(self):
+        """Test the prefix is matched without the script name."""
+        request = RequestFactory().get('/other/ok', SCRIPT_NAME='/mount')
+        request.path = '/mount/other/ok'
+        dispatcher = RouteMiddlewareDispatcher(ok_view)
+
+        self.assertEqual(dispatcher.chain_for(request).middleware,
+                         [f'{MODULE}.First', f'{MODULE}.Second'])
+
+
+class ProjectRoutesTests(TestCase):
+    """Tests for the project's ROUTE_MIDDLEWARE."""
+
+    def test_api_skips_admin_middleware(self):
+        """Test API responses skip session and CSRF middleware."""
+        user = get_user_model().objects.create_user(
+            email='api@example.com', username='api', password='pass12345')
+        token = Token.objects.create(user=user)
+
+        response = self.client.get(
+            reverse('user:me'), HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_api_pages_keep_security_headers(self):
+        """Test the API docs and browsable API cannot be framed."""
+        for url in (reverse('api-ui'), reverse('user:create')):
+            response = self.client.get(url, HTTP_ACCEPT='text/html')
+
+            self.assertEqual(response['X-Frame-Options'], 'DENY')
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_admin_login_with_csrf(self):
+        """Test the admin still logs in through sessions and CSRF."""
+        get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin',
+            password='pass12345')
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('admin:login')
+
+        response = client.get(url)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        token = response.cookies['csrftoken'].value
+        response = client.post(url, {
+            'username': 'admin', 'password': 'pass12345',
+            'csrfmiddlewaretoken': token,
+            'next': reverse('admin:index'),
+        })
+
+        self.assertRedirects(response, reverse('admin:index'))
+        self.assertEqual(client.get(reverse('admin:index')).status_code, 200)
+
+    def test_admin_login_rejects_missing_csrf(self):
+        """Test CSRF protection still applies to the admin."""
+        client = Client(enforce_csrf_checks=True)
+
+        response = client.post(reverse('admin:login'), {
+            'username': 'admin', 'password': 'pass12345'})
+
+        self.assertEqual(response.status_code, 403)
+
+
+class AdminMiddlewareCheckTests(SimpleTestCase):
+    """Tests for the core.E001 system check."""
+
+    def test_project_settings_pass(self):
+        """Test the admin's chain has everything it needs."""
+        self.assertEqual(check_admin_middleware(None), [])
+
+    def test_missing_admin_middleware(self):
+        """Test an admin chain without sessions is reported."""
+        routes = {'': ['django.contrib.auth.middleware.'
+                       'AuthenticationMiddleware']}
+        with override_settings(ROUTE_MIDDLEWARE=routes):
+            errors = check_admin_middleware(None)
+
+        self.assertEqual([error.id for error in errors],
+                         ['core.E001', 'core.E001'])
+        self.assertIn('MessageMiddleware', errors[0].msg)
+        self.assertIn('SessionMiddleware', errors[1].msg)
@@ -0,0 +1,172 @@
+"""
+Tests for the primary/replica database router.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+)
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db import routing
+from core.db.routers import PrimaryReplicaRouter
+from user.authentication import token_cache
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    """Tests for PrimaryReplicaRouter.
+
+    TestCase would wrap every read in a transaction on the primary.
+    """
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.model = get_user_model()
+
+    def test_reads_use_replica(self):
+        """Test reads go to a replica and writes to the primary."""
+        self.assertEqual(self.router.db_for_read(self.model), 'replica_0')
+        self.assertEqual(self.router.db_for_write(self.model),
+                         DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test the router stays out of the way without replicas."""
+        self.assertIsNone(self.router.db_for_read(self.model))
+
+    def test_write_pins_request(self):
+        """Test reads after a write in the same request use the primary."""
+        token = routing.begin()
+        try:
+            self.router.db_for_write(self.model)
+            self.assertEqual(self.router.db_for_read(self.model),
+                             DEFAULT_DB_ALIAS)
+        finally:
+            routing.end(token)
+        self.assertEqual(self.router.db_for_read(self.model), 'replica_0')
+
+    def test_use_primary(self):
+        """Test use_primary forces reads to the primary."""
+        with routing.use_primary():
+            self.assertEqual(self.router.db_for_read(self.model),
+                             DEFAULT_DB_ALIAS)
+
+    def test_transaction_reads_primary(self):
+        """Test reads inside a transaction on the primary stay there."""
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(self.model),
+                             DEFAULT_DB_ALIAS)
+
+    def test_no_migrations_on_replicas(self):
+        """Test migrations only run on the primary."""
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+class RequestKeysTests(SimpleTestCase):
+    """Tests for routing.request_keys."""
+
+    def test_authenticated_keys(self):
+        """Test credentials identify the client, not its address."""
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Token abc')
+
+        self.assertEqual(routing.request_keys(request),
+                         [routing.auth_key('Token abc')])
+
+    def test_anonymous_keys(self):
+        """Test anonymous clients are keyed by address."""
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(routing.request_keys(request), ['ip:10.0.0.1'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'],
+                   REPLICA_STICKY_SECONDS=5)
+class ReplicaStickinessTests(TransactionTestCase):
+    """Tests for read-your-writes stickiness across requests.
+
+    Replica reads are counted on the router's choice and served by the
+    test database, which stands in for the replica.
+    """
+
+    def setUp(self):
+        routing._cache().clear()
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', username='testuser',
+            password='testpass123')
+        self.other = get_user_model().objects.create_user(
+            email='other@example.com', username='other',
+            password='testpass123')
+        self.client = self._client_for(self.user)
+        self.other_client = self._client_for(self.other)
+        patcher = patch('core.db.routers.random.choice',
+                        return_value=DEFAULT_DB_ALIAS)
+        self.replica_reads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        routing._cache().clear()
+        token_cache.clear()
+
+    def _client_for(self, user):
+        from rest_framework.authtoken.models import Token
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def _replica_reads_for(self, client, method, url, data=None):
+        token_cache.clear()
+        self.replica_reads.reset_mock()
+        getattr(client, method)(url, data)
+        return self.replica_reads.call_count
+
+    def test_reads_use_replica(self):
+        """Test reads without a recent write go to a replica."""
+        self.assertGreater(
+            self._replica_reads_for(self.client, 'get', ME_URL), 0)
+
+    def test_write_sticks_to_primary(self):
+        """Test the writer reads from the primary, others do not."""
+        self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(
+            self._replica_reads_for(self.client, 'get', ME_URL), 0)
+        self.assertGreater(
+            self._replica_reads_for(self.other_client, 'get', ME_URL), 0)
+
+    def test_pin_expires(self):
+        """Test reads return to the replica once the pin is gone."""
+        self.client.patch(ME_URL, {'name': 'New Name'})
+        routing._cache().clear()
+
+        self.assertGreater(
+            self._replica_reads_for(self.client, 'get', ME_URL), 0)
+
+    def test_login_sticks_new_token(self):
+        """Test requests with a freshly issued token use the primary."""
+        client = APIClient()
+        res = client.post(TOKEN_URL, {'username': 'testuser',
+                                      'password': 'testpass123'})
+        client.credentials(HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+
+        self.assertEqual(self._replica_reads_for(client, 'get', ME_URL), 0)
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_stickiness_disabled(self):
+        """Test a zero window disables stickiness."""
+        self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertGreater(
+            self._replica_reads_for(self.client, 'get', ME_URL), 0)
@@ -0,0 +1,110 @@
+"""
+Tests for the cached OpenAPI schema view.
+"""
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.schema import CachedSpectacularAPIView
+
+SCHEMA_URL = reverse('api-schema')
+MEDIA_TYPES = ['application/vnd.oai.openapi',
+               'application/vnd.oai.openapi+json']
+
+
+def dynamic_schema(media_type):
+    """Render the schema the uncached way."""
+    request = APIRequestFactory().get(SCHEMA_URL, HTTP_ACCEPT=media_type)
+    response = SpectacularAPIView.as_view()(request)
+    response.render()
+    return response.content
+
+
+class CachedSchemaViewTests(SimpleTestCase):
+    """Tests for CachedSpectacularAPIView."""
+
+    def setUp(self):
+        CachedSpectacularAPIView.clear_cache()
+        self.client = APIClient()
+
+    def tearDown(self):
+        CachedSpectacularAPIView.clear_cache()
+
+    def test_byte_identical(self):
+        """Test cached documents match dynamic generation exactly."""
+        for media_type in MEDIA_TYPES:
+            with self.subTest(media_type=media_type):
+                first = self.client.get(SCHEMA_URL, HTTP_ACCEPT=media_type)
+                second = self.client.get(SCHEMA_URL, HTTP_ACCEPT=media_type)
+
+                self.assertEqual(first.content, dynamic_schema(media_type))
+                self.assertEqual(second.content, first.content)
+
+    def test_generated_once(self):
+        """Test the generator only runs on the first request."""
+        with patch.object(SchemaGenerator, 'get_schema',
+                          autospec=True,
+                          side_effect=SchemaGenerator.get_schema) as patched:
+            for _ in range(3):
+                self.client.get(SCHEMA_URL)
+
+        self.assertEqual(patched.call_count, 1)
+
+    @override_settings(LANGUAGES=[('en', 'English'), ('de', 'German')])
+    def test_unknown_languages_share_one_entry(self):
+        """Test made-up ?lang= values cannot grow the cache."""
+        self.client.get(SCHEMA_URL)
+        for i in range(5):
+            res = self.client.get(SCHEMA_URL, {'lang': f'zz{i}'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(CachedSpectacularAPIView._entries), 1)
+
+        self.client.get(SCHEMA_URL, {'lang': 'de'})
+        self.client.get(SCHEMA_URL, {'lang': 'de-at'})
+        self.assertEqual(len(CachedSpectacularAPIView._entries), 2)
+
+    def test_entries_are_capped(self):
+        """Test the oldest document is dropped once max_entries is hit."""
+        with patch.object(CachedSpectacularAPIView, 'max_entries', 1):
+            for media_type in MEDIA_TYPES:
+                self.client.get(SCHEMA_URL, HTTP_ACCEPT=media_type)
+
+        self.assertEqual(
+            [key[0] for key in CachedSpectacularAPIView._entries],
+            MEDIA_TYPES[-1:])
+
+    def test_conditional_get(self):
+        """Test ETag and Last-Modified revalidation return 304."""
+        res = self.client.get(SCHEMA_URL)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        by_etag = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        by_date = self.client.get(
+            SCHEMA_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        stale = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH='"other"')
+
+        self.assertEqual(by_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(by_etag.content, b'')
+        self.assertEqual(by_date.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(stale.status_code, status.HTTP_200_OK)
+
+    def test_serves_prebuilt_artifact(self):
+        """Test documents written by build_schema_cache are served."""
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('build_schema_cache', '--directory', tmp,
+                         stdout=open(os.devnull, 'w'))
+            with override_settings(SPECTACULAR_CACHE_DIR=tmp), \
+                    patch.object(SchemaGenerator, 'get_schema') as patched:
+                res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=MEDIA_TYPES[1])
+
+        patched.assert_not_called()
+        self.assertEqual(res.content, dynamic_schema(MEDIA_TYPES[1]))
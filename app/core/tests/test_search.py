@@ -0,0 +1,95 @@
+"""
+Tests for the in-process username index.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.search import UsernameIndex
+
+
+def create_user(username):
+    return get_user_model().objects.create_user(
+        email=f'{username}@example.com', username=username,
+        password='testpass123')
+
+
+class UsernameIndexTests(TestCase):
+    """Tests for loading and refreshing UsernameIndex."""
+
+    def setUp(self):
+        for username in ('Ann', 'anna', 'annie', 'bo'):
+            create_user(username)
+        self.index = UsernameIndex(refresh_interval=5, ttl=300)
+
+    def usernames(self, prefix, limit=10):
+        return [row['username'] for row in self.index.match(prefix, limit)]
+
+    def test_loads_on_first_match(self):
+        """Test the first match loads every user, sorted case-insensitively."""
+        self.assertFalse(self.index.loaded)
+
+        self.assertEqual(self.usernames('AN'), ['Ann', 'anna', 'annie'])
+        self.assertEqual(len(self.index), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.usernames('ann', limit=2), ['Ann', 'anna'])
+            self.assertEqual(self.usernames('c'), [])
+            self.assertEqual(self.usernames('bo'), ['bo'])
+
+    def test_add_and_discard(self):
+        """Test entries are replaced by id and removed."""
+        self.usernames('a')
+        user = get_user_model().objects.get(username='bo')
+
+        self.index.add((user.pk, 'Anders', user.email, ''))
+        self.assertEqual(self.usernames('and'), ['Anders'])
+        self.assertEqual(self.usernames('bo'), [])
+
+        self.index.discard(user.pk)
+        self.assertEqual(self.usernames('and'), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_add_before_load_is_ignored(self):
+        """Test signals do not build a partial index."""
+        self.index.add((999, 'ghost', 'ghost@example.com', ''))
+
+        self.assertFalse(self.index.loaded)
+
+    def test_reads_new_users_after_refresh_interval(self):
+        """Test users created elsewhere are picked up by id."""
+        with mock.patch('core.search.time.monotonic', return_value=100.0):
+            self.usernames('a')
+        # Created without the signals reaching this index
+        get_user_model().objects.bulk_create([get_user_model()(
+            email='anya@example.com', username='anya')])
+
+        with mock.patch('core.search.time.monotonic', return_value=104.0):
+            self.assertEqual(self.usernames('any'), [])
+        with mock.patch('core.search.time.monotonic', return_value=106.0):
+            with self.assertNumQueries(1):
+                self.assertEqual(self.usernames('any'), ['anya'])
+
+    def test_signals_do_not_skip_users_created_elsewhere(self):
+        """Test an id added by this process does not pass over older ones."""
+        with mock.patch('core.search.time.monotonic', return_value=100.0):
+            self.usernames('a')
+        get_user_model().objects.bulk_create([get_user_model()(
+            email='anya@example.com', username='anya')])
+        user = create_user('anouk')
+        self.index.add((user.pk, user.username, user.email, user.name))
+
+        with mock.patch('core.search.time.monotonic', return_value=106.0):
+            self.assertEqual(self.usernames('an'),
+                             ['Ann', 'anna', 'annie', 'anouk', 'anya'])
+        self.assertEqual(self.index._last_id, user.pk)
+
+    def test_reloads_after_ttl(self):
+        """Test changes to existing users made elsewhere show after ttl."""
+        with mock.patch('core.search.time.monotonic', return_value=100.0):
+            self.usernames('a')
+        get_user_model().objects.filter(username='bo').update(
+            username='ben')
+
+        with mock.patch('core.search.time.monotonic', return_value=400.0):
+            self.assertEqual(self.usernames('b'), ['ben'])
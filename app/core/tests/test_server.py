@@ -0,0 +1,132 @@
+"""
+Tests for the preforking server and the serve command.
+"""
+import os
+import signal
+import subprocess
+import sys
+import urllib.request
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from core import server
+from core.management.commands.serve import parse_bind
+from core.schema import CachedSpectacularAPIView
+
+# Serves an application answering with the worker's pid, so the test can
+# tell workers apart without a database
+SERVER_SCRIPT = '''
+import os, socket, sys
+import django
+django.setup()
+from core.server import PreforkServer
+
+def application(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode()]
+
+listener = socket.create_server(('127.0.0.1', 0))
+print('port', listener.getsockname()[1], flush=True)
+PreforkServer(application, listener, workers=2, max_requests=2,
+              graceful_timeout=5,
+              log=lambda message: print(message, flush=True)).run()
+print('Stopped.', flush=True)
+'''
+
+
+class ServerHelpersTests(SimpleTestCase):
+    """Tests for the measurement and startup helpers."""
+
+    def test_parse_bind(self):
+        """Test host and port parsing, including IPv6 and a bare port."""
+        self.assertEqual(parse_bind('127.0.0.1:8000'), ('127.0.0.1', 8000))
+        self.assertEqual(parse_bind('[::1]:8080'), ('::1', 8080))
+        self.assertEqual(parse_bind('9000'), ('0.0.0.0', 9000))
+        with self.assertRaises(CommandError):
+            parse_bind('localhost:http')
+
+    @skipUnless(os.path.exists('/proc/self/smaps_rollup'), 'needs /proc')
+    def test_memory_usage(self):
+        """Test memory is read for a live process."""
+        usage = server.memory_usage(os.getpid())
+
+        self.assertGreater(usage.rss, 0)
+        self.assertLessEqual(usage.private, usage.rss)
+        self.assertLessEqual(usage.pss, usage.rss)
+
+    @skipUnless(os.path.exists('/proc/self/stat'), 'needs /proc')
+    def test_process_age(self):
+        """Test the age of this process is known and plausible."""
+        self.assertGreater(server.process_age(), 0)
+
+    def test_preload_warms_schema(self):
+        """Test preloading renders the schema in every format."""
+        CachedSpectacularAPIView.clear_cache()
+
+        application, timings = server.preload()
+
+        self.assertTrue(callable(application))
+        self.assertEqual(set(timings),
+                         {'application', 'urlconf', 'serializers', 'schema'})
+        self.assertEqual(len(CachedSpectacularAPIView._entries),
+                         len(CachedSpectacularAPIView.renderer_classes))
+
+    def test_warm_pools(self):
+        """Test every pooled database is warmed and failures skipped."""
+        plain = Mock(spec=['alias'], alias='plain')
+        pooled = Mock(alias='pooled', **{'warm_pool.return_value': 2})
+        down = Mock(alias='down', **{'warm_pool.side_effect': OSError})
+
+        with patch.object(server.connections, 'all',
+                          return_value=[plain, pooled, down]), \
+                self.assertLogs('core.server', 'WARNING') as logs:
+            self.assertEqual(server.warm_pools(), 2)
+
+        pooled.warm_pool.assert_called_once_with()
+        self.assertIn("'down'", logs.output[0])
+
+
+class PreforkServerTests(SimpleTestCase):
+    """Run the server in a child process and talk to it over HTTP."""
+
+    def setUp(self):
+        env = {**os.environ, 'PYTHONUNBUFFERED': '1'}
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', SERVER_SCRIPT], cwd=settings.BASE_DIR,
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True)
+        self.addCleanup(self.process.kill)
+        self.addCleanup(self.process.stdout.close)
+        self.port = int(self.read_until('port').split()[1])
+        self.read_until('Serving with')
+
+    def read_until(self, prefix):
+        for line in self.process.stdout:
+            if line.startswith(prefix):
+                return line
+        self.fail(f'Server exited before printing {prefix!r}.')
+
+    def get(self):
+        url = f'http://127.0.0.1:{self.port}/'
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return int(response.read())
+
+    def test_workers_restart_reload_and_stop(self):
+        """Test max_requests restarts, HUP replaces workers, TERM stops."""
+        pids = [self.get() for _ in range(8)]
+        # Two workers restarted after two requests each
+        self.assertGreaterEqual(len(set(pids)), 4)
+        self.assertNotIn(self.process.pid, pids)
+
+        self.process.send_signal(signal.SIGHUP)
+        self.read_until('Reloading')
+        self.read_until('Worker')
+        self.assertNotIn(self.get(), pids)
+
+        self.process.send_signal(signal.SIGTERM)
+        self.read_until('Stopped.')
+        self.assertEqual(self.process.wait(timeout=10), 0)
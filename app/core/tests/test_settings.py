@@ -0,0 +1,149 @@
+"""
+Tests for the settings profiles and the profile_startup command.
+"""
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.management.commands.profile_startup import (
+    group_of, parse_importtime,
+)
+
+DUMP_SCRIPT = '''
+import json
+from django.conf import settings
+print(json.dumps({
+    'DEBUG': settings.DEBUG,
+    'SECRET_KEY': settings.SECRET_KEY,
+    'ALLOWED_HOSTS': settings.ALLOWED_HOSTS,
+    'REST_FRAMEWORK': settings.REST_FRAMEWORK,
+    'SESSION_ENGINE': settings.SESSION_ENGINE,
+    'MIDDLEWARE': settings.MIDDLEWARE,
+}))
+'''
+
+
+def run_with_profile(args, **env):
+    """Run python with args in a fresh process under the given env."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'app.settings', **env}
+    return subprocess.run(
+        [sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+        capture_output=True, text=True)
+
+
+class SettingsProfileTests(SimpleTestCase):
+    """Tests for DJANGO_SETTINGS_PROFILE."""
+
+    production = {
+        'DJANGO_SETTINGS_PROFILE': 'production',
+        'DJANGO_SECRET_KEY': 'not-so-secret',
+        'DJANGO_ALLOWED_HOSTS': 'api.example.com, admin.example.com',
+    }
+
+    def dump(self, **env):
+        process = run_with_profile(['-c', DUMP_SCRIPT], **env)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        return json.loads(process.stdout)
+
+    def test_production_profile(self):
+        """Test production turns DEBUG off and trims the API stack."""
+        values = self.dump(**self.production)
+
+        self.assertFalse(values['DEBUG'])
+        self.assertEqual(values['SECRET_KEY'], 'not-so-secret')
+        self.assertEqual(values['ALLOWED_HOSTS'],
+                         ['api.example.com', 'admin.example.com'])
+        self.assertEqual(
+            values['REST_FRAMEWORK']['DEFAULT_RENDERER_CLASSES'],
+            ['rest_framework.renderers.JSONRenderer'])
+        self.assertEqual(
+            values['REST_FRAMEWORK']['DEFAULT_AUTHENTICATION_CLASSES'],
+            ['user.authentication.SignedTokenAuthentication'])
+        self.assertEqual(values['SESSION_ENGINE'],
+                         'django.contrib.sessions.backends.cached_db')
+
+    def test_development_is_default(self):
+        """Test the development defaults apply without a profile."""
+        values = self.dump(DJANGO_SETTINGS_PROFILE='development')
+
+        self.assertTrue(values['DEBUG'])
+        self.assertIn('rest_framework.renderers.BrowsableAPIRenderer',
+                      values['REST_FRAMEWORK']['DEFAULT_RENDERER_CLASSES'])
+
+    def test_production_requires_secret_key(self):
+        """Test production refuses to start without DJANGO_SECRET_KEY."""
+        if 'DJANGO_SECRET_KEY' in os.environ:
+            self.skipTest('DJANGO_SECRET_KEY is set in the environment')
+        env = {key: value for key, value in self.production.items()
+               if key != 'DJANGO_SECRET_KEY'}
+        process = run_with_profile(['-c', DUMP_SCRIPT], **env)
+
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn('DJANGO_SECRET_KEY is required', process.stderr)
+
+    def test_unknown_profile(self):
+        """Test a misspelt profile fails instead of running development."""
+        process = run_with_profile(
+            ['-c', DUMP_SCRIPT], DJANGO_SETTINGS_PROFILE='prod')
+
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn("Unknown DJANGO_SETTINGS_PROFILE 'prod'",
+                      process.stderr)
+
+    def test_production_admin_checks_pass(self):
+        """Test the admin's system checks pass under production."""
+        process = run_with_profile(
+            ['manage.py', 'check', '--deploy', '--fail-level', 'ERROR'],
+            **self.production)
+
+        self.assertEqual(process.returncode, 0, process.stderr)
+
+
+class ProfileStartupTests(SimpleTestCase):
+    """Tests for the profile_startup command."""
+
+    def test_parse_importtime(self):
+        """Test -X importtime lines are parsed into self/cumulative."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     json.decoder\n'
+            'import time:       300 |        420 |   json\n'
+            'unrelated line\n'
+        )
+
+        self.assertEqual(parse_importtime(output), {
+            'json.decoder': (120, 120),
+            'json': (300, 420),
+        })
+
+    def test_group_of_prefers_longest_app(self):
+        """Test modules are attributed to the most specific app."""
+        apps = ['django.contrib.admin', 'user', 'core']
+
+        self.assertEqual(group_of('django.contrib.admin.sites', apps),
+                         'django.contrib.admin')
+        self.assertEqual(group_of('django.db.models', apps), 'django')
+        self.assertEqual(group_of('user', apps), 'user')
+        self.assertEqual(group_of('username_tools.x', apps),
+                         'username_tools')
+
+    def test_reports_phases_and_imports(self):
+        """Test a cold start is measured in a separate interpreter."""
+        out = StringIO()
+        call_command('profile_startup', '--repeat', '1', '--json',
+                     stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(
+            list(report['phases_ms']),
+            ['settings', 'django.setup()', 'middleware', 'urlconf'])
+        self.assertGreater(report['phases_ms']['django.setup()'], 0)
+        names = [module['name'] for module in report['modules']]
+        self.assertTrue(names)
+        self.assertGreater(report['import_ms'], 0)
@@ -0,0 +1,400 @@
+"""
+Tests for hash-sharded users, spread over the test runner's TEST_SHARDS.
+"""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import IntegrityError, connections
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db import sharding
+from core.db.sharding import HashRing
+from core.models import UserIndex
+from core.search import UsernameIndex, search
+from core.test_runner import TEST_SHARDS
+from user.authentication import token_cache
+from user.export import iter_user_rows
+from user.last_login import write_last_logins
+from user.throttles import reset_throttles
+from user.views import ManageUserView
+
+SHARDS = TEST_SHARDS
+ALL = ['default', *SHARDS]
+
+
+def create_user(name, **extra):
+    return get_user_model().objects.create_user(
+        email=f'{name}@example.com', username=name, password='testpass123',
+        **extra)
+
+
+def create_token(user):
+    return Token.objects.db_manager(user._state.db).create(user=user)
+
+
+def stored_on(user_id):
+    """Return the aliases whose core_user holds user_id."""
+    return [alias for alias in ALL
+            if get_user_model()._base_manager.using(alias).filter(
+                pk=user_id).exists()]
+
+
+class HashRingTests(SimpleTestCase):
+    """Tests for the consistent hash ring."""
+
+    def test_stable_and_balanced(self):
+        """Test keys map the same way every time and spread evenly."""
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        counts = {}
+        for key in range(20000):
+            node = ring.node_for(key)
+            counts[node] = counts.get(node, 0) + 1
+            self.assertEqual(HashRing(['a', 'b', 'c', 'd']).node_for(key)
+                             if key < 50 else node, node)
+
+        for count in counts.values():
+            self.assertLess(abs(count - 5000), 5000 * 0.25)
+
+    def test_adding_node_moves_few_keys(self):
+        """Test a new node only takes keys, about 1/n of them."""
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+
+        moved = [key for key in range(20000)
+                 if before.node_for(key) != after.node_for(key)]
+
+        self.assertTrue(all(after.node_for(key) == 'd' for key in moved))
+        self.assertLess(len(moved), 20000 * 0.35)
+        self.assertGreater(len(moved), 20000 * 0.15)
+
+    def test_needs_a_node(self):
+        with self.assertRaises(ValueError):
+            HashRing([])
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class ShardedUserTests(TestCase):
+    """Tests for users and tokens spread over the shards."""
+
+    databases = {'default', *SHARDS}
+
+    def setUp(self):
+        token_cache.clear()
+        reset_throttles()
+        self.client = APIClient()
+
+    def test_user_created_on_its_shard(self):
+        """Test the id comes from the index and the row from the ring."""
+        user = create_user('placed')
+
+        self.assertEqual(user._state.db, sharding.shard_for(user.pk))
+        self.assertEqual(stored_on(user.pk), [user._state.db])
+        entry = UserIndex.objects.get(pk=user.pk)
+        self.assertEqual((entry.username, entry.shard),
+                         ('placed', user._state.db))
+
+    def test_users_spread_over_shards(self):
+        """Test ids land on every shard."""
+        shards = {create_user(f'spread{i}')._state.db for i in range(12)}
+
+        self.assertEqual(shards, set(SHARDS))
+
+    def test_get_routed_by_id_username_and_email(self):
+        """Test single-user lookups find the user on its shard."""
+        user = create_user('Routed')
+        users = get_user_model().objects
+
+        for lookup in ({'pk': user.pk}, {'id': user.pk},
+                       {'username__iexact': 'routed'},
+                       {'email': 'Routed@example.com'}):
+            found = users.get(**lookup)
+            self.assertEqual((found.pk, found._state.db),
+                             (user.pk, user._state.db))
+        self.assertEqual(users.get_by_natural_key('ROUTED').pk, user.pk)
+        with self.assertRaises(get_user_model().DoesNotExist):
+            users.get(username='nobody')
+
+    def test_email_unique_across_shards(self):
+        """Test a case variant of a taken email fails on any shard."""
+        create_user('first')
+
+        with self.assertRaises(IntegrityError):
+            get_user_model().objects.create_user(
+                email='FIRST@example.com', username='second',
+                password='testpass123')
+        self.assertFalse(UserIndex.objects.filter(username='second').exists())
+
+    def test_api_signup_login_and_me(self):
+        """Test the user API works end to end against the shards."""
+        payload = {'email': 'api@example.com', 'username': 'api',
+                   'password': 'testpass123', 'name': 'Api'}
+        self.assertEqual(self.client.post(reverse('user:create'),
+                                          payload).status_code, 201)
+        duplicate = self.client.post(reverse('user:create'), {
+            **payload, 'username': 'other', 'email': 'API@example.com'})
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertIn('email', duplicate.data)
+
+        response = self.client.post(reverse('user:token'), {
+            'username': 'api', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        key = response.data['token']
+        user = get_user_model().objects.get(username='api')
+        self.assertEqual(Token.objects.using(user._state.db).get(
+            key=key).user_id, user.pk)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        me = self.client.patch(reverse('user:me'),
+                               {'email': 'renamed@example.com'})
+        self.assertEqual(me.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('user:me')).data['email'],
+                         'renamed@example.com')
+        self.assertTrue(UserIndex.objects.filter(
+            pk=user.pk, email='renamed@example.com').exists())
+
+    def test_delete_frees_index(self):
+        """Test deleting a user frees its email and username."""
+        user = create_user('gone')
+
+        user.delete()
+
+        self.assertFalse(UserIndex.objects.filter(pk=user.pk).exists())
+        create_user('gone')
+
+    def test_last_logins_written_per_shard(self):
+        """Test buffered last_login writes reach every shard."""
+        users = [create_user(f'login{i}') for i in range(6)]
+        when = timezone.now()
+
+        write_last_logins({user.pk: when for user in users})
+
+        for user in users:
+            user.refresh_from_db()
+            self.assertEqual(user.last_login, when)
+
+    def test_superuser_created_on_default(self):
+        """Test a superuser can be logged by the admin and join groups."""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin',
+            password='testpass123')
+        group = Group.objects.create(name='editors')
+
+        LogEntry.objects.log_action(
+            user_id=admin.pk,
+            content_type_id=ContentType.objects.get_for_model(Group).pk,
+            object_id=group.pk, object_repr=str(group),
+            action_flag=ADDITION)
+        admin.groups.add(group)
+        connections['default'].check_constraints()
+
+        self.assertEqual(stored_on(admin.pk), ['default'])
+        self.assertEqual(UserIndex.objects.get(pk=admin.pk).shard, 'default')
+        self.assertEqual(
+            get_user_model().objects.get(pk=admin.pk).groups.get(), group)
+
+    def test_user_made_staff_moves_to_default(self):
+        """Test promoting a user moves it and its token to default."""
+        user = create_user('promoted')
+        token = create_token(user)
+        shard = user._state.db
+
+        user.is_staff = True
+        user.save()
+        user.groups.add(Group.objects.create(name='staff'))
+
+        self.assertEqual(user._state.db, 'default')
+        self.assertEqual(stored_on(user.pk), ['default'])
+        self.assertFalse(Token.objects.using(shard).exists())
+        self.assertEqual(Token.objects.get(user_id=user.pk).key, token.key)
+        self.assertEqual(UserIndex.objects.get(pk=user.pk).shard, 'default')
+        self.assertEqual(
+            get_user_model().objects.get(username='promoted').pk, user.pk)
+
+    def test_reshard_after_adding_a_shard(self):
+        """Test resharding moves users and tokens onto a new shard."""
+        with override_settings(USER_SHARDS=SHARDS[:1]):
+            users = [create_user(f'grow{i}') for i in range(10)]
+            tokens = {user.pk: create_token(user).key for user in users}
+            staff = create_user('staffer')
+        # Made staff without save(), which would move it to default
+        get_user_model()._base_manager.using(SHARDS[0]).filter(
+            pk=staff.pk).update(is_staff=True)
+
+        out = StringIO()
+        call_command('reshard_users', '--batch-size', '3', stdout=out)
+
+        moved = 0
+        for user in users:
+            shard = sharding.shard_for(user.pk)
+            moved += shard != SHARDS[0]
+            self.assertEqual(stored_on(user.pk), [shard])
+            self.assertEqual(UserIndex.objects.get(pk=user.pk).shard, shard)
+            self.assertEqual(Token.objects.using(shard).get(
+                user_id=user.pk).key, tokens[user.pk])
+            self.assertEqual(
+                get_user_model().objects.get(username=user.username).pk,
+                user.pk)
+        self.assertGreater(moved, 0)
+        self.assertEqual(stored_on(staff.pk), [SHARDS[0]])
+        self.assertIn(f'moved {moved} of 11 users', out.getvalue())
+
+        again = StringIO()
+        call_command('reshard_users', stdout=again)
+        self.assertNotIn('moved 1', again.getvalue())
+        self.assertIn(f'{SHARDS[0]}: moved 0 of', again.getvalue())
+
+    def test_reshard_from_unsharded_database(self):
+        """Test users created before sharding are indexed and moved."""
+        with override_settings(USER_SHARDS=[]):
+            legacy = [create_user(f'legacy{i}') for i in range(5)]
+        self.assertEqual(stored_on(legacy[0].pk), ['default'])
+
+        call_command('reshard_users', stdout=StringIO())
+
+        for user in legacy:
+            self.assertEqual(stored_on(user.pk),
+                             [sharding.shard_for(user.pk)])
+        fresh = create_user('fresh')
+        self.assertGreater(fresh.pk, max(user.pk for user in legacy))
+
+    def test_token_authentication_finds_shard(self):
+        """Test a token is found on its shard when the cache misses."""
+        user = create_user('tokened')
+        token = create_token(user)
+        self.assertTrue(Token.objects.using(user._state.db).filter(
+            key=token.key).exists())
+
+        response = self.client.get(reverse('user:me'),
+                                   HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'tokened')
+
+
+@override_settings(USER_SHARDS=SHARDS, USER_SEARCH={'MEMORY_INDEX': False})
+class ShardedReadTests(TestCase):
+    """Tests for reads covering users on every shard."""
+
+    databases = {'default', *SHARDS}
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', name='Ann Admin',
+            password='testpass123')
+        self.users = [create_user(name) for name in (
+            'anna', 'Andy', 'bo', 'annie', 'Anton', 'cy', 'ann')]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_users_on_every_database(self):
+        self.assertEqual({user._state.db for user in self.users},
+                         set(SHARDS))
+
+    def test_search_merges_shards(self):
+        """Test matches from every shard come back in username order."""
+        usernames = [row['username'] for row in search('an', 10)]
+
+        self.assertEqual(usernames,
+                         ['Andy', 'ann', 'anna', 'annie', 'Anton', 'admin'])
+        self.assertEqual([row['username'] for row in search('an', 3)],
+                         ['Andy', 'ann', 'anna'])
+
+    def test_username_index_reads_shards(self):
+        """Test the index loads and syncs users from every shard."""
+        index = UsernameIndex()
+        index.load()
+        self.assertEqual(len(index), 8)
+
+        for name in ('anya', 'anzu', 'anwar'):
+            create_user(name)
+        index._sync()
+
+        self.assertEqual(
+            [row['username'] for row in index.match('an', 10)],
+            ['Andy', 'ann', 'anna', 'annie', 'Anton', 'anwar', 'anya',
+             'anzu'])
+
+    def test_export_merges_by_id(self):
+        """Test the export streams every user once, in id order."""
+        ids = [row[0] for row in iter_user_rows(chunk_size=2)]
+
+        self.assertEqual(ids, sorted(
+            user.pk for user in [self.admin, *self.users]))
+
+    def test_directory_pages_by_id(self):
+        """Test the user list pages across shards by id only."""
+        ids = []
+        res = self.client.get(reverse('user:list'), {'page_size': 3})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [row['id'] for row in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(ids, sorted(
+            user.pk for user in [self.admin, *self.users]))
+        res = self.client.get(reverse('user:list'), {'ordering': 'name'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class ShardedUpdateTests(TransactionTestCase):
+    """Tests for updates outside TestCase's per-database transactions."""
+
+    databases = {'default', *SHARDS}
+
+    def setUp(self):
+        token_cache.clear()
+        reset_throttles()
+
+    def test_update_locks_user_in_shard_transaction(self):
+        """Test PATCH /me/ locks the row inside a transaction on its shard."""
+        user = create_user('locked')
+        token = create_token(user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        client.get(reverse('user:me'))
+        lock = ManageUserView._lock_and_refresh
+        in_atomic = []
+
+        def spy(*args):
+            in_atomic.append({alias: connections[alias].in_atomic_block
+                              for alias in ('default', user._state.db)})
+            return lock(*args)
+
+        with mock.patch.object(ManageUserView, '_lock_and_refresh',
+                               staticmethod(spy)):
+            response = client.patch(reverse('user:me'), {'name': 'Locked'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(in_atomic, [{'default': True,
+                                      user._state.db: True}])
+        self.assertEqual(get_user_model().objects.get(pk=user.pk).name,
+                         'Locked')
+
+
+class UnshardedTests(TestCase):
+    """Without USER_SHARDS nothing changes."""
+
+    @override_settings(USER_SHARDS=[])
+    def test_users_stay_on_default(self):
+        user = create_user('plain')
+
+        self.assertEqual(user._state.db, 'default')
+        self.assertFalse(UserIndex.objects.exists())
@@ -0,0 +1,22 @@
+"""
+Operational views.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from core.metrics import registry
+
+
+@require_GET
+def metrics_view(request):
+    """Expose in-process metrics in the Prometheus text format."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(supplied.encode(),
+                                   f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=registry.content_type)
@@ -0,0 +1,248 @@
+"""
+Authentication classes for the user API.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+from core.cache import LRUCache, VersionStamps
+from core.db import sharding
+from user import expiry, tokens
+
+
+def get_user_stamps():
+    """Stamps bumped whenever a user row changes, checked on cache hits."""
+    options = getattr(settings, 'USER_AUTH_CACHE', {})
+    return VersionStamps(options.get('STAMP_CACHE_ALIAS'),
+                         key_prefix='user:stamp:')
+
+
+user_stamps = get_user_stamps()
+
+
+class TokenCache:
+    """Two-tier cache of authenticated tokens keyed by token key.
+
+    The first tier is a bounded in-process LRU; the optional second tier is
+    a shared Django cache so that other workers can skip the database too.
+    Entries hold the user's stamp from user_stamps and are dropped once it
+    changes, so a user saved in one worker is reloaded by all of them.
+    """
+
+    key_prefix = 'user:auth-token:'
+
+    def __init__(self, max_entries=10000, ttl=30, shared_alias=None,
+                 shared_ttl=300, stamps=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self.stamps = stamps or VersionStamps()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from the USER_AUTH_CACHE setting."""
+        options = getattr(settings, 'USER_AUTH_CACHE', {})
+        return cls(
+            max_entries=options.get('MAX_ENTRIES', 10000),
+            ttl=options.get('TTL', 30),
+            shared_alias=options.get('SHARED_CACHE_ALIAS'),
+            shared_ttl=options.get('SHARED_TTL', 300),
+            stamps=user_stamps,
+        )
+
+    @property
+    def shared(self):
+        if not self.shared_alias:
+            return None
+        return caches[self.shared_alias]
+
+    def get(self, key):
+        """Return a private copy of the cached token, or None."""
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(self.key_prefix + key)
+            if entry is not None:
+                self.local.set(key, entry)
+        if entry is None:
+            return None
+        stamp, token = entry
+        if stamp != self.stamps.get(token.user_id):
+            self.local.delete(key)
+            return None
+        return self._copy(token)
+
+    def set(self, token):
+        """Cache token together with its user."""
+        token = self._copy(token)
+        entry = (self.stamps.get(token.user_id), token)
+        self.local.set(token.key, entry)
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + token.key, entry,
+                            self.shared_ttl)
+
+    def invalidate(self, key):
+        """Drop a single token from both tiers."""
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def invalidate_user(self, user_id, using=None):
+        """Drop every cached token belonging to user_id."""
+        keys = set(self.local.delete_where(
+            lambda entry: entry[1].user_id == user_id))
+        if self.shared is not None:
+            keys.update(tokens_of(user_id, using).values_list(
+                'key', flat=True))
+            self.shared.delete_many(
+                [self.key_prefix + key for key in keys])
+
+    def clear(self):
+        """Empty the in-process tier."""
+        self.local.clear()
+
+    @staticmethod
+    def _copy(token):
+        """Copy token and user so requests never share mutable state."""
+        user = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = user
+        return token
+
+
+token_cache = TokenCache.from_settings()
+
+
+def tokens_of(user_id, using=None):
+    """Tokens of user_id, read from its shard when users are sharded."""
+    if not sharding.is_enabled():
+        return Token.objects.filter(user_id=user_id)
+    if using is None:
+        found = sharding.locate(pk=user_id)
+        if found is None:
+            return Token.objects.none()
+        using = found[1]
+    return Token.objects.using(using).filter(user_id=user_id)
+
+
+class UserCache:
+    """In-process cache of users by id for signed token authentication.
+
+    Like TokenCache, entries are only used while the user's stamp is
+    unchanged, so a revocation in any process applies in all of them.
+    """
+
+    def __init__(self, max_entries=10000, ttl=30, stamps=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.stamps = stamps or VersionStamps()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from the USER_AUTH_CACHE setting."""
+        options = getattr(settings, 'USER_AUTH_CACHE', {})
+        return cls(max_entries=options.get('MAX_ENTRIES', 10000),
+                   ttl=options.get('TTL', 30), stamps=user_stamps)
+
+    def get(self, user_id):
+        """Return (private copy of the cached user or None, stamp).
+
+        Pass the stamp on to set() after loading the user, so a row read
+        while it was being changed is never cached as current.
+        """
+        stamp = self.stamps.get(user_id)
+        entry = self.local.get(user_id)
+        if entry is None or entry[0] != stamp:
+            return None, stamp
+        return copy.copy(entry[1]), stamp
+
+    def set(self, user, stamp):
+        self.local.set(user.pk, (stamp, copy.copy(user)))
+
+    def invalidate(self, user_id):
+        self.local.delete(user_id)
+
+    def clear(self):
+        self.local.clear()
+
+
+user_cache = UserCache.from_settings()
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication that serves repeat lookups from token_cache.
+
+    Tokens unused for AUTH_TOKEN_EXPIRY TTL are rejected; using a token
+    slides its expiry forward (see user.expiry).
+    """
+
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        token = self.cache.get(key)
+        if token is not None and expiry.is_expired(token):
+            # Another worker may have refreshed it since it was cached
+            self.cache.invalidate(key)
+            token = None
+        if token is None:
+            user, token = self._load(key)
+            if expiry.is_expired(token):
+                raise exceptions.AuthenticationFailed(
+                    _('Token has expired.'))
+            self.cache.set(token)
+        if expiry.needs_refresh(token):
+            expiry.refresh(token)
+            self.cache.set(token)
+
+        return (token.user, token)
+
+    def _load(self, key):
+        if not sharding.is_enabled():
+            return super().authenticate_credentials(key)
+        try:
+            token = sharding.find_token(key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return (token.user, token)
+
+
+class SignedTokenAuthentication(CachedTokenAuthentication):
+    """Accepts signed access tokens as well as database tokens.
+
+    Signed tokens are verified from their signature and the cached user's
+    token_version, so a warm request costs no query. Database tokens keep
+    working through CachedTokenAuthentication.
+    """
+
+    def authenticate_credentials(self, key):
+        if not tokens.is_signed(key):
+            return super().authenticate_credentials(key)
+
+        try:
+            user_id, version = tokens.parse(key)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user, stamp = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = get_user_model()._default_manager.get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user_cache.set(user, stamp)
+
+        if user.token_version != version:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return (user, key)
@@ -0,0 +1,214 @@
+"""
+Repeatable benchmark of the user API endpoints.
+
+Each scenario drives one endpoint in process through the Django test
+client from several threads for a fixed time, against whatever database
+is configured. Results are plain dicts so they can be written as JSON and
+compared with a stored baseline.
+"""
+import contextlib
+import itertools
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+from user.loadtest import run_workers, summarize
+from user.throttles import reset_throttles
+
+SCENARIOS = ('create', 'token', 'me')
+RESULTS_VERSION = 1
+PASSWORD = 'benchmark-pass-123'
+
+
+class QueryCounter:
+    """Thread-safe count of queries run through execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class UserAPIBenchmark:
+    """Runs the SCENARIOS and collects throughput and latency figures."""
+
+    def __init__(self, concurrency=4, duration=5.0, warmup=1.0,
+                 host='localhost', throttled=False):
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.host = host
+        self.throttled = throttled
+        self.prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        self._sequence = itertools.count()
+        self.users = []
+        self.tokens = []
+
+    def run(self, scenarios=SCENARIOS):
+        """Run scenarios and return the results document."""
+        started = time.time()
+        try:
+            with self._throttling():
+                self._setup()
+                results = {name: self._run_scenario(name)
+                           for name in scenarios}
+        finally:
+            self._teardown()
+        return {
+            'version': RESULTS_VERSION,
+            'started': started,
+            'config': {
+                'concurrency': self.concurrency,
+                'duration': self.duration,
+                'vendor': connections['default'].vendor,
+                'throttled': self.throttled,
+            },
+            'scenarios': results,
+        }
+
+    def _throttling(self):
+        if self.throttled:
+            return contextlib.nullcontext()
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        rest_framework['DEFAULT_THROTTLE_RATES'] = dict.fromkeys(
+            rest_framework.get('DEFAULT_THROTTLE_RATES', {}))
+        return override_settings(REST_FRAMEWORK=rest_framework)
+
+    def _setup(self):
+        reset_throttles()
+        for _ in range(self.concurrency):
+            name = self._next_name()
+            user = get_user_model().objects.create_user(
+                email=f'{name}@example.com', username=name,
+                password=PASSWORD)
+            self.users.append(user)
+            self.tokens.append(Token.objects.db_manager(
+                sharding.database_of(user)).create(user=user))
+
+    def _teardown(self):
+        reset_throttles()
+        users = get_user_model().objects.filter(
+            username__startswith=f'{self.prefix}-')
+        for shard in sharding.spread(users):
+            shard.delete()
+
+    def _next_name(self):
+        return f'{self.prefix}-{next(self._sequence)}'
+
+    def _targets(self, name):
+        """Return one request callable per thread for scenario name."""
+        targets = []
+        for index in range(self.concurrency):
+            client = Client(HTTP_HOST=self.host)
+            user, token = self.users[index], self.tokens[index]
+            if name == 'create':
+                targets.append(self._create(client))
+            elif name == 'token':
+                targets.append(self._token(client, user))
+            elif name == 'me':
+                targets.append(self._me(client, token))
+            else:
+                raise ValueError(f'Unknown scenario {name!r}.')
+        return targets
+
+    def _create(self, client):
+        url = reverse('user:create')
+
+        def create():
+            name = self._next_name()
+            return client.post(url, {
+                'email': f'{name}@example.com', 'username': name,
+                'password': PASSWORD}).status_code
+        return create
+
+    @staticmethod
+    def _token(client, user):
+        url = reverse('user:token')
+        data = {'username': user.username, 'password': PASSWORD}
+        return lambda: client.post(url, data).status_code
+
+    @staticmethod
+    def _me(client, token):
+        url = reverse('user:me')
+        header = f'Token {token.key}'
+        return lambda: client.get(url, HTTP_AUTHORIZATION=header).status_code
+
+    def _run_scenario(self, name):
+        counter = QueryCounter()
+
+        def counted(target):
+            def call():
+                with contextlib.ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(
+                            connection.execute_wrapper(counter))
+                    return target()
+            return call
+
+        targets = [counted(target) for target in self._targets(name)]
+        if self.warmup:
+            run_workers({name: (targets, None)}, self.warmup)
+        counter.count = 0
+        latencies, statuses = run_workers(
+            {name: (targets, None)}, self.duration)[name]
+
+        stats = summarize(latencies)
+        requests = stats['count']
+        return {
+            'requests': requests,
+            'errors': sum(count for status, count in statuses.items()
+                          if status >= 400),
+            'throughput': requests / self.duration,
+            'p50_ms': stats['p50'],
+            'p95_ms': stats['p95'],
+            'p99_ms': stats['p99'],
+            'queries_per_request': (counter.count / requests
+                                    if requests else None),
+        }
+
+
+# Metrics compared against a baseline, with the direction that is worse
+COMPARED_METRICS = (
+    ('throughput', 'lower'),
+    ('p50_ms', 'higher'),
+    ('p95_ms', 'higher'),
+    ('p99_ms', 'higher'),
+    ('queries_per_request', 'higher'),
+)
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Compare results with baseline, scenario by scenario.
+
+    Returns (scenario, metric, baseline_value, value, regressed) rows.
+    Timings may move by tolerance (a fraction) before they count as a
+    regression; any increase in queries per request is one.
+    """
+    rows = []
+    for scenario, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if previous is None:
+            continue
+        for metric, worse in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            allowed = 0.001 if metric == 'queries_per_request' else tolerance
+            if worse == 'lower':
+                regressed = new < old * (1 - allowed)
+            else:
+                regressed = new > old * (1 + allowed)
+            rows.append((scenario, metric, old, new, regressed))
+    return rows
@@ -0,0 +1,296 @@
+"""
+Streaming bulk user import.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from contextlib import ExitStack
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, transaction
+from django.db.models.functions import Lower
+
+from core import hashing
+from core.db import sharding
+from core.db.integrity import violated_field
+from core.models import UserIndex
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ('email', 'username', 'name', 'password')
+UNIQUE_FIELDS = ('email', 'username')
+PASSWORD_MIN_LENGTH = 8
+MAX_LENGTH = 255
+
+RowError = namedtuple('RowError', ['line', 'field', 'message'])
+
+
+def decode_lines(stream, encoding='utf-8'):
+    """Yield decoded text lines from a binary or text stream."""
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        yield line
+
+
+def read_rows(lines, fmt):
+    """Yield (line_number, row) pairs from CSV or JSONL text lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f'Unsupported format {fmt!r}.')
+
+
+def _copy_value(value):
+    """Encode a value for PostgreSQL COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class UserImporter:
+    """Imports users from a row stream in constant memory.
+
+    Rows are processed in batches: each batch is validated, checked for
+    email and username collisions with two queries, hashed in parallel on
+    the hashing executor and written with bulk_create, or COPY on
+    PostgreSQL.
+
+    When users are sharded (see core.db.sharding) using is ignored: a
+    batch takes its ids and uniqueness checks from UserIndex and is split
+    across the shards.
+    """
+
+    def __init__(self, batch_size=1000, using='default', use_copy=None):
+        self.batch_size = batch_size
+        self.using = using
+        if use_copy is None:
+            use_copy = connections[using].vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.model = get_user_model()
+        self.sharded = sharding.is_enabled()
+        self.created = 0
+        self.rejected = 0
+
+    def run(self, rows):
+        """Import (line, row) pairs, yielding a RowError per rejected row."""
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            yield from self._import_batch(batch)
+
+    def _import_batch(self, batch):
+        valid = []
+        errors = []
+        emails = set()
+        usernames = set()
+        for line, row in batch:
+            cleaned, error = self._clean(line, row)
+            if error is None and cleaned['email'].lower() in emails:
+                error = RowError(line, 'email', 'Duplicate email in input.')
+            if error is None and cleaned['username'].lower() in usernames:
+                error = RowError(line, 'username',
+                                 'Duplicate username in input.')
+            if error is not None:
+                errors.append(error)
+                continue
+            emails.add(cleaned['email'].lower())
+            usernames.add(cleaned['username'].lower())
+            valid.append((line, cleaned))
+
+        # Case-insensitive, like the unique indexes, and served by them
+        if self.sharded:
+            manager = sharding.index()
+        else:
+            manager = self.model._default_manager.db_manager(self.using)
+        taken_emails = set(manager.filter(
+            email__lower__in=emails).values_list(Lower('email'), flat=True))
+        taken_usernames = set(manager.filter(
+            username__lower__in=usernames).values_list(
+                Lower('username'), flat=True))
+
+        pending = []
+        for line, cleaned in valid:
+            if cleaned['email'].lower() in taken_emails:
+                errors.append(RowError(
+                    line, 'email', 'User with this email already exists.'))
+            elif cleaned['username'].lower() in taken_usernames:
+                errors.append(RowError(
+                    line, 'username',
+                    'User with this username already exists.'))
+            else:
+                pending.append((line, cleaned))
+
+        hashes = hashing.executor.make_passwords(
+            cleaned['password'] for _, cleaned in pending)
+        users = []
+        for (line, cleaned), encoded in zip(pending, hashes):
+            cleaned['password'] = encoded
+            users.append((line, self.model(**cleaned)))
+
+        if self.sharded:
+            errors.extend(self._write_sharded(users))
+        else:
+            errors.extend(self._write(users))
+        errors.sort(key=lambda error: error.line)
+        self.rejected += len(errors)
+        return errors
+
+    def _clean(self, line, row):
+        """Validate a raw row, returning (cleaned, error)."""
+        if row is None:
+            return None, RowError(line, None, 'Malformed row.')
+        cleaned = {
+            field: str(row.get(field) or '').strip()
+            if field != 'password' else str(row.get(field) or '')
+            for field in FIELDS
+        }
+        for field in ('email', 'username', 'password'):
+            if not cleaned[field]:
+                return None, RowError(line, field, 'This field is required.')
+        for field in ('email', 'username', 'name'):
+            if len(cleaned[field]) > MAX_LENGTH:
+                return None, RowError(
+                    line, field,
+                    f'Ensure this field has no more than {MAX_LENGTH} '
+                    f'characters.')
+        if len(cleaned['password']) < PASSWORD_MIN_LENGTH:
+            return None, RowError(
+                line, 'password',
+                f'Ensure this field has at least {PASSWORD_MIN_LENGTH} '
+                f'characters.')
+        try:
+            validate_email(cleaned['email'])
+        except ValidationError:
+            return None, RowError(line, 'email',
+                                  'Enter a valid email address.')
+        cleaned['email'] = self.model._default_manager.normalize_email(
+            cleaned['email'])
+        return cleaned, None
+
+    def _write(self, users):
+        """Insert users, falling back to row-by-row inserts on a race."""
+        if not users:
+            return []
+        try:
+            with transaction.atomic(using=self.using):
+                self._insert([user for _, user in users], self.using)
+            self.created += len(users)
+            return []
+        except IntegrityError:
+            pass
+        return self._save_each(users, self.using)
+
+    def _write_sharded(self, users):
+        """Insert users on their shards with their UserIndex entries."""
+        if not users:
+            return []
+        index = sharding.index()
+        try:
+            with ExitStack() as stack:
+                # Nothing commits unless every database accepts its rows
+                stack.enter_context(
+                    transaction.atomic(using=sharding.GLOBAL_DB_ALIAS))
+                entries = self._allocate(users)
+                by_shard = {}
+                for (_, user), entry in zip(users, entries):
+                    user.pk = entry.pk
+                    shard = sharding.home_for(user)
+                    by_shard.setdefault(shard, []).append(user)
+                for shard, group in by_shard.items():
+                    index.filter(pk__in=[user.pk for user in group]).update(
+                        shard=shard)
+                    stack.enter_context(transaction.atomic(using=shard))
+                    self._insert(group, shard)
+            self.created += len(users)
+            return []
+        except IntegrityError:
+            for _, user in users:
+                user.pk = None
+                user._state.adding = True
+                user._state.db = None
+        # save() allocates the id and picks the shard, see User.save
+        return self._save_each(users, None)
+
+    def _allocate(self, users):
+        """Create UserIndex entries, which hands out the user ids."""
+        entries = [UserIndex(email=user.email, username=user.username)
+                   for _, user in users]
+        connection = connections[sharding.GLOBAL_DB_ALIAS]
+        if connection.features.can_return_rows_from_bulk_insert:
+            return sharding.index().bulk_create(entries)
+        for entry in entries:
+            entry.save(using=sharding.GLOBAL_DB_ALIAS, force_insert=True)
+        return entries
+
+    def _insert(self, users, using):
+        if self.use_copy:
+            self._copy(users, using)
+        else:
+            self.model._default_manager.db_manager(using).bulk_create(users)
+
+    def _save_each(self, users, using):
+        """Insert users one at a time, reporting the ones that collide."""
+        errors = []
+        for line, user in users:
+            try:
+                with transaction.atomic(
+                        using=using or sharding.GLOBAL_DB_ALIAS):
+                    user.save(using=using, force_insert=True)
+                self.created += 1
+            except IntegrityError as exc:
+                field = violated_field(exc, self.model, UNIQUE_FIELDS)
+                if field is None:
+                    message = ('User with this email or username '
+                               'already exists.')
+                else:
+                    message = f'User with this {field} already exists.'
+                errors.append(RowError(line, field, message))
+        return errors
+
+    def _copy(self, users, using):
+        """Write users with PostgreSQL COPY."""
+        connection = connections[using]
+        # Ids are only set beforehand when UserIndex handed them out
+        with_pk = users[0].pk is not None
+        fields = [field for field in self.model._meta.concrete_fields
+                  if with_pk or not field.primary_key]
+        buffer = io.StringIO()
+        for user in users:
+            buffer.write('\t'.join(
+                _copy_value(field.get_db_prep_save(
+                    field.pre_save(user, True), connection))
+                for field in fields))
+            buffer.write('\n')
+        buffer.seek(0)
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in fields)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN', buffer)
+
+
+def format_error(error):
+    """Return a JSON-serialisable dict for a RowError."""
+    return {'line': error.line, 'field': error.field,
+            'message': error.message}
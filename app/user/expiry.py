@@ -0,0 +1,111 @@
+"""
+Expiry of database auth tokens.
+
+Token.created doubles as the time a token was last used: authentication
+moves it forward at most once per REFRESH_INTERVAL, so a token expires TTL
+seconds after its last use rather than after it was issued. Expired rows
+are rejected by authentication and deleted later by purge_expired().
+"""
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+
+PurgedBatch = namedtuple('PurgedBatch', ['last_key', 'scanned', 'deleted',
+                                         'elapsed'])
+
+
+def get_ttl():
+    """Seconds a token lives after its last use; 0 means forever."""
+    return getattr(settings, 'AUTH_TOKEN_EXPIRY', {}).get('TTL', 0)
+
+
+def get_refresh_interval():
+    return getattr(settings, 'AUTH_TOKEN_EXPIRY', {}).get(
+        'REFRESH_INTERVAL', 3600)
+
+
+def is_expired(token, now=None):
+    ttl = get_ttl()
+    if not ttl:
+        return False
+    now = now or timezone.now()
+    return token.created <= now - timedelta(seconds=ttl)
+
+
+def needs_refresh(token, now=None):
+    if not get_ttl():
+        return False
+    now = now or timezone.now()
+    return token.created <= now - timedelta(seconds=get_refresh_interval())
+
+
+def refresh(token, now=None):
+    """Record a use of token, sliding its expiry forward."""
+    now = now or timezone.now()
+    Token.objects.using(sharding.database_of(token)).filter(
+        key=token.key).update(created=now)
+    token.created = now
+
+
+def token_for(user):
+    """Return a live token for user, replacing an expired one."""
+    # Tokens live beside their user when users are sharded
+    tokens = Token.objects.db_manager(sharding.database_of(user))
+    token, created = tokens.get_or_create(user=user)
+    if created:
+        return token
+    if is_expired(token):
+        token.delete()
+        try:
+            with transaction.atomic(using=tokens.db):
+                return tokens.create(user=user)
+        except IntegrityError:
+            # A concurrent login replaced it first
+            return tokens.get(user=user)
+    if needs_refresh(token):
+        refresh(token)
+    return token
+
+
+def purge_expired(cutoff, batch_size=1000, sleep=0.0, dry_run=False,
+                  using=None):
+    """Delete tokens last used before cutoff, one key range at a time.
+
+    Each batch covers the next batch_size keys in primary key order and
+    deletes the expired ones among them in its own short transaction, so
+    locks and WAL stay bounded however large the table is. Yields a
+    PurgedBatch per range.
+    """
+    using = using or router.db_for_write(Token)
+    tokens = Token.objects.using(using)
+    last_key = ''
+    while True:
+        started = time.perf_counter()
+        boundary = list(tokens.filter(key__gt=last_key).order_by(
+            'key').values_list('key', flat=True)[batch_size - 1:batch_size])
+        upper = boundary[0] if boundary else None
+        in_range = tokens.filter(key__gt=last_key)
+        if upper is not None:
+            in_range = in_range.filter(key__lte=upper)
+        scanned = batch_size if upper is not None else in_range.count()
+        expired = in_range.filter(created__lt=cutoff)
+        if dry_run:
+            deleted = expired.count()
+        else:
+            # Skip the signal machinery: authentication already rejects
+            # expired tokens that are still cached
+            deleted = expired._raw_delete(using)
+        yield PurgedBatch(upper, scanned, deleted,
+                          time.perf_counter() - started)
+        if upper is None:
+            return
+        last_key = upper
+        if sleep:
+            time.sleep(sleep)
@@ -0,0 +1,177 @@
+"""
+Buffered last_login updates.
+
+Logins record their timestamp in memory instead of writing the user row on
+the request thread. A background thread writes the newest timestamp of
+every pending user with one UPDATE per batch, every FLUSH_INTERVAL seconds
+or as soon as MAX_PENDING users are waiting, and once more at exit.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import connections, router
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from core.db import sharding
+
+logger = logging.getLogger(__name__)
+
+
+def write_last_logins(timestamps, using=None, batch_size=1000):
+    """Write {user_id: timestamp}, never moving a last_login backwards."""
+    if using is None and sharding.is_enabled():
+        for alias, user_ids in sharding.locate_many(list(timestamps)).items():
+            write_last_logins({user_id: timestamps[user_id]
+                               for user_id in user_ids}, alias, batch_size)
+        return
+    model = get_user_model()
+    using = using or router.db_for_write(model)
+    items = sorted(timestamps.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        if connections[using].vendor == 'postgresql':
+            _update_from_values(model, batch, using)
+        else:
+            _update_with_case(model, batch, using)
+
+
+def _update_from_values(model, batch, using):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk = quote(model._meta.pk.column)
+    column = quote(model._meta.get_field('last_login').column)
+    values = ', '.join(['(%s, %s)'] * len(batch))
+    sql = (
+        f'UPDATE {table} AS u SET {column} = v.last_login '
+        f'FROM (VALUES {values}) AS v(id, last_login) '
+        f'WHERE u.{pk} = v.id '
+        f'AND (u.{column} IS NULL OR u.{column} < v.last_login)'
+    )
+    params = [value for pair in batch for value in pair]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _update_with_case(model, batch, using):
+    field = model._meta.get_field('last_login')
+    newer = [
+        When(Q(pk=user_id) & (Q(last_login__isnull=True)
+                              | Q(last_login__lt=when)),
+             then=Value(when, output_field=field))
+        for user_id, when in batch
+    ]
+    model._base_manager.using(using).filter(
+        pk__in=[user_id for user_id, _ in batch],
+    ).update(last_login=Case(*newer, default=F('last_login'),
+                             output_field=field))
+
+
+class LastLoginBuffer:
+    """Coalesces login timestamps per user and writes them in batches."""
+
+    def __init__(self, interval=5.0, max_pending=1000, using=None):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.using = using
+        self._reset()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the buffer from the LAST_LOGIN setting."""
+        options = getattr(settings, 'LAST_LOGIN', {})
+        return cls(interval=options.get('FLUSH_INTERVAL', 5.0),
+                   max_pending=options.get('MAX_PENDING', 1000))
+
+    def _reset(self):
+        """Start from scratch, e.g. in a freshly forked child."""
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, user_id, when):
+        """Remember that user_id logged in at when."""
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or when > previous:
+                self._pending[user_id] = when
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._stop,),
+                    name='last-login-flush', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self, stop):
+        while not stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def stop(self, timeout=None):
+        """Stop the flush thread once it has written what is pending."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def flush(self):
+        """Write every pending timestamp now; returns how many were sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            write_last_logins(pending, using=self.using)
+        except Exception:
+            logger.exception(
+                'Could not write %d last_login timestamp(s); will retry.',
+                len(pending))
+            with self._lock:
+                for user_id, when in pending.items():
+                    current = self._pending.get(user_id)
+                    if current is None or when > current:
+                        self._pending[user_id] = when
+            return 0
+        return len(pending)
+
+    def clear(self):
+        """Drop pending timestamps without writing them."""
+        with self._lock:
+            self._pending.clear()
+
+
+buffer = LastLoginBuffer.from_settings()
+atexit.register(buffer.flush)
+# The flush thread and its lock do not survive a fork; the parent still
+# writes what it had pending, so a child starts empty
+os.register_at_fork(after_in_child=buffer._reset)
+
+
+def record_login(sender, request=None, user=None, **kwargs):
+    """user_logged_in receiver replacing Django's update_last_login."""
+    options = getattr(settings, 'LAST_LOGIN', {})
+    if options.get('MODE', 'buffered') == 'sync':
+        update_last_login(sender, user, **kwargs)
+        return
+    user.last_login = timezone.now()
+    buffer.record(user.pk, user.last_login)
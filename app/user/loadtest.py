@@ -0,0 +1,97 @@
+"""
+Helpers for in-process load tests of the user API.
+"""
+import threading
+import time
+from collections import Counter
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by nearest rank."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies):
+    """Return count and latency percentiles in milliseconds."""
+    return {
+        'count': len(latencies),
+        'p50': _ms(percentile(latencies, 50)),
+        'p95': _ms(percentile(latencies, 95)),
+        'p99': _ms(percentile(latencies, 99)),
+        'max': _ms(max(latencies, default=None)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class Worker(threading.Thread):
+    """Calls target in a loop until stopped, timing every call.
+
+    target returns a status that is tallied in statuses. With an interval
+    calls start on a fixed schedule instead of back to back, so the offered
+    load does not drop when the server slows down.
+    """
+
+    def __init__(self, target, stop, interval=None):
+        super().__init__(daemon=True)
+        self.target = target
+        self.stop = stop
+        self.interval = interval
+        self.latencies = []
+        self.statuses = Counter()
+
+    def run(self):
+        from django.db import connections
+
+        scheduled = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                if self.interval:
+                    scheduled += self.interval
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0 and self.stop.wait(delay):
+                        break
+                started = time.perf_counter()
+                status = self.target()
+                self.latencies.append(time.perf_counter() - started)
+                self.statuses[status] += 1
+        finally:
+            connections.close_all()
+
+
+def run_workers(groups, duration):
+    """Run {name: (targets, rate)} for duration seconds.
+
+    Each group runs one thread per callable in targets. rate is the total
+    calls per second for the group, or None to call as fast as possible.
+    Returns {name: (latencies, statuses)} merged across each group's
+    threads.
+    """
+    stop = threading.Event()
+    workers = {
+        name: [Worker(target, stop, len(targets) / rate if rate else None)
+               for target in targets]
+        for name, (targets, rate) in groups.items()
+    }
+    for group in workers.values():
+        for worker in group:
+            worker.start()
+    time.sleep(duration)
+    stop.set()
+
+    results = {}
+    for name, group in workers.items():
+        latencies = []
+        statuses = Counter()
+        for worker in group:
+            worker.join()
+            latencies.extend(worker.latencies)
+            statuses.update(worker.statuses)
+        results[name] = (latencies, statuses)
+    return results
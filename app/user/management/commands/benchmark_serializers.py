@@ -0,0 +1,78 @@
+"""
+Django management command to compare user serializer costs.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from user.serializers import (
+    UserListReadSerializer,
+    UserListSerializer,
+    UserReadSerializer,
+    UserSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = ('Compare per-object cost of the DRF and precompiled user '
+            'serializers on in-memory users')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=5000,
+            help='Single-object serializations per serializer.')
+        parser.add_argument(
+            '--list-size', type=int, default=10000,
+            help='Users per list serialization.')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Runs per measurement; the fastest counts.')
+
+    def handle(self, *args, **options):
+        model = get_user_model()
+        users = [
+            model(id=i, email=f'user{i}@example.com', username=f'user{i}',
+                  name=f'User {i}', is_active=True, is_staff=i % 7 == 0)
+            for i in range(1, options['list_size'] + 1)
+        ]
+        rows = [tuple(getattr(user, source)
+                      for source in UserListReadSerializer.sources())
+                for user in users]
+        user = users[0]
+        iterations = options['iterations']
+        repeat = options['repeat']
+
+        self.stdout.write(f'single object ({iterations} runs):')
+        self._report([
+            ('UserSerializer', lambda: [
+                UserSerializer(user).data for _ in range(iterations)]),
+            ('UserReadSerializer', lambda: [
+                UserReadSerializer.to_representation(user)
+                for _ in range(iterations)]),
+        ], iterations, repeat)
+
+        self.stdout.write(f'list of {len(users)}:')
+        self._report([
+            ('UserListSerializer', lambda: UserListSerializer(
+                users, many=True).data),
+            ('UserListReadSerializer', lambda: UserListReadSerializer.many(
+                users)),
+            ('... from values_list', lambda: UserListReadSerializer
+                .from_values(rows)),
+        ], len(users), repeat)
+
+    def _report(self, cases, count, repeat):
+        baseline = None
+        for label, fn in cases:
+            elapsed = min(self._time(fn) for _ in range(repeat)) / count
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f'  {label:<24} {elapsed * 1e6:8.2f} us per object '
+                f'({baseline / elapsed:.1f}x)')
+
+    @staticmethod
+    def _time(fn):
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
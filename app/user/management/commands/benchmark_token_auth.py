@@ -0,0 +1,71 @@
+"""
+Django management command to compare token authentication costs.
+"""
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    token_cache,
+    user_cache,
+)
+
+
+class Command(BaseCommand):
+    help = ('Compare the per-request cost of database, cached and signed '
+            'token authentication')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=5000,
+            help='Authentications per method.')
+
+    def handle(self, *args, **options):
+        name = f'bench-{uuid.uuid4().hex[:12]}'
+        user = get_user_model().objects.create_user(
+            email=f'{name}@example.com', username=name,
+            password=uuid.uuid4().hex)
+        key = Token.objects.db_manager(
+            sharding.database_of(user)).create(user=user).key
+        signed = tokens.issue(user)
+        try:
+            cases = [
+                ('db token', TokenAuthentication(), key, None),
+                ('cached db token', CachedTokenAuthentication(), key, None),
+                ('signed token', SignedTokenAuthentication(), signed, None),
+                ('signed token, cold cache', SignedTokenAuthentication(),
+                 signed, user_cache.clear),
+            ]
+            for label, backend, credential, before in cases:
+                token_cache.clear()
+                user_cache.clear()
+                elapsed, queries = self._measure(
+                    backend, credential, before, options['iterations'])
+                self.stdout.write(
+                    f'{label:<26} {elapsed * 1e6:8.1f} us  '
+                    f'{queries:.2f} queries per authentication')
+        finally:
+            user.delete()
+
+    @staticmethod
+    def _measure(backend, credential, before, iterations):
+        backend.authenticate_credentials(credential)
+        total = 0.0
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                if before is not None:
+                    before()
+                started = time.perf_counter()
+                backend.authenticate_credentials(credential)
+                total += time.perf_counter() - started
+        return total / iterations, len(queries) / iterations
@@ -0,0 +1,113 @@
+"""
+Django management command to benchmark the user API.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.benchmark import SCENARIOS, UserAPIBenchmark, compare
+
+
+class Command(BaseCommand):
+    help = ('Benchmark user:create, user:token and user:me against the '
+            'configured database and compare with a baseline. Creates and '
+            'then deletes bench-* users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=SCENARIOS, default=None,
+            help='Scenario to run; repeat for several (default: all).')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Client threads per scenario.')
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Measured seconds per scenario.')
+        parser.add_argument(
+            '--warmup', type=float, default=1.0,
+            help='Unmeasured seconds before each scenario.')
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send; must be in ALLOWED_HOSTS.')
+        parser.add_argument(
+            '--throttled', action='store_true',
+            help='Keep the login and signup throttles enabled.')
+        parser.add_argument(
+            '--output',
+            help='Write the results as JSON to this file.')
+        parser.add_argument(
+            '--baseline',
+            help='JSON results to compare with.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.1,
+            help='Allowed relative slowdown before a regression is flagged.')
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Store the results as the new --baseline.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline requires --baseline.')
+        baseline = None
+        if options['baseline'] and not options['save_baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline: {exc}')
+
+        benchmark = UserAPIBenchmark(
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            warmup=options['warmup'],
+            host=options['host'],
+            throttled=options['throttled'],
+        )
+        results = benchmark.run(options['scenarios'] or SCENARIOS)
+        self._report(results)
+
+        for path in filter(None, (
+                options['output'],
+                options['baseline'] if options['save_baseline'] else None)):
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Wrote {path}')
+
+        if baseline is not None:
+            rows = compare(results, baseline, options['tolerance'])
+            regressions = self._report_comparison(rows)
+            if regressions:
+                raise CommandError(
+                    'Performance regression: ' + ', '.join(regressions))
+
+    def _report(self, results):
+        self.stdout.write(
+            f'{"scenario":<8} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"queries":>8} {"errors":>7}')
+        for name, stats in results['scenarios'].items():
+            self.stdout.write(
+                f'{name:<8} {stats["throughput"]:>9.1f} '
+                f'{_num(stats["p50_ms"]):>8} {_num(stats["p95_ms"]):>8} '
+                f'{_num(stats["p99_ms"]):>8} '
+                f'{_num(stats["queries_per_request"]):>8} '
+                f'{stats["errors"]:>7}')
+
+    def _report_comparison(self, rows):
+        regressions = []
+        for scenario, metric, old, new, regressed in rows:
+            change = (new - old) / old * 100 if old else 0.0
+            line = (f'{scenario}.{metric}: {_num(old)} -> {_num(new)} '
+                    f'({change:+.1f}%)')
+            if regressed:
+                regressions.append(f'{scenario}.{metric}')
+                self.stdout.write(self.style.ERROR(line + ' REGRESSION'))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+
+def _num(value):
+    return '-' if value is None else f'{value:.2f}'
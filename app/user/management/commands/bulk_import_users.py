@@ -0,0 +1,69 @@
+"""
+Django management command to bulk import users from CSV or JSONL.
+"""
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.bulk import FORMATS, UserImporter, decode_lines, format_error, \
+    read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Input file, or - to read from stdin.')
+        parser.add_argument(
+            '--format', choices=FORMATS, default=None,
+            help='Input format (default: guessed from the file extension).')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows validated and written per batch.')
+        parser.add_argument(
+            '--errors', default=None,
+            help='Write rejected rows as JSONL to this file '
+                 '(default: stderr).')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database alias to import into.')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create even when COPY is available.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        importer = UserImporter(
+            batch_size=options['batch_size'],
+            using=options['database'],
+            use_copy=False if options['no_copy'] else None,
+        )
+        started = time.perf_counter()
+        try:
+            source = sys.stdin if path == '-' else open(
+                path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        errors_out = (open(options['errors'], 'w', encoding='utf-8')
+                      if options['errors'] else self.stderr)
+        try:
+            for error in importer.run(read_rows(decode_lines(source), fmt)):
+                errors_out.write(json.dumps(format_error(error)) + '\n')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if options['errors']:
+                errors_out.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.created} users, rejected '
+            f'{importer.rejected} rows in {elapsed:.2f}s.'))
@@ -0,0 +1,81 @@
+"""
+Django management command to stream the user table as CSV or JSONL.
+"""
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.export import FORMATS, EXPORT_FIELDS, csv_chunks, encode_chunks, \
+    iter_user_rows, jsonl_chunks
+
+
+class Command(BaseCommand):
+    help = 'Stream the user table as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=FORMATS, default='csv',
+            help='Output format.')
+        parser.add_argument(
+            '--output', default='-',
+            help='Output file, or - for stdout.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Gzip compress the output.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows fetched from the server-side cursor at a time.')
+        parser.add_argument(
+            '--database', default=None,
+            help='Database alias to read from.')
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Report rows/sec and peak RSS on stderr.')
+
+    def handle(self, *args, **options):
+        rows = iter_user_rows(EXPORT_FIELDS, chunk_size=options['chunk_size'],
+                              using=options['database'])
+        counter = _Counter(rows)
+        writer = csv_chunks if options['format'] == 'csv' else jsonl_chunks
+        chunks = encode_chunks(writer(counter, EXPORT_FIELDS),
+                               compress=options['gzip'])
+
+        started = time.perf_counter()
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+        else:
+            out = open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
+        elapsed = time.perf_counter() - started
+
+        if options['stats']:
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rate = counter.count / elapsed if elapsed else 0.0
+            self.stderr.write(
+                f'Exported {counter.count} rows in {elapsed:.2f}s '
+                f'({rate:.0f} rows/sec), peak RSS {peak_rss / 1024:.1f} MiB')
+
+
+class _Counter:
+    """Iterator wrapper counting the rows that pass through it."""
+
+    def __init__(self, iterable):
+        self.iterable = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.iterable)
+        self.count += 1
+        return row
@@ -0,0 +1,128 @@
+"""
+Django management command to measure /me/ latency during a login flood.
+"""
+import itertools
+import logging
+import random
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.db import sharding
+from user.loadtest import run_workers, summarize
+from user.throttles import reset_throttles
+
+
+class Command(BaseCommand):
+    help = ('Flood the login endpoint with bad credentials and report '
+            'the latency of authenticated /me/ requests meanwhile')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Seconds to run each phase.')
+        parser.add_argument(
+            '--flood-threads', type=int, default=8,
+            help='Threads posting bad logins.')
+        parser.add_argument(
+            '--flood-rate', type=float, default=100.0,
+            help='Bad logins offered per second.')
+        parser.add_argument(
+            '--probe-threads', type=int, default=2,
+            help='Threads requesting /me/.')
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send; must be in ALLOWED_HOSTS.')
+        parser.add_argument(
+            '--global-rate', default=None,
+            help='login_global rate for the throttled phase, e.g. 5/s '
+                 '(default: the configured rate).')
+        parser.add_argument(
+            '--no-compare', action='store_true',
+            help='Skip the phase with throttling disabled.')
+
+    def handle(self, *args, **options):
+        password = uuid.uuid4().hex
+        name = f'loadtest-{uuid.uuid4().hex[:12]}'
+        user = get_user_model().objects.create_user(
+            email=f'{name}@example.com', username=name, password=password)
+        token = Token.objects.db_manager(
+            sharding.database_of(user)).create(user=user)
+        # Every rejected login would otherwise log a warning
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            phases = [('baseline', False, True), ('flood', True, True)]
+            if not options['no_compare']:
+                phases.append(('flood, unthrottled', True, False))
+            for label, flood, throttled in phases:
+                reset_throttles()
+                with self._throttling(throttled, options['global_rate']):
+                    results = self._run(token, flood, options)
+                self._report(label, results)
+        finally:
+            request_logger.setLevel(level)
+            reset_throttles()
+            user.delete()
+
+    def _run(self, token, flood, options):
+        host = options['host']
+        me_url = reverse('user:me')
+        token_url = reverse('user:token')
+        addresses = itertools.count(1)
+
+        def probe():
+            client = Client(HTTP_HOST=host,
+                            HTTP_AUTHORIZATION=f'Token {token.key}')
+            return client.get(me_url).status_code
+
+        def attack():
+            # Spread over many addresses and usernames so only the global
+            # limit applies, as in a distributed credential-stuffing run
+            address = next(addresses)
+            client = Client(
+                HTTP_HOST=host,
+                REMOTE_ADDR=f'10.{address >> 16 & 255}.'
+                            f'{address >> 8 & 255}.{address & 255}')
+            return client.post(token_url, {
+                'username': f'victim{random.randrange(10 ** 6)}',
+                'password': 'wrong-password',
+            }).status_code
+
+        groups = {'me': ([probe] * options['probe_threads'], None)}
+        if flood:
+            groups['login'] = ([attack] * options['flood_threads'],
+                               options['flood_rate'])
+        return run_workers(groups, options['duration'])
+
+    @staticmethod
+    def _throttling(enabled, global_rate):
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        rates = dict(rest_framework.get('DEFAULT_THROTTLE_RATES', {}))
+        if not enabled:
+            rates = dict.fromkeys(rates)
+        elif global_rate:
+            rates['login_global'] = global_rate
+        rest_framework['DEFAULT_THROTTLE_RATES'] = rates
+        return override_settings(REST_FRAMEWORK=rest_framework)
+
+    def _report(self, label, results):
+        self.stdout.write(f'{label}:')
+        for name, (latencies, statuses) in results.items():
+            stats = summarize(latencies)
+            codes = ', '.join(
+                f'{code}={count}' for code, count in sorted(statuses.items()))
+            self.stdout.write(
+                f'  {name:<6} n={stats["count"]:<6} '
+                f'p50={_fmt(stats["p50"])} p99={_fmt(stats["p99"])} '
+                f'max={_fmt(stats["max"])}  [{codes}]')
+
+
+def _fmt(ms):
+    return '-' if ms is None else f'{ms:.1f}ms'
@@ -0,0 +1,88 @@
+"""
+Django management command to delete expired auth tokens.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.db import sharding
+from user import expiry
+
+
+class Command(BaseCommand):
+    help = ('Delete database tokens unused for longer than '
+            'AUTH_TOKEN_EXPIRY TTL, in batches by key range')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Tokens scanned per key range and transaction.')
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches.')
+        parser.add_argument(
+            '--older-than', type=int, default=None,
+            help='Idle seconds after which a token is purged '
+                 '(default: the configured TTL).')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count expired tokens without deleting them.')
+        parser.add_argument(
+            '--loop', type=float, default=None, metavar='SECONDS',
+            help='Keep running, purging again every SECONDS.')
+        parser.add_argument(
+            '--database', default=None,
+            help='Database alias to purge (default: the primary, or every '
+                 'shard when users are sharded).')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        ttl = options['older_than']
+        if ttl is None:
+            ttl = expiry.get_ttl()
+        if not ttl:
+            self.stdout.write('Token expiry is disabled; nothing to purge.')
+            return
+
+        if options['database']:
+            aliases = [options['database']]
+        elif sharding.is_enabled():
+            aliases = sharding.databases()
+        else:
+            aliases = [None]
+        while True:
+            for alias in aliases:
+                self.purge(ttl, options, alias)
+            if options['loop'] is None:
+                return
+            time.sleep(options['loop'])
+
+    def purge(self, ttl, options, using=None):
+        cutoff = timezone.now() - timedelta(seconds=ttl)
+        started = time.perf_counter()
+        batches = scanned = deleted = 0
+        slowest = 0.0
+        for batch in expiry.purge_expired(
+                cutoff, batch_size=options['batch_size'],
+                sleep=options['sleep'], dry_run=options['dry_run'],
+                using=using):
+            batches += 1
+            scanned += batch.scanned
+            deleted += batch.deleted
+            slowest = max(slowest, batch.elapsed)
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'  up to {batch.last_key or "end"}: {batch.deleted} of '
+                    f'{batch.scanned} in {batch.elapsed * 1000:.1f} ms')
+        elapsed = time.perf_counter() - started
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        if using:
+            action = f'{using}: {action}'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {deleted} of {scanned} tokens unused since '
+            f'{cutoff:%Y-%m-%d %H:%M:%S} in {batches} batches, '
+            f'{elapsed:.2f}s (slowest batch {slowest * 1000:.1f} ms).'))
+        return deleted
@@ -0,0 +1,165 @@
+"""
+Keyset pagination for user listings.
+"""
+import base64
+import binascii
+import heapq
+import json
+from collections import OrderedDict
+from itertools import islice
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.db import sharding
+
+
+class KeysetPagination(BasePagination):
+    """Seek pagination that never uses OFFSET or COUNT(*).
+
+    Each page filters on the last key of the previous page, so fetching
+    page 10,000 costs the same index range scan as page 1. Sharded users
+    are paged on every shard and merged, which only orderings in
+    merge_orderings allow: other keys may sort differently in the
+    databases' collation than in Python.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    orderings = {
+        'id': ('id',),
+        'name': ('name', 'id'),
+    }
+    default_ordering = 'id'
+    merge_orderings = ('id',)
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = request.query_params.get(
+            self.ordering_query_param, self.default_ordering)
+        if self.ordering not in self.orderings:
+            raise ValidationError({self.ordering_query_param: [
+                'Must be one of: {}.'.format(', '.join(self.orderings))]})
+        self.fields = self.orderings[self.ordering]
+        querysets = sharding.spread(queryset)
+        if len(querysets) > 1 and self.ordering not in self.merge_orderings:
+            raise ValidationError({self.ordering_query_param: [
+                f'{self.ordering} is unavailable while users are sharded.']})
+        page_size = self.get_page_size(request)
+
+        key = self.decode_cursor(request, queryset.model)
+        if key is not None:
+            querysets = [queryset.filter(self.seek_filter(key))
+                         for queryset in querysets]
+
+        pages = [list(queryset.order_by(*self.fields)[:page_size + 1])
+                 for queryset in querysets]
+        rows = pages[0] if len(pages) == 1 else list(islice(
+            heapq.merge(*pages, key=attrgetter(*self.fields)),
+            page_size + 1))
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_key = ([getattr(rows[-1], field) for field in self.fields]
+                         if self.has_next else None)
+        return rows
+
+    def seek_filter(self, key):
+        """Return a filter for rows strictly after key in the ordering.
+
+        The leading >= keeps the condition sargable, so the composite index
+        serves it as a single range scan.
+        """
+        first, *rest = zip(self.fields, key)
+        query = Q(**{f'{first[0]}__gt': first[1]})
+        equal = Q(**{first[0]: first[1]})
+        for field, value in rest:
+            query |= equal & Q(**{f'{field}__gt': value})
+            equal &= Q(**{field: value})
+        return Q(**{f'{first[0]}__gte': first[1]}) & query
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        """Return the key in the cursor, converted by model's fields."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            ordering, key = data['o'], data['k']
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (ordering != self.ordering or not isinstance(key, list)
+                or len(key) != len(self.fields) or None in key):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [model._meta.get_field(field).to_python(value)
+                    for field, value in zip(self.fields, key)]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key):
+        data = json.dumps({'o': self.ordering, 'k': key},
+                          separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.ordering_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Sort key.',
+                'schema': {'type': 'string', 'enum': list(self.orderings)},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
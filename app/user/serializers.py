@@ -3,39 +3,93 @@ Docstring for app.user.serializers
 """
 
 from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth.signals import user_logged_in
 from rest_framework import serializers
 from django.utils.translation import gettext as _
+from core.db.integrity import unique_errors
+from core.search import RESULT_FIELDS
+from core.serializers import (
+    ReadSerializer,
+    TimedListSerializer,
+    TimedSerializerMixin,
+)
 
+UNIQUE_FIELDS = ('email', 'username')
 
-class UserSerializer(serializers.ModelSerializer):
-    """Serializer for the user object"""
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for the user object
+
+    Uniqueness is left to the database's unique indexes, including the
+    case-insensitive ones, instead of a SELECT per field, so a signup is a
+    single INSERT and concurrent duplicates still get a 400.
+    """
 
     class Meta:
         model = get_user_model()
         fields = ('email', 'username', 'name', 'password')
-        extra_kwargs = {'password': {'write_only': True, 'min_length': 8}}
+        extra_kwargs = {
+            'password': {'write_only': True, 'min_length': 8},
+            'email': {'validators': []},
+            'username': {'validators': []},
+        }
 
     def create(self, validated_data):
         """Create and return a user with encrypted password"""
-        return get_user_model().objects.create_user(**validated_data)
+        with self._unique_errors():
+            return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
         """Update a user, setting the password correctly and return it"""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            # A new password revokes outstanding signed access tokens
+            instance.token_version += 1
 
-        return user
+        # A single save, so the row version is bumped exactly once
+        with self._unique_errors():
+            return super().update(instance, validated_data)
+
+    def _unique_errors(self):
+        return unique_errors(get_user_model(), UNIQUE_FIELDS,
+                             error_class=serializers.ValidationError)
 
     def retrieve(self, instance):
         """Retrieve a user"""
         return instance
 
 
-class AuthTokenSerializer(serializers.Serializer):
+class UserListSerializer(serializers.ModelSerializer):
+    """Lean read-only serializer for user listings"""
+
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'email', 'username', 'name', 'is_active', 'is_staff')
+        read_only_fields = fields
+        list_serializer_class = TimedListSerializer
+
+
+class UserSearchSerializer(serializers.ModelSerializer):
+    """Describes a search match; core.search builds the data itself"""
+
+    class Meta:
+        model = get_user_model()
+        fields = RESULT_FIELDS
+        read_only_fields = fields
+
+
+class UserReadSerializer(ReadSerializer):
+    """Fast read-only equivalent of UserSerializer"""
+    serializer_class = UserSerializer
+
+
+class UserListReadSerializer(ReadSerializer):
+    """Fast read-only equivalent of UserListSerializer"""
+    serializer_class = UserListSerializer
+
+
+class AuthTokenSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer for the user authentication object"""
     username = serializers.CharField()
     password = serializers.CharField(
@@ -57,5 +111,8 @@ class AuthTokenSerializer(serializers.Serializer):
             msg = _('Unable to authenticate with provided credentials')
             raise serializers.ValidationError(msg, code='authorization')
 
+        # Token logins count as logins, e.g. for last_login
+        user_logged_in.send(sender=user.__class__,
+                            request=self.context.get('request'), user=user)
         attrs['user'] = user
         return attrs
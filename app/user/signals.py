@@ -0,0 +1,40 @@
+"""
+Signal handlers for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache, user_cache, user_stamps
+from user.last_login import record_login
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """Forget a cached token once it is deleted."""
+    token_cache.invalidate(instance.key)
+
+
+def invalidate_user_tokens(sender, instance, using=None, **kwargs):
+    """Forget cached tokens whenever their user row changes.
+
+    Other processes drop theirs once the new stamp is in place, after the
+    change commits so that none of them caches the old row under it.
+    """
+    token_cache.invalidate_user(instance.pk, using)
+    user_cache.invalidate(instance.pk)
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_stamps.bump(user_id), using=using)
+
+
+post_delete.connect(invalidate_token, sender=Token,
+                    dispatch_uid='user.invalidate_token')
+post_save.connect(invalidate_user_tokens, sender=get_user_model(),
+                  dispatch_uid='user.invalidate_user_tokens_save')
+post_delete.connect(invalidate_user_tokens, sender=get_user_model(),
+                    dispatch_uid='user.invalidate_user_tokens_delete')
+
+# Buffer last_login writes instead of saving the user on every login
+user_logged_in.disconnect(dispatch_uid='update_last_login')
+user_logged_in.connect(record_login, dispatch_uid='user.record_login')
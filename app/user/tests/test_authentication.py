@@ -0,0 +1,174 @@
+"""
+Tests for the cached token authentication backend.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    TokenCache,
+    UserCache,
+    token_cache,
+    user_stamps,
+)
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    defaults = {
+        'email': 'test@example.com',
+        'username': 'testuser',
+        'password': 'testpass123',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for CachedTokenAuthentication."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_token_query(self):
+        """Test only the first request looks the token up."""
+        with CaptureQueriesContext(connection) as first:
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as second:
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 0)
+
+    def test_deleted_token_is_rejected(self):
+        """Test deleting a token invalidates the cached entry."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test saving the user invalidates its cached tokens."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_process_drops_changed_user(self):
+        """Test a save in one process invalidates tokens cached by others."""
+        other = TokenCache(stamps=user_stamps)
+        other.set(Token.objects.select_related('user').get(
+            key=self.token.key))
+        self.assertIsNotNone(other.get(self.token.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertIsNone(other.get(self.token.key))
+
+    def test_other_process_drops_changed_signed_user(self):
+        """Test cached users for signed tokens follow the stamp too."""
+        other = UserCache(stamps=user_stamps)
+        _, stamp = other.get(self.user.pk)
+        other.set(self.user, stamp)
+        self.assertIsNotNone(other.get(self.user.pk)[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+
+        self.assertIsNone(other.get(self.user.pk)[0])
+
+    def test_profile_update_is_visible(self):
+        """Test a PATCH is reflected in later cached reads."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New Name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_cached_user_is_a_copy(self):
+        """Test mutating an authenticated user does not leak into cache."""
+        self.client.get(ME_URL)
+        cached = token_cache.get(self.token.key)
+        cached.user.name = 'Mutated'
+
+        self.assertEqual(token_cache.get(self.token.key).user.name, '')
+
+    def test_stamps_kept_for_many_users(self):
+        """Test the shared cache keeps a stamp for every active user."""
+        user_ids = range(10 ** 9, 10 ** 9 + 400)
+        self.addCleanup(caches[user_stamps.alias].delete_many, [
+            f'{user_stamps.key_prefix}{user_id}' for user_id in user_ids])
+
+        stamps = [user_stamps.get(user_id) for user_id in user_ids]
+
+        self.assertEqual([user_stamps.get(user_id) for user_id in user_ids],
+                         stamps)
+
+    def test_lru_is_bounded(self):
+        """Test the in-process tier never exceeds its max size."""
+        max_entries = token_cache.local.max_entries
+        token_cache.local.max_entries = 2
+        try:
+            for i in range(3):
+                user = create_user(email=f'u{i}@example.com',
+                                   username=f'user{i}')
+                token_cache.set(Token.objects.create(user=user))
+            self.assertEqual(len(token_cache.local), 2)
+        finally:
+            token_cache.local.max_entries = max_entries
+
+
+class TokenAuthenticationQueryBenchmark(TestCase):
+    """Queries per /me/ request with and without the token cache."""
+
+    requests = 20
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _queries_for_requests(self):
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(self.requests):
+                self.client.get(ME_URL)
+        return len(ctx)
+
+    def test_queries_per_request(self):
+        """Test caching drops token queries from 1 per request to ~0."""
+        local = token_cache.local
+        max_entries = local.max_entries
+        local.max_entries = 0
+        try:
+            uncached = self._queries_for_requests()
+        finally:
+            local.max_entries = max_entries
+        cached = self._queries_for_requests()
+
+        self.assertEqual(uncached, self.requests)
+        self.assertEqual(cached, 1)
@@ -0,0 +1,86 @@
+"""
+Tests for the user API benchmark.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from user.benchmark import UserAPIBenchmark, compare
+
+
+def results_with(**stats):
+    return {'scenarios': {'me': {
+        'throughput': 100.0, 'p50_ms': 5.0, 'p95_ms': 8.0, 'p99_ms': 10.0,
+        'queries_per_request': 1.0, **stats}}}
+
+
+class CompareTests(SimpleTestCase):
+    """Tests for comparing results with a baseline."""
+
+    def regressions(self, results, baseline=None):
+        rows = compare(results, baseline or results_with(), tolerance=0.1)
+        return [metric for _, metric, _, _, regressed in rows if regressed]
+
+    def test_within_tolerance(self):
+        """Test small changes are not flagged."""
+        self.assertEqual(
+            self.regressions(results_with(throughput=95.0, p99_ms=10.9)), [])
+
+    def test_slower(self):
+        """Test lower throughput and higher latency are flagged."""
+        self.assertEqual(
+            self.regressions(results_with(throughput=80.0, p99_ms=12.0)),
+            ['throughput', 'p99_ms'])
+
+    def test_extra_queries(self):
+        """Test any extra query per request is flagged."""
+        self.assertEqual(
+            self.regressions(results_with(queries_per_request=1.1)),
+            ['queries_per_request'])
+
+    def test_new_scenario(self):
+        """Test scenarios missing from the baseline are skipped."""
+        self.assertEqual(compare(results_with(), {'scenarios': {}}), [])
+
+
+class BenchmarkRunTests(TransactionTestCase):
+    """Tests for running the benchmark.
+
+    Client threads use their own connections, so the data must be
+    committed.
+    """
+
+    def test_run(self):
+        """Test every scenario reports figures and users are removed."""
+        benchmark = UserAPIBenchmark(
+            concurrency=2, duration=0.2, warmup=0, host='testserver')
+
+        results = benchmark.run()
+
+        self.assertEqual(set(results['scenarios']), {'create', 'token', 'me'})
+        for stats in results['scenarios'].values():
+            self.assertGreater(stats['requests'], 0)
+            self.assertEqual(stats['errors'], 0)
+        self.assertGreaterEqual(
+            results['scenarios']['token']['queries_per_request'], 1)
+        self.assertFalse(get_user_model().objects.filter(
+            username__startswith='bench-').exists())
+
+    def test_command_flags_regression(self):
+        """Test the command fails when the baseline is much faster."""
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            with open(baseline, 'w') as f:
+                json.dump(results_with(throughput=1e9), f)
+
+            with self.assertRaisesMessage(CommandError, 'me.throughput'):
+                call_command('benchmark_user_api', '--scenario', 'me',
+                             '--duration', '0.1', '--warmup', '0',
+                             '--concurrency', '1', '--host', 'testserver',
+                             '--baseline', baseline,
+                             stdout=StringIO())
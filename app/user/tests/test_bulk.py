@@ -0,0 +1,264 @@
+"""
+Tests for bulk user import.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import sharding
+from core.models import UserIndex
+from core.test_runner import TEST_SHARDS
+from user.bulk import UserImporter, read_rows
+
+BULK_URL = reverse('user:bulk')
+
+CSV_DATA = (
+    'email,username,name,password\n'
+    'one@EXAMPLE.com,one,One,testpass123\n'
+    'two@example.com,two,Two,testpass123\n'
+    'bad-email,three,Three,testpass123\n'
+    'four@example.com,four,Four,short\n'
+    'one@example.com,five,Five,testpass123\n'
+)
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class UserImporterTests(TestCase):
+    """Tests for UserImporter."""
+
+    def _import(self, text, fmt='csv', **kwargs):
+        importer = UserImporter(use_copy=False, **kwargs)
+        errors = list(importer.run(read_rows(StringIO(text), fmt)))
+        return importer, errors
+
+    def test_import_csv(self):
+        """Test valid rows are created and invalid ones reported."""
+        importer, errors = self._import(CSV_DATA)
+
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(importer.rejected, 3)
+        self.assertEqual(
+            [(error.line, error.field) for error in errors],
+            [(4, 'email'), (5, 'password'), (6, 'email')],
+        )
+        user = get_user_model().objects.get(username='one')
+        self.assertEqual(user.email, 'one@example.com')
+        self.assertTrue(user.check_password('testpass123'))
+
+    def test_import_jsonl(self):
+        """Test JSONL input, including malformed lines."""
+        text = '\n'.join([
+            json.dumps({'email': 'a@example.com', 'username': 'a',
+                        'password': 'testpass123'}),
+            'not json',
+            '',
+            json.dumps({'email': 'b@example.com', 'username': 'b',
+                        'password': 'testpass123'}),
+        ])
+
+        importer, errors = self._import(text, fmt='jsonl')
+
+        self.assertEqual(importer.created, 2)
+        self.assertEqual([(error.line, error.message) for error in errors],
+                         [(2, 'Malformed row.')])
+
+    def test_existing_users_rejected(self):
+        """Test collisions with existing rows are pre-checked."""
+        create_user(email='two@example.com', username='existing',
+                    password='testpass123')
+        create_user(email='other@example.com', username='one',
+                    password='testpass123')
+
+        importer, errors = self._import(CSV_DATA)
+
+        self.assertEqual(importer.created, 0)
+        self.assertIn((2, 'username'), [(e.line, e.field) for e in errors])
+        self.assertIn((3, 'email'), [(e.line, e.field) for e in errors])
+
+    def test_duplicates_across_batches(self):
+        """Test a duplicate in a later batch is caught by the pre-check."""
+        importer, errors = self._import(CSV_DATA, batch_size=1)
+
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(errors[-1].line, 6)
+        self.assertEqual(errors[-1].field, 'email')
+
+    def test_case_variant_reported_by_field(self):
+        """Test a case-only collision with an existing user is rejected."""
+        create_user(email='TWO@example.com', username='existing',
+                    password='testpass123')
+
+        importer, errors = self._import(CSV_DATA)
+
+        self.assertIn((3, 'email'), [(e.line, e.field) for e in errors])
+        self.assertFalse(get_user_model().objects.filter(
+            username='two').exists())
+
+    def test_case_variants_in_input(self):
+        """Test rows differing only by case count as duplicates."""
+        text = ('email,username,name,password\n'
+                'sam@example.com,sam,,testpass123\n'
+                'SAM@example.com,sammy,,testpass123\n'
+                'other@example.com,SAM,,testpass123\n')
+
+        importer, errors = self._import(text)
+
+        self.assertEqual(importer.created, 1)
+        self.assertEqual([(error.line, error.field) for error in errors],
+                         [(3, 'email'), (4, 'username')])
+
+    def test_batch_queries(self):
+        """Test each batch costs a fixed number of queries."""
+        rows = ''.join(
+            f'user{i}@example.com,user{i},,testpass123\n' for i in range(50))
+
+        # Two pre-check SELECTs and one INSERT wrapped in a savepoint
+        with self.assertNumQueries(5):
+            importer, errors = self._import(
+                'email,username,name,password\n' + rows, batch_size=50)
+
+        self.assertEqual(importer.created, 50)
+
+
+@override_settings(USER_SHARDS=TEST_SHARDS)
+class ShardedImportTests(TestCase):
+    """Tests for importing users spread over shards."""
+
+    databases = {'default', *TEST_SHARDS}
+
+    def _import(self, text, **kwargs):
+        importer = UserImporter(**kwargs)
+        errors = list(importer.run(read_rows(StringIO(text), 'csv')))
+        return importer, errors
+
+    def test_import_indexes_users_on_their_shards(self):
+        """Test imported users get ids from UserIndex and can log in."""
+        rows = ''.join(f'user{i}@example.com,user{i},,testpass123\n'
+                       for i in range(8))
+
+        importer, errors = self._import(
+            'email,username,name,password\n' + rows, batch_size=3)
+
+        self.assertEqual((importer.created, errors), (8, []))
+        shards = set()
+        for entry in UserIndex.objects.all():
+            self.assertEqual(entry.shard, sharding.shard_for(entry.pk))
+            self.assertTrue(get_user_model()._base_manager.using(
+                entry.shard).filter(pk=entry.pk,
+                                    username=entry.username).exists())
+            shards.add(entry.shard)
+        self.assertEqual(shards, set(TEST_SHARDS))
+        self.assertEqual(
+            authenticate(username='user5', password='testpass123').pk,
+            UserIndex.objects.get(username='user5').pk)
+
+    def test_users_on_other_shards_rejected(self):
+        """Test collisions are found whichever shard holds the user."""
+        for i in range(4):
+            create_user(email=f'taken{i}@example.com', username=f'taken{i}',
+                        password='testpass123')
+        text = ('email,username,name,password\n'
+                'TAKEN0@example.com,new0,,testpass123\n'
+                'new1@example.com,Taken3,,testpass123\n'
+                'new2@example.com,new2,,testpass123\n')
+
+        importer, errors = self._import(text)
+
+        self.assertEqual(importer.created, 1)
+        self.assertEqual([(error.line, error.field) for error in errors],
+                         [(2, 'email'), (3, 'username')])
+
+    def test_failed_batch_saves_each_user(self):
+        """Test a batch refused by a database is retried row by row."""
+        text = ('email,username,name,password\n'
+                'first@example.com,first,,testpass123\n'
+                'second@example.com,second,,testpass123\n')
+
+        with patch.object(UserImporter, '_insert',
+                          side_effect=IntegrityError):
+            importer, errors = self._import(text)
+
+        self.assertEqual((importer.created, errors), (2, []))
+        for entry in UserIndex.objects.all():
+            user = get_user_model().objects.get(pk=entry.pk)
+            self.assertEqual(user._state.db, entry.shard)
+            self.assertEqual(entry.shard, sharding.shard_for(user.pk))
+
+
+class BulkImportCommandTests(TestCase):
+    """Tests for the bulk_import_users command."""
+
+    def test_command_imports_file(self):
+        """Test importing a CSV file and writing an error report."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'users.csv')
+            errors_path = os.path.join(tmp, 'errors.jsonl')
+            with open(path, 'w') as f:
+                f.write(CSV_DATA)
+
+            out = StringIO()
+            call_command('bulk_import_users', path, '--errors', errors_path,
+                         '--no-copy', stdout=out)
+
+            with open(errors_path) as f:
+                errors = [json.loads(line) for line in f]
+
+        self.assertIn('Imported 2 users, rejected 3 rows', out.getvalue())
+        self.assertEqual([error['line'] for error in errors], [4, 5, 6])
+
+
+class BulkImportAPITests(TestCase):
+    """Tests for the bulk import endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requires_staff(self):
+        """Test non-staff users cannot bulk import."""
+        user = create_user(email='test@example.com', username='testuser',
+                           password='testpass123')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.post(BULK_URL, CSV_DATA, content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_import(self):
+        """Test staff can import and receive a per-row report."""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin',
+            password='testpass123')
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.post(BULK_URL, CSV_DATA, content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line)
+                 for line in b''.join(res.streaming_content).splitlines()]
+        self.assertEqual(lines[0], {'created': 2, 'rejected': 3})
+        self.assertEqual([line['line'] for line in lines[1:]], [4, 5, 6])
+
+    def test_unsupported_content_type(self):
+        """Test unknown body formats are rejected."""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin',
+            password='testpass123')
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.post(BULK_URL, CSV_DATA, content_type='text/plain')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
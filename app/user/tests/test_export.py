@@ -0,0 +1,122 @@
+"""
+Tests for streaming user export.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import export
+
+EXPORT_URL = reverse('user:export')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class ExportTests(TestCase):
+    """Tests for the export helpers."""
+
+    def setUp(self):
+        for i in range(3):
+            create_user(email=f'user{i}@example.com', username=f'user{i}',
+                        name=f'User {i}', password='testpass123')
+
+    def test_export_csv(self):
+        """Test CSV export contains a header and one row per user."""
+        data = b''.join(export.export_users('csv')).decode()
+
+        rows = list(csv.reader(io.StringIO(data)))
+        self.assertEqual(rows[0], list(export.EXPORT_FIELDS))
+        self.assertEqual([row[2] for row in rows[1:]],
+                         ['user0', 'user1', 'user2'])
+        self.assertNotIn('pbkdf2', data)
+
+    def test_export_jsonl_gzip(self):
+        """Test gzip compressed JSONL export."""
+        data = gzip.decompress(
+            b''.join(export.export_users('jsonl', compress=True)))
+
+        rows = [json.loads(line) for line in data.splitlines()]
+        self.assertEqual(rows[0]['email'], 'user0@example.com')
+        self.assertEqual(len(rows), 3)
+
+    def test_chunks_are_bounded(self):
+        """Test output is emitted in chunks rather than all at once."""
+        rows = (('x' * 100,) for _ in range(2000))
+
+        chunks = list(export.csv_chunks(rows, ('field',)))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) < 2 * export.BUFFER_SIZE
+                            for chunk in chunks))
+
+    def test_no_model_instances(self):
+        """Test rows come back as plain tuples."""
+        row = next(iter(export.iter_user_rows()))
+
+        self.assertIsInstance(row, tuple)
+
+    def test_command_writes_file(self):
+        """Test the export_users command."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'users.csv')
+            err = io.StringIO()
+            call_command('export_users', '--output', path, '--stats',
+                         stderr=err)
+            with open(path) as f:
+                rows = list(csv.reader(f))
+
+        self.assertEqual(len(rows), 4)
+        self.assertIn('Exported 3 rows', err.getvalue())
+
+
+class ExportAPITests(TestCase):
+    """Tests for the export endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin',
+            password='testpass123')
+
+    def test_requires_staff(self):
+        """Test non-staff users cannot export."""
+        user = create_user(email='test@example.com', username='testuser',
+                           password='testpass123')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_streams_csv(self):
+        """Test staff can stream the export."""
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.client.get(EXPORT_URL, {'output': 'jsonl', 'gzip': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/gzip')
+        data = gzip.decompress(b''.join(res.streaming_content))
+        self.assertEqual(json.loads(data)['username'], 'admin')
+
+    def test_invalid_format(self):
+        """Test unknown output formats are rejected."""
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,208 @@
+"""
+Tests for buffered last_login updates.
+"""
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from user import last_login
+from user.last_login import LastLoginBuffer, write_last_logins
+from user.throttles import reset_throttles
+
+TOKEN_URL = reverse('user:token')
+
+
+def create_user(name):
+    return get_user_model().objects.create_user(
+        email=f'{name}@example.com', username=name, password='testpass123')
+
+
+def stored_last_login(user):
+    return get_user_model().objects.values_list(
+        'last_login', flat=True).get(pk=user.pk)
+
+
+class WriteLastLoginsTests(TestCase):
+    """Tests for write_last_logins."""
+
+    def setUp(self):
+        self.users = [create_user(f'writer{i}') for i in range(3)]
+        self.now = timezone.now()
+
+    def test_single_update(self):
+        """Test every pending user is written by one query."""
+        timestamps = {user.pk: self.now - timedelta(seconds=i)
+                      for i, user in enumerate(self.users)}
+
+        with self.assertNumQueries(1):
+            write_last_logins(timestamps)
+
+        for user in self.users:
+            self.assertEqual(stored_last_login(user), timestamps[user.pk])
+
+    def test_never_moves_backwards(self):
+        """Test an older timestamp does not overwrite a newer one."""
+        user = self.users[0]
+        write_last_logins({user.pk: self.now})
+
+        write_last_logins({user.pk: self.now - timedelta(minutes=5)})
+
+        self.assertEqual(stored_last_login(user), self.now)
+
+    def test_batches(self):
+        """Test large maps are split into batches of batch_size."""
+        timestamps = {user.pk: self.now for user in self.users}
+
+        with self.assertNumQueries(2):
+            write_last_logins(timestamps, batch_size=2)
+
+    def test_unknown_users_ignored(self):
+        """Test ids of deleted users are skipped."""
+        write_last_logins({self.users[0].pk: self.now, 10 ** 9: self.now})
+
+        self.assertEqual(stored_last_login(self.users[0]), self.now)
+
+
+class LastLoginBufferTests(TestCase):
+    """Tests for LastLoginBuffer run by hand."""
+
+    def setUp(self):
+        self.buffer = LastLoginBuffer(interval=3600, max_pending=100)
+        self.user = create_user('buffered')
+        self.now = timezone.now()
+
+    def test_coalesces_per_user(self):
+        """Test repeated logins keep only the newest timestamp."""
+        for seconds in (30, 0, 10):
+            self.buffer.record(self.user.pk,
+                               self.now - timedelta(seconds=seconds))
+
+        self.assertEqual(len(self.buffer), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(stored_last_login(self.user), self.now)
+
+    def test_flush_empty(self):
+        """Test flushing nothing runs no query."""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_is_retried(self):
+        """Test timestamps stay pending when the write fails."""
+        self.buffer.record(self.user.pk, self.now)
+
+        with patch('user.last_login.write_last_logins',
+                   side_effect=RuntimeError('database down')), \
+                self.assertLogs('user.last_login', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(len(self.buffer), 1)
+        self.buffer.flush()
+        self.assertEqual(stored_last_login(self.user), self.now)
+
+
+class LoginRecordingTests(TestCase):
+    """Tests for how logins reach the buffer."""
+
+    def setUp(self):
+        reset_throttles()
+        last_login.buffer.clear()
+        self.user = create_user('recorded')
+        self.client = APIClient()
+
+    def tearDown(self):
+        last_login.buffer.clear()
+
+    def login(self):
+        response = self.client.post(
+            TOKEN_URL, {'username': 'recorded', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(LAST_LOGIN={'MODE': 'buffered'})
+    def test_token_login_is_buffered(self):
+        """Test a token login is recorded without writing the user."""
+        with patch.object(last_login.buffer, 'record') as record:
+            self.login()
+
+        record.assert_called_once()
+        self.assertEqual(record.call_args.args[0], self.user.pk)
+        self.assertIsNone(stored_last_login(self.user))
+
+    @override_settings(LAST_LOGIN={'MODE': 'buffered'})
+    def test_buffered_login_flushed(self):
+        """Test the admin sees last_login once the buffer flushes."""
+        with patch.object(last_login.buffer, '_run'):
+            self.login()
+            last_login.buffer.flush()
+
+        self.assertIsNotNone(stored_last_login(self.user))
+
+    @override_settings(LAST_LOGIN={'MODE': 'sync'})
+    def test_sync_mode_writes_immediately(self):
+        """Test sync mode keeps Django's immediate write."""
+        self.login()
+
+        self.assertIsNotNone(stored_last_login(self.user))
+        self.assertEqual(len(last_login.buffer), 0)
+
+    @override_settings(LAST_LOGIN={'MODE': 'buffered'})
+    def test_failed_login_not_recorded(self):
+        """Test wrong credentials record nothing."""
+        response = self.client.post(
+            TOKEN_URL, {'username': 'recorded', 'password': 'wrong'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(last_login.buffer), 0)
+
+
+class BackgroundFlushTests(TransactionTestCase):
+    """Tests for the flush thread."""
+
+    def wait_for_last_login(self, user, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if stored_last_login(user) is not None:
+                return True
+            time.sleep(0.02)
+        return False
+
+    def test_flushes_on_interval(self):
+        """Test pending timestamps are written after the interval."""
+        user = create_user('interval')
+        buffer = LastLoginBuffer(interval=0.05, max_pending=100)
+        self.addCleanup(buffer.stop)
+
+        buffer.record(user.pk, timezone.now())
+
+        self.assertTrue(self.wait_for_last_login(user))
+
+    def test_flushes_when_full(self):
+        """Test reaching max_pending wakes the flush thread early."""
+        users = [create_user(f'full{i}') for i in range(2)]
+        buffer = LastLoginBuffer(interval=3600, max_pending=2)
+        self.addCleanup(buffer.stop)
+
+        for user in users:
+            buffer.record(user.pk, timezone.now())
+
+        self.assertTrue(self.wait_for_last_login(users[1]))
+        self.assertTrue(self.wait_for_last_login(users[0]))
+
+    def test_stop_writes_pending_and_ends_thread(self):
+        """Test stop() flushes what is pending and joins the thread."""
+        user = create_user('stopped')
+        buffer = LastLoginBuffer(interval=3600, max_pending=100)
+        buffer.record(user.pk, timezone.now())
+        thread = buffer._thread
+
+        buffer.stop(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertIsNotNone(stored_last_login(user))
+        self.assertEqual(len(buffer), 0)
@@ -0,0 +1,75 @@
+"""
+Tests for the precompiled read serializers.
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.serializers import ReadSerializer
+from user.serializers import (
+    UserListReadSerializer,
+    UserListSerializer,
+    UserReadSerializer,
+    UserSerializer,
+)
+
+
+class LoginSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'last_login')
+
+
+class LoginReadSerializer(ReadSerializer):
+    serializer_class = LoginSerializer
+
+
+class ReadSerializerTests(TestCase):
+    """Tests that read serializers match their DRF counterparts."""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email='test@example.com', username='testuser',
+                password='testpass123', name='Tést Üser'),
+            get_user_model().objects.create_superuser(
+                email='admin@example.com', username='admin',
+                password='testpass123'),
+        ]
+
+    def test_user_serializer(self):
+        """Test single-object output equals UserSerializer."""
+        for user in self.users:
+            self.assertEqual(UserReadSerializer.to_representation(user),
+                             UserSerializer(user).data)
+
+    def test_list_serializer(self):
+        """Test list output equals UserListSerializer."""
+        expected = UserListSerializer(self.users, many=True).data
+
+        self.assertEqual(UserListReadSerializer.many(self.users), expected)
+        rows = get_user_model().objects.order_by('id').values_list(
+            *UserListReadSerializer.sources())
+        self.assertEqual(UserListReadSerializer.from_values(rows), expected)
+
+    def test_converted_fields(self):
+        """Test fields DRF transforms, and their None values, still match."""
+        user = self.users[0]
+        for last_login in (None, timezone.now()):
+            user.last_login = last_login
+
+            self.assertEqual(LoginReadSerializer.to_representation(user),
+                             LoginSerializer(user).data)
+
+    def test_nested_source_rejected(self):
+        """Test sources the fast path cannot read are refused."""
+        class NestedSerializer(serializers.Serializer):
+            token = serializers.CharField(source='auth_token.key')
+
+        class NestedReadSerializer(ReadSerializer):
+            serializer_class = NestedSerializer
+
+        with self.assertRaises(ImproperlyConfigured):
+            NestedReadSerializer.to_representation(self.users[0])
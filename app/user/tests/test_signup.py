@@ -0,0 +1,133 @@
+"""
+Tests for single-INSERT signup and database-enforced uniqueness.
+"""
+import threading
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.throttles import reset_throttles
+
+CREATE_USER_URL = reverse('user:create')
+ME_URL = reverse('user:me')
+
+PAYLOAD = {
+    'email': 'test@example.com',
+    'username': 'testuser',
+    'name': 'Test User',
+    'password': 'testpass123',
+}
+
+
+class SignupTests(TestCase):
+    """Tests for uniqueness errors on signup and profile updates."""
+
+    def setUp(self):
+        reset_throttles()
+        self.client = APIClient()
+
+    def tearDown(self):
+        reset_throttles()
+
+    def test_single_insert(self):
+        """Test signup runs no uniqueness SELECTs."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(CREATE_USER_URL, PAYLOAD)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'].split()[0].upper()
+                      for query in queries.captured_queries]
+        self.assertEqual(
+            [sql for sql in statements if sql in ('SELECT', 'INSERT')],
+            ['INSERT'])
+
+    def test_duplicate_fields(self):
+        """Test duplicates get the same field errors as before."""
+        self.client.post(CREATE_USER_URL, PAYLOAD)
+
+        email = self.client.post(CREATE_USER_URL, {
+            **PAYLOAD, 'username': 'other'})
+        username = self.client.post(CREATE_USER_URL, {
+            **PAYLOAD, 'email': 'other@example.com'})
+
+        self.assertEqual(email.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(email.data, {
+            'email': ['user with this email already exists.']})
+        self.assertEqual(username.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(username.data, {
+            'username': ['user with this username already exists.']})
+
+    def test_case_insensitive_duplicates(self):
+        """Test emails and usernames differing only by case are taken."""
+        self.client.post(CREATE_USER_URL, PAYLOAD)
+
+        email = self.client.post(CREATE_USER_URL, {
+            **PAYLOAD, 'email': 'TEST@example.com', 'username': 'other'})
+        username = self.client.post(CREATE_USER_URL, {
+            **PAYLOAD, 'email': 'other@example.com', 'username': 'TestUser'})
+
+        self.assertEqual(email.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', email.data)
+        self.assertEqual(username.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', username.data)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_update_to_taken_email(self):
+        """Test changing the email to a taken one is a 400."""
+        get_user_model().objects.create_user(
+            email='taken@example.com', username='taken',
+            password='testpass123')
+        user = get_user_model().objects.create_user(**PAYLOAD)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+
+        res = self.client.patch(ME_URL, {'email': 'Taken@example.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+        user.refresh_from_db()
+        self.assertEqual(user.email, PAYLOAD['email'])
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Needs concurrent connections to one database.')
+class ConcurrentSignupTests(TransactionTestCase):
+    """Tests for simultaneous signups with the same username."""
+
+    def setUp(self):
+        reset_throttles()
+
+    def tearDown(self):
+        reset_throttles()
+
+    def test_one_wins(self):
+        """Test exactly one request succeeds and the rest get a 400."""
+        barrier = threading.Barrier(4)
+        statuses = []
+
+        def signup(index):
+            from django.db import connections
+
+            try:
+                barrier.wait()
+                res = APIClient().post(CREATE_USER_URL, {
+                    **PAYLOAD, 'email': f'user{index}@example.com'})
+                statuses.append(res.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=signup, args=(i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [201, 400, 400, 400])
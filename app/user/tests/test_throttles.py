@@ -0,0 +1,177 @@
+"""
+Tests for login and signup throttling.
+"""
+import base64
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.loadtest import percentile, run_workers
+from user.throttles import reset_throttles
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+
+
+def throttle_rates(**rates):
+    """Return REST_FRAMEWORK settings with the given throttle rates."""
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework['DEFAULT_THROTTLE_RATES'] = {
+        **rest_framework['DEFAULT_THROTTLE_RATES'], **rates}
+    return rest_framework
+
+
+class ThrottleTests(TestCase):
+    """Tests for the login and signup throttles."""
+
+    def setUp(self):
+        reset_throttles()
+        self.addCleanup(reset_throttles)
+        self.client = APIClient()
+        get_user_model().objects.create_user(
+            email='test@example.com', username='testuser',
+            password='testpass123')
+
+    def login(self, username='testuser', password='wrongpass123', **extra):
+        return self.client.post(
+            TOKEN_URL, {'username': username, 'password': password}, **extra)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_username='2/min'))
+    def test_username_throttle(self):
+        """Test repeated attempts on one username are refused."""
+        self.login(REMOTE_ADDR='10.0.0.1')
+        self.login(REMOTE_ADDR='10.0.0.2')
+
+        res = self.login(REMOTE_ADDR='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        other = self.login(username='someone-else', REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_ip='2/min'))
+    def test_address_throttle(self):
+        """Test one address cannot spray many usernames."""
+        self.login(username='a')
+        self.login(username='b')
+
+        res = self.login(username='c')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_ip='2/min'))
+    def test_forwarded_for_cannot_reset_address_throttle(self):
+        """Test a client-sent X-Forwarded-For is not its address."""
+        self.login(username='a', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        self.login(username='b', HTTP_X_FORWARDED_FOR='2.2.2.2')
+
+        res = self.login(username='c', HTTP_X_FORWARDED_FOR='3.3.3.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={
+        **throttle_rates(login_ip='2/min'), 'NUM_PROXIES': 1})
+    def test_address_behind_proxy(self):
+        """Test behind one proxy only the address it added counts."""
+        self.login(username='a', HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1')
+        self.login(username='b', HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1')
+
+        res = self.login(username='c', HTTP_X_FORWARDED_FOR='10.0.0.2')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.login(username='d',
+                         HTTP_X_FORWARDED_FOR='3.3.3.3, 10.0.0.1')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_username='1/min'))
+    def test_throttled_before_hashing(self):
+        """Test refused attempts never reach the password hasher."""
+        self.login()
+
+        with patch('core.hashing.executor.check_password') as check, \
+                patch('core.hashing.executor.make_password') as make:
+            res = self.login(password='testpass123')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        check.assert_not_called()
+        make.assert_not_called()
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(
+        login_username='1/min', signup_ip='1/hour'))
+    def test_basic_auth_throttled_before_hashing(self):
+        """Test a Basic Authorization header is not checked before them."""
+        credentials = base64.b64encode(b'testuser:wrongpass123').decode()
+        header = {'HTTP_AUTHORIZATION': f'Basic {credentials}'}
+        self.login()
+        self.client.post(CREATE_USER_URL, {'username': 'x'})
+
+        with patch('core.hashing.executor.check_password') as check:
+            res = self.login(**header)
+            signup = self.client.post(CREATE_USER_URL, {}, **header)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(signup.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        check.assert_not_called()
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(
+        login_username='1/min', login_global='2/min'))
+    def test_refused_attempts_spare_global_budget(self):
+        """Test attempts refused per username do not use the global rate."""
+        for _ in range(5):
+            self.login()
+
+        res = self.login(username='testuser2')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(signup_ip='1/hour'))
+    def test_signup_throttle(self):
+        """Test signups are limited per address."""
+        payload = {'email': 'new@example.com', 'username': 'new',
+                   'password': 'testpass123'}
+        self.client.post(CREATE_USER_URL, payload)
+
+        res = self.client.post(CREATE_USER_URL, {
+            **payload, 'email': 'new2@example.com', 'username': 'new2'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(username='new2').exists())
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_username=None))
+    def test_disabled_rate(self):
+        """Test a scope without a rate is not throttled."""
+        for _ in range(12):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoadTestHelperTests(SimpleTestCase):
+    """Tests for the load test helpers."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertIsNone(percentile([], 99))
+
+    def test_run_workers(self):
+        """Test every group's calls are timed and tallied."""
+        results = run_workers({
+            'fast': ([lambda: 200] * 2, None),
+            'paced': ([lambda: 429], 50),
+        }, duration=0.1)
+
+        latencies, statuses = results['fast']
+        self.assertEqual(len(latencies), statuses[200])
+        self.assertLessEqual(results['paced'][1][429], 6)
@@ -0,0 +1,217 @@
+"""
+Tests for database token expiry and purging.
+"""
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache
+from user.expiry import purge_expired
+from user.throttles import reset_throttles
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+EXPIRY = {'TTL': 3600, 'REFRESH_INTERVAL': 60}
+
+
+def create_user(name):
+    return get_user_model().objects.create_user(
+        email=f'{name}@example.com', username=name, password='testpass123')
+
+
+def create_token(name, age):
+    """Create a token last used age seconds ago."""
+    token = Token.objects.create(user=create_user(name))
+    Token.objects.filter(pk=token.pk).update(
+        created=timezone.now() - timedelta(seconds=age))
+    return Token.objects.get(pk=token.pk)
+
+
+@override_settings(AUTH_TOKEN_EXPIRY=EXPIRY)
+class TokenExpiryTests(TestCase):
+    """Tests for expiry enforced by authentication."""
+
+    def setUp(self):
+        token_cache.clear()
+        reset_throttles()
+        self.client = APIClient()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def get_me(self, token):
+        return self.client.get(ME_URL, HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_expired_token_rejected(self):
+        """Test a token unused for longer than TTL is refused."""
+        token = create_token('expired', age=3601)
+
+        response = self.get_me(token.key)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], 'Token has expired.')
+
+    def test_use_slides_expiry(self):
+        """Test using a token moves its expiry forward."""
+        token = create_token('sliding', age=3000)
+
+        self.assertEqual(self.get_me(token.key).status_code, 200)
+
+        token.refresh_from_db()
+        self.assertLess(timezone.now() - token.created, timedelta(seconds=5))
+
+    def test_recent_use_not_written(self):
+        """Test uses within REFRESH_INTERVAL do not write the token."""
+        token = create_token('recent', age=30)
+
+        self.assertEqual(self.get_me(token.key).status_code, 200)
+
+        self.assertEqual(Token.objects.get(pk=token.pk).created,
+                         token.created)
+
+    def test_cached_token_refreshed_elsewhere(self):
+        """Test a stale cached copy is re-read before being refused."""
+        token = create_token('elsewhere', age=30)
+        self.assertEqual(self.get_me(token.key).status_code, 200)
+        cached = token_cache.get(token.key)
+        cached.created = timezone.now() - timedelta(hours=2)
+        token_cache.set(cached)
+
+        self.assertEqual(self.get_me(token.key).status_code, 200)
+
+    @override_settings(AUTH_TOKEN_EXPIRY={'TTL': 0})
+    def test_zero_ttl_never_expires(self):
+        """Test TTL 0 disables expiry."""
+        token = create_token('forever', age=10 ** 8)
+
+        self.assertEqual(self.get_me(token.key).status_code, 200)
+
+    def test_login_replaces_expired_token(self):
+        """Test logging in issues a new token once the old one expired."""
+        old = create_token('relogin', age=3601)
+
+        response = self.client.post(
+            TOKEN_URL, {'username': 'relogin', 'password': 'testpass123'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['token'], old.key)
+        self.assertFalse(Token.objects.filter(pk=old.key).exists())
+        self.assertEqual(self.get_me(response.data['token']).status_code, 200)
+
+    def test_login_reuses_live_token(self):
+        """Test logging in returns the live token and refreshes it."""
+        token = create_token('reuse', age=120)
+
+        response = self.client.post(
+            TOKEN_URL, {'username': 'reuse', 'password': 'testpass123'})
+
+        self.assertEqual(response.data['token'], token.key)
+        token.refresh_from_db()
+        self.assertLess(timezone.now() - token.created, timedelta(seconds=5))
+
+
+class PurgeTokensTests(TestCase):
+    """Tests for purge_expired and the purge_tokens command."""
+
+    def setUp(self):
+        self.expired = {create_token(f'old{i}', age=7200).key
+                        for i in range(5)}
+        self.live = {create_token(f'new{i}', age=10).key for i in range(4)}
+        self.cutoff = timezone.now() - timedelta(hours=1)
+
+    def test_deletes_expired_in_key_ranges(self):
+        """Test batches cover every key once and delete only expired."""
+        batches = list(purge_expired(self.cutoff, batch_size=2))
+
+        self.assertEqual(len(batches), 5)
+        self.assertEqual(sum(batch.scanned for batch in batches), 9)
+        self.assertEqual(sum(batch.deleted for batch in batches), 5)
+        self.assertEqual(set(Token.objects.values_list('key', flat=True)),
+                         self.live)
+        keys = [batch.last_key for batch in batches[:-1]]
+        self.assertEqual(keys, sorted(keys))
+        self.assertIsNone(batches[-1].last_key)
+
+    def test_batch_queries_bounded(self):
+        """Test a batch costs a boundary lookup and one DELETE."""
+        batches = purge_expired(self.cutoff, batch_size=2)
+
+        with self.assertNumQueries(2):
+            next(batches)
+
+    def test_dry_run(self):
+        """Test a dry run counts without deleting."""
+        deleted = sum(batch.deleted for batch in purge_expired(
+            self.cutoff, batch_size=4, dry_run=True))
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(Token.objects.count(), 9)
+
+    @override_settings(AUTH_TOKEN_EXPIRY=EXPIRY)
+    def test_command_reports(self):
+        """Test the command deletes expired tokens and reports counts."""
+        out = StringIO()
+        call_command('purge_tokens', '--batch-size', '3', stdout=out)
+
+        self.assertIn('Deleted 5 of 9 tokens', out.getvalue())
+        self.assertIn('in 4 batches', out.getvalue())
+        self.assertEqual(Token.objects.count(), 4)
+
+    @override_settings(AUTH_TOKEN_EXPIRY={'TTL': 0})
+    def test_command_disabled(self):
+        """Test nothing is purged while expiry is disabled."""
+        out = StringIO()
+        call_command('purge_tokens', stdout=out)
+
+        self.assertIn('disabled', out.getvalue())
+        self.assertEqual(Token.objects.count(), 9)
+
+
+@skipUnless(connection.vendor == 'postgresql' and os.environ.get(
+    'PURGE_TOKENS_LARGE_TEST'), 'set PURGE_TOKENS_LARGE_TEST=1 on PostgreSQL')
+class PurgeMillionTokensTests(TestCase):
+    """Purge over a million tokens, half of them expired."""
+
+    rows = 1000000
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_user (password, is_superuser, email, "
+                "username, name, is_active, is_staff, version, "
+                "token_version) "
+                "SELECT '!', false, 'bulk' || g || '@example.com', "
+                "'bulk' || g, '', true, false, 0, 0 "
+                "FROM generate_series(1, %s) AS g", [cls.rows])
+            cursor.execute(
+                "INSERT INTO authtoken_token (key, created, user_id) "
+                "SELECT substr(md5(id::text) || md5(username), 1, 40), "
+                "CASE WHEN id % 2 = 0 THEN now() - interval '60 days' "
+                "ELSE now() END, id "
+                "FROM core_user WHERE username LIKE 'bulk%%'")
+            cursor.execute('ANALYZE authtoken_token')
+
+    def test_purge_million_tokens(self):
+        """Test every batch stays small and half the table is purged."""
+        batches = list(purge_expired(
+            timezone.now() - timedelta(days=30), batch_size=10000))
+
+        self.assertEqual(len(batches), 101)
+        self.assertEqual(sum(batch.scanned for batch in batches), self.rows)
+        self.assertEqual(sum(batch.deleted for batch in batches),
+                         self.rows // 2)
+        self.assertEqual(Token.objects.count(), self.rows // 2)
+        # Bounded batches: none should come close to a long lock
+        self.assertLess(max(batch.elapsed for batch in batches), 2.0)
@@ -0,0 +1,125 @@
+"""
+Tests for signed access tokens.
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import tokens
+from user.authentication import token_cache, user_cache
+from user.throttles import reset_throttles
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(USER_TOKEN_MODE='signed', SIGNED_TOKEN_TTL=900)
+class SignedTokenTests(TestCase):
+    """Tests for issuing and verifying signed access tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        reset_throttles()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', username='testuser',
+            password='testpass123')
+        self.client = APIClient()
+
+    def tearDown(self):
+        token_cache.clear()
+        user_cache.clear()
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_login_issues_signed_token(self):
+        """Test login returns a signed token without a database token."""
+        res = self.client.post(TOKEN_URL, {'username': 'testuser',
+                                           'password': 'testpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['expires_in'], 900)
+        self.assertEqual(tokens.parse(res.data['token']), (self.user.pk, 0))
+        self.assertFalse(Token.objects.exists())
+
+    def test_authenticates_without_queries(self):
+        """Test a warm signed token costs no database round trip."""
+        self.authenticate(tokens.issue(self.user))
+        self.client.get(ME_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], 'testuser')
+        self.assertEqual(len(queries), 0)
+
+    def test_revoked(self):
+        """Test bumping the token version rejects older tokens."""
+        self.authenticate(tokens.issue(self.user))
+        self.client.get(ME_URL)
+
+        self.user.revoke_tokens()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.authenticate(tokens.issue(self.user))
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_password_change_revokes(self):
+        """Test changing the password revokes signed tokens."""
+        self.authenticate(tokens.issue(self.user))
+
+        self.client.patch(ME_URL, {'password': 'newpass1234'})
+
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired(self):
+        """Test tokens older than SIGNED_TOKEN_TTL are rejected."""
+        token = tokens.issue(self.user)
+        self.authenticate(token)
+
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 901):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tampered(self):
+        """Test a token for another user id fails verification."""
+        token = tokens.issue(self.user)
+        self.authenticate(f'{self.user.pk + 1}' + token[len(str(
+            self.user.pk)):])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user(self):
+        """Test tokens of deactivated users are rejected."""
+        self.authenticate(tokens.issue(self.user))
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_tokens_still_accepted(self):
+        """Test existing DRF tokens keep working in signed mode."""
+        self.authenticate(Token.objects.create(user=self.user).key)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
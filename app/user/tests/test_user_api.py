@@ -1,12 +1,19 @@
 """
 Docstring for app.user.tests.test_user_api
 """
+from unittest.mock import patch
+
+from django.db.models import F
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 
+from user.authentication import token_cache, user_stamps
+from user.serializers import UserSerializer
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -160,3 +167,89 @@ class PrivateUserAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
+
+
+class ConditionalUserAPITest(TestCase):
+    """Tests for ETag handling on the me endpoint"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            username='testuser',
+            name='Test User',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retrieve_sets_etag(self):
+        """Test the profile response carries the user's ETag"""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res['ETag'], self.user.etag)
+
+    def test_not_modified_skips_serializer(self):
+        """Test a matching If-None-Match returns 304 without serializing"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        with patch.object(UserSerializer, 'to_representation') as patched:
+            res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        patched.assert_not_called()
+
+    def test_change_in_other_worker_is_not_304(self):
+        """Test a version replaced by another worker is not revalidated"""
+        token_cache.clear()
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        etag = self.client.get(ME_URL)['ETag']
+        # What another worker's save leaves behind: a new row version and,
+        # once committed, a new stamp; this process's signals never ran
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Elsewhere', version=F('version') + 1)
+        user_stamps.bump(self.user.pk)
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['name'], 'Elsewhere')
+
+    def test_update_changes_etag(self):
+        """Test updating the profile bumps the version and ETag"""
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'},
+                                HTTP_IF_MATCH=etag)
+        stale = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(stale.status_code, status.HTTP_200_OK)
+        self.assertEqual(stale.data['name'], 'New Name')
+
+    def test_update_with_stale_etag_fails(self):
+        """Test If-Match with an outdated ETag is rejected with 412"""
+        etag = self.client.get(ME_URL)['ETag']
+        get_user_model().objects.get(pk=self.user.pk).save()
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'},
+                                HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Test User')
+
+    def test_password_update_saves_once(self):
+        """Test a password change bumps the version a single time"""
+        version = self.user.version
+
+        self.client.patch(ME_URL, {'password': 'newpassword123'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.version, version + 1)
+        self.assertTrue(self.user.check_password('newpassword123'))
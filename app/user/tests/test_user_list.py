@@ -0,0 +1,125 @@
+"""
+Tests for the staff user directory API.
+"""
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+LIST_URL = reverse('user:list')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class UserListAPITests(TestCase):
+    """Tests for the keyset paginated user list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', name='Zed',
+            password='testpass123')
+        self.client.force_authenticate(user=self.admin)
+        # Duplicate names force the id tie-breaker to be used
+        for i, name in enumerate(['Bea', 'Al', 'Bea', 'Cy', 'Al']):
+            create_user(email=f'user{i}@example.com', username=f'user{i}',
+                        name=name, password='testpass123',
+                        is_active=i != 3)
+
+    def _collect(self, params):
+        """Follow next links and return every username seen."""
+        usernames = []
+        res = self.client.get(LIST_URL, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            usernames += [row['username'] for row in res.data['results']]
+            if res.data['next'] is None:
+                return usernames
+            res = self.client.get(res.data['next'])
+
+    def test_requires_staff(self):
+        """Test non-staff users cannot list users."""
+        user = get_user_model().objects.get(username='user0')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lean_response(self):
+        """Test rows only carry directory fields."""
+        res = self.client.get(LIST_URL, {'page_size': 1})
+
+        self.assertEqual(set(res.data), {'next', 'results'})
+        self.assertEqual(set(res.data['results'][0]), {
+            'id', 'email', 'username', 'name', 'is_active', 'is_staff'})
+
+    def test_paginate_by_id(self):
+        """Test paging by id visits every user exactly once."""
+        usernames = self._collect({'page_size': 2})
+
+        expected = list(get_user_model().objects.order_by('id')
+                        .values_list('username', flat=True))
+        self.assertEqual(usernames, expected)
+
+    def test_paginate_by_name(self):
+        """Test paging by (name, id) handles duplicate names."""
+        usernames = self._collect({'page_size': 2, 'ordering': 'name'})
+
+        expected = list(get_user_model().objects.order_by('name', 'id')
+                        .values_list('username', flat=True))
+        self.assertEqual(usernames, expected)
+
+    def test_filters(self):
+        """Test filtering on is_active and is_staff."""
+        inactive = self._collect({'is_active': 'false'})
+        staff = self._collect({'is_staff': 'true'})
+
+        self.assertEqual(inactive, ['user3'])
+        self.assertEqual(staff, ['admin'])
+
+    def test_invalid_params(self):
+        """Test invalid cursors, orderings and filters are rejected."""
+        self.assertEqual(
+            self.client.get(LIST_URL, {'cursor': 'junk'}).status_code,
+            status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get(LIST_URL, {'ordering': 'email'}).status_code,
+            status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(LIST_URL, {'is_staff': 'maybe'}).status_code,
+            status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_values_checked(self):
+        """Test cursor keys of the wrong type are rejected, not queried."""
+        for ordering, key in (('id', ['x']), ('id', [{}]), ('id', [None]),
+                              ('name', [None, 1]), ('name', ['Al', 'x'])):
+            cursor = base64.urlsafe_b64encode(json.dumps(
+                {'o': ordering, 'k': key}).encode()).decode()
+
+            res = self.client.get(LIST_URL, {'cursor': cursor,
+                                             'ordering': ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             key)
+
+    def test_no_count_or_offset(self):
+        """Test later pages use one seek query without COUNT or OFFSET."""
+        res = self.client.get(LIST_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(res.data['next'])
+
+        self.assertEqual(len(ctx), 1)
+        sql = ctx.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
@@ -0,0 +1,130 @@
+"""
+Tests for the staff user search API.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.search import username_index
+
+SEARCH_URL = reverse('user:search')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(
+        password='testpass123', **params)
+
+
+class UserSearchAPITests(TestCase):
+    """Tests for prefix search by username, email and name."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', name='Root',
+            password='testpass123')
+        self.client.force_authenticate(user=self.admin)
+        create_user(email='jo@example.com', username='Joanna', name='Jo')
+        create_user(email='john@example.com', username='john', name='John')
+        create_user(email='bob@example.com', username='bob',
+                    name='Johnson Bob')
+        create_user(email='jolly@example.com', username='zed', name='Zed')
+        create_user(email='x_y@example.com', username='x_y', name='')
+        username_index.clear()
+
+    def search(self, q, **params):
+        res = self.client.get(SEARCH_URL, {'q': q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [row['username'] for row in res.data]
+
+    def test_requires_staff(self):
+        """Test non-staff users cannot search users."""
+        self.client.force_authenticate(
+            user=get_user_model().objects.get(username='bob'))
+
+        res = self.client.get(SEARCH_URL, {'q': 'jo'})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_username_matches_first(self):
+        """Test username matches come first, then email or name ones."""
+        self.assertEqual(self.search('JO'),
+                         ['Joanna', 'john', 'bob', 'zed'])
+        self.assertEqual(self.search('john'), ['john', 'bob'])
+
+    def test_limit(self):
+        """Test limit caps both kinds of matches."""
+        self.assertEqual(self.search('jo', limit=1), ['Joanna'])
+        self.assertEqual(self.search('jo', limit=3),
+                         ['Joanna', 'john', 'bob'])
+
+    def test_response_fields(self):
+        """Test matches carry id, username, email and name only."""
+        res = self.client.get(SEARCH_URL, {'q': 'bob'})
+
+        self.assertEqual(res.data, [{
+            'id': get_user_model().objects.get(username='bob').id,
+            'username': 'bob', 'email': 'bob@example.com',
+            'name': 'Johnson Bob'}])
+
+    def test_like_wildcards_are_literal(self):
+        """Test % and _ in the search term match themselves."""
+        self.assertEqual(self.search('x_'), ['x_y'])
+        self.assertEqual(self.search('_'), [])
+        self.assertEqual(self.search('%'), [])
+
+    def test_invalid_parameters(self):
+        """Test a missing term or a bad limit is rejected."""
+        for params in ({}, {'q': '  '}, {'q': 'jo', 'limit': 'x'},
+                       {'q': 'jo', 'limit': 0},
+                       {'q': 'jo', 'limit': 1000}):
+            res = self.client.get(SEARCH_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prefix_query_uses_lower(self):
+        """Test matching compiles to LOWER(column) LIKE LOWER(prefix)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.search('jo')
+
+        sql = queries.captured_queries[-1]['sql'].upper()
+        self.assertIn('LOWER("CORE_USER"."USERNAME") LIKE LOWER(', sql)
+        self.assertNotIn('UPPER', sql)
+
+    @override_settings(USER_SEARCH={'MEMORY_INDEX': True})
+    def test_memory_index_answers_hot_prefix(self):
+        """Test a prefix with enough username matches runs no query."""
+        self.search('jo')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search('jo', limit=2),
+                             ['Joanna', 'john'])
+        # Too few username matches: email and name ones come from the DB
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search('jo', limit=4),
+                             ['Joanna', 'john', 'bob', 'zed'])
+
+    @override_settings(USER_SEARCH={'MEMORY_INDEX': True})
+    def test_memory_index_follows_user_changes(self):
+        """Test creating, renaming and deleting users updates the index."""
+        self.search('jo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = create_user(email='joe@example.com', username='Joe')
+        self.assertEqual(self.search('jo', limit=3),
+                         ['Joanna', 'Joe', 'john'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.username = 'moe'
+            user.save()
+        self.assertEqual(self.search('mo'), ['moe'])
+        self.assertEqual(self.search('jo', limit=2), ['Joanna', 'john'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search('mo'), [])
@@ -0,0 +1,141 @@
+"""
+Throttles for the user API.
+
+Login and signup each run a full password hash, so floods are cut off by
+sliding-window limits keyed by username, client address and a global
+budget. Throttles run in APIView.initial(), before the serializer ever
+calls authenticate() or hashes a password.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.ratelimit import CacheBackend, LocalBackend, SlidingWindowLimiter
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def _backend():
+    alias = getattr(settings, 'USER_THROTTLE_CACHE_ALIAS', None)
+    if alias:
+        return CacheBackend(alias)
+    return LocalBackend(getattr(settings, 'USER_THROTTLE_MAX_KEYS', 100000))
+
+
+def get_limiter(scope, limit, window):
+    """Return the shared limiter for scope at the given rate."""
+    key = (scope, limit, window)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = SlidingWindowLimiter(limit, window, _backend())
+                _limiters[key] = limiter
+    return limiter
+
+
+def reset_throttles():
+    """Forget every in-process throttle counter."""
+    with _lock:
+        for limiter in _limiters.values():
+            limiter.reset()
+        _limiters.clear()
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle backed by a SlidingWindowLimiter.
+
+    Unlike SimpleRateThrottle, which keeps every request timestamp, the
+    limiter keeps two counters per key, so a flood costs constant memory.
+    """
+
+    def get_rate(self):
+        if not getattr(self, 'scope', None):
+            raise ImproperlyConfigured(
+                f'You must set a scope for {self.__class__.__name__}.')
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'No default throttle rate set for {self.scope!r} scope')
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        ident = self.get_cache_key(request, view)
+        if ident is None:
+            return True
+        limiter = get_limiter(self.scope, self.num_requests, self.duration)
+        allowed, self.retry_after = limiter.hit(f'{self.scope}:{ident}')
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UsernameThrottle(SlidingWindowThrottle):
+    """Limits attempts against one username from any number of clients."""
+
+    def get_cache_key(self, request, view):
+        try:
+            username = request.data.get('username')
+        except AttributeError:
+            return None
+        if not isinstance(username, str) or not username.strip():
+            return None
+        username = username.strip().lower()
+        return hashlib.sha256(username.encode()).hexdigest()[:32]
+
+
+class AddressThrottle(SlidingWindowThrottle):
+    """Limits requests per client address."""
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class GlobalThrottle(SlidingWindowThrottle):
+    """Limits the total request rate of a view across all clients."""
+
+    def get_cache_key(self, request, view):
+        return 'all'
+
+
+class LoginUsernameThrottle(UsernameThrottle):
+    scope = 'login_username'
+
+
+class LoginAddressThrottle(AddressThrottle):
+    scope = 'login_ip'
+
+
+class LoginGlobalThrottle(GlobalThrottle):
+    scope = 'login_global'
+
+
+class SignupAddressThrottle(AddressThrottle):
+    scope = 'signup_ip'
+
+
+class SignupGlobalThrottle(GlobalThrottle):
+    scope = 'signup_global'
+
+
+class SequentialThrottleMixin:
+    """Stop at the first throttle that rejects a request.
+
+    DRF consults every throttle, so a request refused per username would
+    still spend the global budget; ordering the throttles from narrowest to
+    widest keeps floods from one source out of everyone else's budget.
+    """
+
+    def check_throttles(self, request):
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
@@ -3,11 +3,23 @@ Docstring for app.user.urls
 """
 
 from django.urls import path
-from .views import CreateUserView, CreateTokenView, ManageUserView
+from .views import (
+    BulkImportUsersView,
+    CreateTokenView,
+    CreateUserView,
+    ExportUsersView,
+    ListUserView,
+    ManageUserView,
+    SearchUserView,
+)
 app_name = 'user'
 
 urlpatterns = [
+    path('', ListUserView.as_view(), name='list'),
     path('create/', CreateUserView.as_view(), name='create'),
     path('token/', CreateTokenView.as_view(), name='token'),
     path('me/', ManageUserView.as_view(), name='me'),
+    path('search/', SearchUserView.as_view(), name='search'),
+    path('bulk/', BulkImportUsersView.as_view(), name='bulk'),
+    path('export/', ExportUsersView.as_view(), name='export'),
 ]
@@ -2,15 +2,54 @@
 Docstring for app.user.views
 """
 
-from rest_framework import generics, authentication, permissions
+import json
+import tempfile
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from .serializers import UserSerializer, AuthTokenSerializer
+from rest_framework.views import APIView
+from core import search
+from core.db import routing, sharding
+from . import expiry, tokens
+from .authentication import SignedTokenAuthentication
+from .bulk import UserImporter, decode_lines, format_error, read_rows
+from .export import CONTENT_TYPES, FORMATS, export_users
+from .pagination import KeysetPagination
+from .serializers import (
+    AuthTokenSerializer,
+    UserListReadSerializer,
+    UserListSerializer,
+    UserReadSerializer,
+    UserSearchSerializer,
+    UserSerializer,
+)
+from .throttles import (
+    LoginAddressThrottle,
+    LoginGlobalThrottle,
+    LoginUsernameThrottle,
+    SequentialThrottleMixin,
+    SignupAddressThrottle,
+    SignupGlobalThrottle,
+)
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(SequentialThrottleMixin, generics.CreateAPIView):
     """View to create a new user"""
     serializer_class = UserSerializer
+    # Authenticating runs before the throttles and may hash a password
+    authentication_classes = []
+    throttle_classes = [SignupAddressThrottle, SignupGlobalThrottle]
 
     def get_queryset(self):
         return self.queryset
@@ -19,21 +58,251 @@ class CreateUserView(generics.CreateAPIView):
         serializer.save()
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(SequentialThrottleMixin, ObtainAuthToken):
     """View to create a new auth token for user"""
     serializer_class = AuthTokenSerializer
+    # Authenticating runs before the throttles and may hash a password
+    authentication_classes = []
+    throttle_classes = [
+        LoginUsernameThrottle,
+        LoginAddressThrottle,
+        LoginGlobalThrottle,
+    ]
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
     def post(self, request, *args, **kwargs):
-        return super().post(request, *args, **kwargs)
+        if getattr(settings, 'USER_TOKEN_MODE', 'db') == 'signed':
+            response = self._issue_signed(request)
+        else:
+            response = self._issue_db(request)
+        # Requests made with the new token must see this login's writes
+        routing.stick(routing.auth_key(f'Token {response.data["token"]}'))
+        return response
+
+    def _issue_db(self, request):
+        """Return the user's database token, replacing it if expired."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = expiry.token_for(serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+    def _issue_signed(self, request):
+        """Issue a short-lived signed token without touching the DB."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response({'token': tokens.issue(user),
+                         'expires_in': tokens.get_ttl()})
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """View to retrieve authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return authenticated user"""
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve the user, answering If-None-Match without serializing"""
+        # request.user may come from the token cache; its entries are
+        # dropped in every worker once the user changes (user_stamps), so
+        # the version the ETag is built from is current
+        user = self.get_object()
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if user.etag in etags or '*' in etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': user.etag})
+
+        return Response(UserReadSerializer.data(user),
+                        headers={'ETag': user.etag})
+
+    def update(self, request, *args, **kwargs):
+        """Update the user, honouring If-Match for optimistic concurrency"""
+        user = self.get_object()
+        using = self._database_of(user)
+        # The row lock only holds inside a transaction on the user's own
+        # database; a sharded save also writes UserIndex on the global one
+        aliases = [using]
+        if sharding.is_enabled():
+            aliases.insert(0, sharding.GLOBAL_DB_ALIAS)
+        with ExitStack() as stack:
+            for alias in dict.fromkeys(aliases):
+                stack.enter_context(transaction.atomic(using=alias))
+            self._lock_and_refresh(user, using)
+            if_match = request.META.get('HTTP_IF_MATCH')
+            if if_match is not None:
+                etags = parse_etags(if_match)
+                if user.etag not in etags and '*' not in etags:
+                    return Response(
+                        {'detail': 'User was modified by another request.'},
+                        status=status.HTTP_412_PRECONDITION_FAILED,
+                        headers={'ETag': user.etag},
+                    )
+            response = super().update(request, *args, **kwargs)
+
+        response['ETag'] = user.etag
+        return response
+
+    @staticmethod
+    def _database_of(user):
+        """Alias holding the user's row now, not when user was cached."""
+        model = type(user)
+        if not sharding.is_enabled():
+            return router.db_for_write(model, instance=user)
+        found = sharding.locate(pk=user.pk)
+        return user._state.db if found is None else found[1]
+
+    @staticmethod
+    def _lock_and_refresh(user, using):
+        """Lock the user row and load its current values into user."""
+        model = type(user)
+        current = model.objects.using(using).select_for_update().get(
+            pk=user.pk)
+        for field in model._meta.concrete_fields:
+            setattr(user, field.attname, getattr(current, field.attname))
+        # The row may have moved to another shard since user was cached
+        user._state.db = current._state.db
+
+
+class ListUserView(generics.ListAPIView):
+    """View to list users for staff, paginated by keyset"""
+    serializer_class = UserListSerializer
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetPagination
+    boolean_filters = ('is_active', 'is_staff')
+
+    def get_queryset(self):
+        queryset = get_user_model().objects.only(
+            *UserListReadSerializer.sources())
+        for field in self.boolean_filters:
+            value = self.request.query_params.get(field)
+            if value is None:
+                continue
+            if value.lower() not in ('true', 'false', '1', '0'):
+                raise ParseError(f'{field} must be true or false.')
+            queryset = queryset.filter(
+                **{field: value.lower() in ('true', '1')})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(
+            UserListReadSerializer.data_many(page))
+
+
+class SearchUserView(generics.GenericAPIView):
+    """View to find users by username, email or name prefix, for staff"""
+    serializer_class = UserSearchSerializer
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True),
+            OpenApiParameter('limit', OpenApiTypes.INT),
+        ],
+        responses=UserSearchSerializer(many=True),
+    )
+    def get(self, request, *args, **kwargs):
+        options = search.get_options()
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            raise ParseError('q is required.')
+        try:
+            limit = int(request.query_params.get(
+                'limit', options.get('LIMIT', 20)))
+        except ValueError:
+            raise ParseError('limit must be an integer.')
+        max_limit = options.get('MAX_LIMIT', 100)
+        if not 1 <= limit <= max_limit:
+            raise ParseError(f'limit must be between 1 and {max_limit}.')
+        return Response(search.search(term, limit))
+
+
+class BulkImportUsersView(APIView):
+    """View to bulk import users from a CSV or JSONL request body"""
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {
+        'text/csv': 'csv',
+        'application/jsonl': 'jsonl',
+        'application/x-ndjson': 'jsonl',
+    }
+
+    @extend_schema(request=OpenApiTypes.BINARY,
+                   responses={200: OpenApiTypes.BINARY})
+    def post(self, request, *args, **kwargs):
+        content_type = request.content_type.split(';')[0].strip()
+        fmt = self.content_types.get(content_type)
+        if fmt is None:
+            raise ParseError(
+                'Content-Type must be one of: {}.'.format(
+                    ', '.join(self.content_types)))
+        stream = request.stream
+        if stream is None:
+            raise ParseError('Request body is empty.')
+
+        importer = UserImporter()
+        # Spool the error report so memory stays flat however many rows fail
+        report = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        for error in importer.run(read_rows(decode_lines(stream), fmt)):
+            report.write(json.dumps(format_error(error)).encode() + b'\n')
+        report.seek(0)
+
+        summary = json.dumps({
+            'created': importer.created,
+            'rejected': importer.rejected,
+        }).encode() + b'\n'
+        response = StreamingHttpResponse(
+            self._stream_report(summary, report),
+            content_type='application/x-ndjson',
+            status=status.HTTP_200_OK,
+        )
+        return response
+
+    @staticmethod
+    def _stream_report(summary, report):
+        """Yield the summary line followed by one line per rejected row."""
+        try:
+            yield summary
+            yield from report
+        finally:
+            report.close()
+
+
+class ExportUsersView(APIView):
+    """View to stream every user as CSV or JSONL"""
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('output', OpenApiTypes.STR, enum=FORMATS),
+            OpenApiParameter('gzip', OpenApiTypes.BOOL),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    def get(self, request, *args, **kwargs):
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in FORMATS:
+            raise ParseError(
+                'output must be one of: {}.'.format(', '.join(FORMATS)))
+        compress = request.query_params.get('gzip') in ('1', 'true')
+
+        filename = f'users.{fmt}'
+        content_type = CONTENT_TYPES[fmt]
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(
+            export_users(fmt, compress=compress),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"')
+        return response